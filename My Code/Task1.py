@@ -1,15 +1,9 @@
 import os
 import math
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+from nltk_resources import english_stopwords, porter_stemmer, word_tokenize
 import pandas as pd
 
-# Ensure necessary NLTK resources are downloaded
-nltk.download('punkt')
-nltk.download('stopwords')
 
 def process_text(text, stop_words):
     """
@@ -17,7 +11,7 @@ def process_text(text, stop_words):
     list: A list of stemmed tokens.
     """
     tokens = word_tokenize(text.lower())  # Tokenize the text and convert to lower case.
-    stemmer = PorterStemmer()  # Initialize the PorterStemmer.
+    stemmer = porter_stemmer()  # Initialize the PorterStemmer.
     # Filter out stopwords and stem the remaining words
     stemmed_tokens = [stemmer.stem(token) for token in tokens if token not in stop_words and token.isalnum()]
     #print(stemmed_tokens)
@@ -26,7 +20,7 @@ def process_text(text, stop_words):
 
 def load_stop_words(file_path):
     # Start with the default English stop words from NLTK
-    stop_words = set(stopwords.words('english'))
+    stop_words = english_stopwords()
 
     # Open the file and read stop words from it
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -1,15 +1,9 @@
 import os
 import math
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+from nltk_resources import english_stopwords, porter_stemmer, word_tokenize
 from collections import defaultdict
 
-# Ensure necessary NLTK resources are downloaded
-nltk.download('punkt')
-nltk.download('stopwords')
 
 # Define file paths
 document_path = 'C:/Users/samin/Desktop/IFN647/Assignment 2/Data_Collection-1/Data_Collection'
@@ -23,7 +17,7 @@ if not os.path.exists(output_path):
 
 # Load stop words
 def load_stop_words(file_path):
-    stop_words = set(stopwords.words('english'))
+    stop_words = english_stopwords()
     try:
         with open(file_path, 'r', encoding='utf-8') as file:
             line = file.readline()
@@ -38,7 +32,7 @@ stop_words = load_stop_words(stop_words_file_path)
 # Text processing function
 def process_text(text, stop_words):
     tokens = word_tokenize(text.lower())
-    stemmer = PorterStemmer()
+    stemmer = porter_stemmer()
     return [stemmer.stem(token) for token in tokens if token not in stop_words and token.isalnum()]
 
 # Load documents and calculate document frequency for terms
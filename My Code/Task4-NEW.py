@@ -3,21 +3,15 @@ import math
 import re
 from collections import defaultdict, Counter
 
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+from nltk_resources import english_stopwords, porter_stemmer, word_tokenize
 
-# Ensure necessary NLTK resources are downloaded
-nltk.download('punkt')
-nltk.download('stopwords')
 
 def process_text(text, stop_words):
     """
     Process the text by tokenizing, converting to lower case, removing stopwords, and stemming.
     """
     tokens = word_tokenize(text.lower())
-    stemmer = PorterStemmer()
+    stemmer = porter_stemmer()
     #print([stemmer.stem(token) for token in tokens if token not in stop_words and token.isalnum()])
     return [stemmer.stem(token) for token in tokens if token not in stop_words and token.isalnum()]
 
@@ -27,7 +21,7 @@ def load_stop_words(file_path):
     """
     Load stop words from the NLTK library and a custom file.
     """
-    stop_words = set(stopwords.words('english'))
+    stop_words = english_stopwords()
     with open(file_path, 'r', encoding='utf-8') as file:
         custom_stop_words = file.readline().strip().split(',')
     stop_words.update(word.strip() for word in custom_stop_words)
@@ -1,15 +1,9 @@
 import os
 import math
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+from nltk_resources import english_stopwords, porter_stemmer, word_tokenize
 from collections import defaultdict, Counter
 
-# Ensure necessary NLTK resources are downloaded
-nltk.download('punkt')
-nltk.download('stopwords')
 
 # Paths
 base_data_directory = 'C:/Users/samin/Desktop/IFN647/Assignment 2/Data_Collection-1/Data_Collection'
@@ -22,7 +16,7 @@ if not os.path.exists(output_folder):
 # Load and process stopwords
 def load_stop_words(file_path):
     # Start with the default English stop words from NLTK
-    stop_words = set(stopwords.words('english'))
+    stop_words = english_stopwords()
 
     # Open the file and read stop words from it
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -45,7 +39,7 @@ stop_words = load_stop_words(stop_words_file_path)
 # Text processing function
 def process_text(text, stop_words):
     tokens = word_tokenize(text.lower())
-    stemmer = PorterStemmer()
+    stemmer = porter_stemmer()
     return [stemmer.stem(token) for token in tokens if token not in stop_words and token.isalnum()]
 
 # Loading documents
@@ -2,15 +2,10 @@ import os
 import re
 import math
 import numpy as np
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+from nltk_resources import english_stopwords, porter_stemmer, word_tokenize
 from collections import defaultdict, Counter
 
-# Ensure necessary NLTK resources are downloaded
-nltk.download('punkt')
-nltk.download('stopwords')
+stop_words = english_stopwords()
 
 # Load queries
 def load_queries(query_file_path):
@@ -30,8 +25,8 @@ def load_queries(query_file_path):
 # Process text by tokenizing, lowercasing, removing stopwords, and stemming
 def process_text(text):
     tokens = word_tokenize(text.lower())
-    filtered_tokens = [word for word in tokens if word not in stopwords.words('english')]
-    stemmer = PorterStemmer()
+    filtered_tokens = [word for word in tokens if word not in stop_words]
+    stemmer = porter_stemmer()
     stemmed_tokens = [stemmer.stem(token) for token in filtered_tokens]
     return stemmed_tokens
 
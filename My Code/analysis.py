@@ -0,0 +1,241 @@
+import re
+
+from nltk_resources import english_stopwords, porter_stemmer, punkt_abbreviations, word_tokenize
+
+TOKENIZER_MODES = ('nltk', 'regex')
+
+# Punctuation that nltk.word_tokenize always splits away from a word. ',' and ':'
+# stay attached when followed by a digit, as in '1,000' or '10:30'.
+_SPLIT_RE = re.compile(r'[\[\](){}<>;@#$%&?!*"`\u00ab\u00bb\u201c\u201d\u2018\u2019\u201e\u2012-\u2015]|\x27{2}|\.{2,}|--|[:,](?!\d)')
+# Characters after a period that let Punkt consider it a sentence boundary
+_PUNKT_NON_WORD = frozenset(')";}]*:@\'({[!?\u2018\u2019\u201c\u201d\u00ab\u00bb')
+# Punkt ends a word at these characters; quotes, '!' and '?' may also start the next word
+_PUNKT_WORD_SPLIT_RE = re.compile(r'[)";}\]*:@({\[]')
+_PUNKT_WORD_START_RE = re.compile('(?=[\'!?\u2018\u2019\u201c\u201d\u00ab\u00bb])')
+_PUNKT_NUMBER_RE = re.compile(r'^-?[\.,]?\d[\d,\.-]*\.?$')
+_PUNKT_INITIAL_RE = re.compile(r'^[^\W\d]\.$')
+_LEADING_QUOTE_RE = re.compile(r"^'(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)")
+_CLITIC_RE = re.compile(r"^(.*?[^'])('ll|'re|'ve|n't|'[smd]|')$")
+_CONTRACTIONS = {'cannot': ('can', 'not'), 'gimme': ('gim', 'me'), 'gonna': ('gon', 'na'),
+                 'gotta': ('got', 'ta'), 'lemme': ('lem', 'me'), 'wanna': ('wan', 'na')}
+# ASCII characters _SPLIT_RE always splits on, mapped to spaces for the byte tokenizer
+_SPLIT_BYTES_TABLE = bytes.maketrans(b'[](){}<>;@#$%&?!*"`', b' ' * 19)
+# Byte chunks containing these need the period, quote and conditional split rules of the text path
+_TEXT_BYTES_RE = re.compile(rb"[.',:]|--")
+_ASCII_SAMPLE = bytes(range(128))
+_ascii_compatible = {}
+_abbreviations = None
+
+
+def load_stop_words(file_path):
+    """
+    Load stop words from the NLTK library and a custom file.
+    """
+    stop_words = english_stopwords()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        custom_stop_words = file.readline().strip().split(',')
+    stop_words.update(word.strip() for word in custom_stop_words)
+    stop_words.update({'xml', 'newsitem', 'root', 'en', 'titl'})
+    return stop_words #returns a set
+
+
+def _sentence_break(word, next_token):
+    """
+    Decide like Punkt whether a period-final word ends a sentence, given the token that follows it.
+    """
+    global _abbreviations
+    if _abbreviations is None:
+        _abbreviations = punkt_abbreviations()
+    stem = word[:-1]
+    if stem in _abbreviations or stem.split('-')[-1] in _abbreviations:
+        return False
+    if _PUNKT_NUMBER_RE.match(word) or _PUNKT_INITIAL_RE.match(word):
+        # Punkt's orthographic heuristic: numbers and initials before punctuation
+        # or a lower-case word do not end the sentence
+        return not next_token or not (next_token[0] in ';:,.!?' or next_token[0].islower())
+    return True
+
+
+def _punkt_word(prefix):
+    """
+    Return the Punkt word token that ends at the end of a chunk prefix.
+    """
+    word = _PUNKT_WORD_SPLIT_RE.split(prefix)[-1]
+    return _PUNKT_WORD_START_RE.split(word)[-1].lstrip('`&#-,')
+
+
+def _emit_piece(piece, chunk, end, next_chunk, tokens):
+    """
+    Append the alphanumeric token nltk.word_tokenize would produce for the piece of a chunk ending at `end`.
+    """
+    if piece.startswith("'") and _LEADING_QUOTE_RE.match(piece):
+        piece = piece[1:]
+    period = piece.find(".'", 0, len(piece) - 1)
+    if period > 0:
+        # A period followed by a quote inside the piece, as in "corp.'s", is a Punkt boundary candidate
+        cut = end - len(piece) + period + 1
+        if _sentence_break(_punkt_word(chunk[:cut]), "'"):
+            _emit_piece(piece[:period], chunk, cut - 1, next_chunk, tokens)
+            _emit_piece(piece[period + 1:], chunk, end, next_chunk, tokens)
+            return
+    if piece.endswith("'") and piece[-2:-1] == '.':
+        piece, end = piece[:-1], end - 1
+    if piece.endswith('.') and not piece.endswith('..'):
+        following = chunk[end:end + 1]
+        if not following or following in _PUNKT_NON_WORD:
+            if _sentence_break(_punkt_word(chunk[:end]), following or next_chunk):
+                piece = piece[:-1]
+    clitic = _CLITIC_RE.match(piece)
+    if clitic:
+        piece = clitic.group(1)
+    if piece.isalnum():
+        tokens.extend(_CONTRACTIONS.get(piece, (piece,)))
+
+
+def _split_chunk(chunk, next_chunk, tokens):
+    """
+    Append the tokens of one whitespace-separated chunk that is not simply alphanumeric.
+    """
+    start = 0
+    for match in _SPLIT_RE.finditer(chunk):
+        if match.start() > start:
+            _emit_piece(chunk[start:match.start()], chunk, match.start(), next_chunk, tokens)
+        start = match.end()
+    if start < len(chunk):
+        _emit_piece(chunk[start:], chunk, len(chunk), next_chunk, tokens)
+
+
+def regex_tokenize(text):
+    """
+    Fast stand-in for nltk.word_tokenize followed by the isalnum() filter, for lower-cased text.
+    """
+    tokens = []
+    chunks = text.split()
+    for position, chunk in enumerate(chunks):
+        if chunk.isalnum():
+            tokens.extend(_CONTRACTIONS.get(chunk, (chunk,)))
+            continue
+        _split_chunk(chunk, chunks[position + 1] if position + 1 < len(chunks) else '', tokens)
+    return tokens
+    #returns only the tokens that survive the isalnum() filter
+
+
+def ascii_compatible(encoding):
+    """
+    True if the encoding stores ASCII text as the same single bytes, e.g. iso-8859-1 or utf-8 but not utf-16.
+    """
+    compatible = _ascii_compatible.get(encoding)
+    if compatible is None:
+        compatible = _ascii_compatible[encoding] = _ASCII_SAMPLE.decode(encoding, 'replace') == _ASCII_SAMPLE.decode()
+    return compatible
+
+
+def _next_text_chunk(chunks, position, encoding):
+    """
+    The text chunk str.split() would yield after byte chunk position, or '' at the end of the document.
+    """
+    for following in range(position + 1, len(chunks)):
+        pieces = chunks[following].decode(encoding).lower().split()
+        if pieces:
+            return pieces[0]
+    return ''
+
+
+def regex_tokenize_bytes(data, encoding='utf-8'):
+    """
+    regex_tokenize(data.decode(encoding).lower()) computed on the raw bytes. ASCII chunks without periods,
+    quotes or conditional split points (e.g. '<p>word', 'word,' or 'n/a') are cut with bytes.translate;
+    only the remaining chunks, including any with non-ASCII bytes, are decoded and split as text.
+    """
+    if not ascii_compatible(encoding):
+        return regex_tokenize(data.decode(encoding).lower())
+    tokens = []
+    chunks = data.lower().split()
+    for position, chunk in enumerate(chunks):
+        if chunk.isalnum():
+            word = chunk.decode('ascii')
+            tokens.extend(_CONTRACTIONS.get(word, (word,)))
+            continue
+        if chunk.isascii():
+            # ',' and ':' only split when no digit follows, which is always true at the end of a chunk
+            trimmed = chunk[:-1] if chunk[-1:] in b',:' else chunk
+            if not _TEXT_BYTES_RE.search(trimmed):
+                # Without periods, quotes or other split points every piece is either a word or dropped
+                for word in trimmed.translate(_SPLIT_BYTES_TABLE).split():
+                    if word.isalnum():
+                        word = word.decode('ascii')
+                        tokens.extend(_CONTRACTIONS.get(word, (word,)))
+                continue
+        # Non-ASCII bytes can hold upper-case letters and Unicode whitespace, so split again after decoding
+        pieces = chunk.decode(encoding).lower().split()
+        for index, piece in enumerate(pieces):
+            if piece.isalnum():
+                tokens.extend(_CONTRACTIONS.get(piece, (piece,)))
+            else:
+                if index + 1 < len(pieces):
+                    _split_chunk(piece, pieces[index + 1], tokens)
+                else:
+                    _split_chunk(piece, _next_text_chunk(chunks, position, encoding), tokens)
+    return tokens
+
+
+def tokenize(text, tokenizer='nltk'):
+    """
+    Split lower-cased text into tokens with nltk.word_tokenize or the compiled regex tokenizer.
+    """
+    if tokenizer == 'nltk':
+        return word_tokenize(text)
+    if tokenizer == 'regex':
+        return regex_tokenize(text)
+    raise ValueError(f"Unknown tokenizer mode '{tokenizer}', expected one of {TOKENIZER_MODES}")
+
+
+def tokenize_document(data, encoding='utf-8', tokenizer='nltk'):
+    """
+    Tokens of a raw document; the regex tokenizer works on the bytes, nltk on the decoded text.
+    """
+    if tokenizer == 'regex':
+        return regex_tokenize_bytes(data, encoding)
+    return tokenize(data.decode(encoding).lower(), tokenizer)
+
+
+def process_text(text, stop_words, tokenizer='nltk'):
+    """
+    Process the text by tokenizing, converting to lower case, removing stopwords, and stemming.
+    """
+    tokens = tokenize(text.lower(), tokenizer)
+    stemmer = porter_stemmer()
+    return [stemmer.stem(token) for token in tokens if token not in stop_words and token.isalnum()]
+    #return a list of tokens
+
+
+def parse_queries(query_file_path):
+    """
+    Read the topics file into a dictionary of query ID to raw title, description and narrative text.
+    """
+    queries = {}
+    with open(query_file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    raw_queries = re.findall(r'<Query>(.*?)</Query>', content, re.DOTALL)
+    for raw_query in raw_queries:
+        number = re.search(r'<num> Number: (R\d+)', raw_query).group(1)
+        title = re.search(r'<title>(.*?)\n', raw_query).group(1).strip()
+        description_search = re.search(r'<desc> Description:\s*(.*?)(?=\n<narr>|</Query>)', raw_query, re.DOTALL)
+        narrative_search = re.search(r'<narr> Narrative:\s*(.*?)\n\n', raw_query, re.DOTALL)
+
+        description = description_search.group(1).strip() if description_search else ""
+        narrative = narrative_search.group(1).strip() if narrative_search else ""
+        queries[number] = {'title': title, 'description': description, 'narrative': narrative}
+    return queries
+
+
+def load_queries(query_file_path, stop_words, tokenizer='nltk'):
+    """
+    Load queries from a file and process them into a dictionary of tokenized texts.
+    """
+    queries = {}
+    for number, topic in parse_queries(query_file_path).items():
+        full_query = f"{topic['title']} {topic['description']} {topic['narrative']}"
+        queries[number] = process_text(full_query, stop_words, tokenizer)
+    return queries
+    #returns a dictionary where the key-value pair is the query ID and the query terms
@@ -0,0 +1,400 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words
+from documents import read_collection_bytes
+from evaluate_runs import print_comparison
+from evaluation import evaluate_relevance
+from index import INDEX_VERSION, CollectionIndex, load_index, save_index
+from lexicon import Lexicon, analyze_queries
+from models import MODEL_REGISTRY, CollectionStatistics, get_models, score_models
+from qrels import benchmark_files, load_qrels
+from run_writer import OUTPUT_FORMATS, RankingWriter, ranked
+
+DEFAULT_STORE = os.path.join(paths.INDEX_DIRECTORY, 'artifacts')
+CODE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Source files whose code decides each stage's output; upstream code is covered by the upstream keys
+STAGE_SOURCES = {
+    'queries': ('analysis.py', 'lexicon.py', 'nltk_resources.py'),
+    'ingest': ('analysis.py', 'documents.py', 'lexicon.py', 'nltk_resources.py'),
+    'index': ('index.py',),
+    'score': ('models.py', 'weighted_query.py', 'analysis.py', 'nltk_resources.py'),
+    'evaluate': ('evaluation.py', 'qrels.py', 'run_writer.py'),
+}
+STAGES = tuple(STAGE_SOURCES)
+MISSING = object()
+_code_versions = {}
+
+
+def file_digest(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()
+
+
+def code_version(stage):
+    """
+    SHA-256 of the source files a stage runs, so editing one of them invalidates that stage's artifacts.
+    """
+    version = _code_versions.get(stage)
+    if version is None:
+        digest = hashlib.sha256(str(INDEX_VERSION).encode())
+        for name in STAGE_SOURCES[stage]:
+            digest.update(name.encode())
+            digest.update(file_digest(os.path.join(CODE_DIRECTORY, name)).encode())
+        version = _code_versions[stage] = digest.hexdigest()
+    return version
+
+
+def artifact_key(stage, *inputs):
+    """
+    Content address of a stage output: the stage, its code version and its JSON-serialisable inputs.
+    """
+    payload = json.dumps([stage, code_version(stage), inputs], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Stage outputs saved under their content address in a two-level directory of pickles. Every read
+    touches the file, so its modification time records when the artifact was last used, for gc().
+    """
+
+    def __init__(self, directory=DEFAULT_STORE):
+        self.directory = directory
+        self.hits = Counter()
+        self.misses = Counter()
+        self.used = set()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        file_path = self.path(key)
+        try:
+            obj = load_index(file_path)
+        except (FileNotFoundError, ValueError):
+            return MISSING
+        os.utime(file_path)
+        return obj
+
+    def put(self, key, obj):
+        save_index(obj, self.path(key))
+
+    def fetch(self, stage, key):
+        """
+        get() that counts the hit or miss and records the key as used by this run.
+        """
+        self.used.add(key)
+        obj = self.get(key)
+        if obj is MISSING:
+            self.misses[stage] += 1
+        else:
+            self.hits[stage] += 1
+        return obj
+
+    def cached(self, stage, key, compute):
+        """
+        The artifact stored under key, computing and storing it first on a miss.
+        """
+        obj = self.fetch(stage, key)
+        if obj is MISSING:
+            obj = compute()
+            self.put(key, obj)
+        return obj
+
+    def ensure(self, stage, key, compute):
+        """
+        cached() for artifacts the caller does not need now: a stored one is only touched, not loaded.
+        """
+        file_path = self.path(key)
+        self.used.add(key)
+        if os.path.exists(file_path):
+            self.hits[stage] += 1
+            os.utime(file_path)
+        else:
+            self.misses[stage] += 1
+            self.put(key, compute())
+
+    def entries(self):
+        """
+        (key, size in bytes, last used time) of every stored artifact.
+        """
+        found = []
+        if os.path.isdir(self.directory):
+            for prefix in os.listdir(self.directory):
+                directory = os.path.join(self.directory, prefix)
+                if not os.path.isdir(directory):
+                    continue
+                for name in os.listdir(directory):
+                    if name.endswith('.pkl'):
+                        status = os.stat(os.path.join(directory, name))
+                        found.append((name[:-4], status.st_size, status.st_mtime))
+        return found
+
+    def roots_directory(self):
+        return os.path.join(self.directory, 'roots')
+
+    def save_roots(self, run):
+        """
+        Record the artifacts this run used under the run's name, replacing only that run's earlier roots.
+        gc() keeps the artifacts of every recorded run.
+        """
+        os.makedirs(self.roots_directory(), exist_ok=True)
+        file_path = os.path.join(self.roots_directory(), f"{run}.json")
+        with open(f"{file_path}.tmp", 'w') as file:
+            json.dump(sorted(self.used), file)
+        os.replace(f"{file_path}.tmp", file_path)
+
+    def load_roots(self, cutoff=None):
+        """
+        Union of the recorded runs' artifacts; root files of runs not repeated since cutoff are removed.
+        """
+        roots = set()
+        if os.path.isdir(self.roots_directory()):
+            for name in os.listdir(self.roots_directory()):
+                file_path = os.path.join(self.roots_directory(), name)
+                if not name.endswith('.json'):
+                    continue
+                if cutoff is not None and os.path.getmtime(file_path) < cutoff:
+                    os.remove(file_path)
+                    continue
+                with open(file_path, 'r') as file:
+                    roots.update(json.load(file))
+        return roots
+
+    def gc(self, max_age_days=None, max_bytes=None):
+        """
+        Remove artifacts unused for more than max_age_days, then the least recently used ones until the
+        store fits in max_bytes. Artifacts of every run recorded within max_age_days are kept.
+        Returns (removed count, freed bytes).
+        """
+        cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+        roots = self.load_roots(cutoff)
+        entries = sorted((entry for entry in self.entries() if entry[0] not in roots), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in self.entries())
+        removed = freed = 0
+        for key, size, last_used in entries:
+            if (cutoff is None or last_used >= cutoff) and (max_bytes is None or total - freed <= max_bytes):
+                continue
+            os.remove(self.path(key))
+            removed += 1
+            freed += size
+        return removed, freed
+
+
+def stop_words_digest(stop_words):
+    return hashlib.sha256('\n'.join(sorted(stop_words)).encode()).hexdigest()
+
+
+class Pipeline:
+    """
+    The ingest -> index -> score -> evaluate stages over one artifact store. Each stage asks the previous
+    one for its artifacts, which are only recomputed when their inputs or code changed:
+
+    - queries: analysed topics, keyed by the topics file, stop words and tokenizer;
+    - ingest: one document's stems, keyed by its bytes and the analyser configuration;
+    - index: one collection's CollectionIndex, keyed by its file names and ingest keys;
+    - score: one topic's scores under one model, keyed by the index, the query and the model parameters;
+    - evaluate: one model's (ri, recall, map) per topic, keyed by its score keys and the judgements.
+    """
+
+    def __init__(self, store, data_directory=paths.DATA_DIRECTORY, query_file_path=paths.QUERY_FILE,
+                 stop_words_file=paths.STOP_WORDS_FILE, benchmark_folder=paths.BENCHMARK_DIRECTORY,
+                 tokenizer='nltk'):
+        self.store = store
+        self.data_directory = data_directory
+        self.query_file_path = query_file_path
+        self.benchmark_folder = benchmark_folder
+        self.tokenizer = tokenizer
+        self.stop_words = load_stop_words(stop_words_file)
+        self.analyzer = [stop_words_digest(self.stop_words), tokenizer]
+        # Only a stemming cache: artifacts hold stems, which do not depend on the order terms were seen in
+        self.lexicon = Lexicon(self.stop_words, tokenizer)
+        self.analysed_queries = None
+
+    def queries(self):
+        if self.analysed_queries is None:
+            key = artifact_key('queries', file_digest(self.query_file_path), *self.analyzer)
+            self.analysed_queries = self.store.cached('queries', key,
+                                                      lambda: analyze_queries(self.query_file_path, self.lexicon))
+        return self.analysed_queries
+
+    def analyze(self, data, encoding):
+        return [self.lexicon.terms[term_id] for term_id in self.lexicon.analyze_document_ids(data, encoding)]
+
+    def ingest_documents(self, collection):
+        """
+        (file name, ingest key, bytes, encoding) of a collection's documents in file name order,
+        analysing the documents whose stems are not stored yet.
+        """
+        documents = []
+        for filename, data, encoding in read_collection_bytes(os.path.join(self.data_directory, collection)):
+            key = artifact_key('ingest', hashlib.sha256(data).hexdigest(), encoding, *self.analyzer)
+            self.store.ensure('ingest', key, lambda: self.analyze(data, encoding))
+            documents.append((filename, key, data, encoding))
+        return documents
+
+    def ingest(self, collection):
+        """
+        Ingest keys of a collection's documents as (file name, key) pairs in file name order.
+        """
+        return [(filename, key) for filename, key, _, _ in self.ingest_documents(collection)]
+
+    def index(self, collection):
+        """
+        (index key, CollectionIndex) of a collection, rebuilt from cached documents when any of them changed.
+        """
+        documents = self.ingest_documents(collection)
+        key = artifact_key('index', collection, [(filename, ingest_key) for filename, ingest_key, _, _ in documents])
+
+        def build():
+            index = CollectionIndex(collection)
+            for filename, ingest_key, data, encoding in documents:
+                stems = self.store.get(ingest_key)
+                if stems is MISSING:
+                    # Removed by gc or never written completely since ingest_documents checked it
+                    stems = self.analyze(data, encoding)
+                    self.store.put(ingest_key, stems)
+                index.add_document(filename, stems)
+            return index
+
+        return key, self.store.cached('index', key, build)
+
+    def score(self, query_id, query, models):
+        """
+        (doc ids, {model name: (score key, scores)}) for one topic; models with cached scores are not rerun.
+        """
+        collection = f"Data_C{query_id[1:]}"
+        index_key, index = self.index(collection)
+        keys = {model.name: artifact_key('score', index_key, query, model.name, model.params) for model in models}
+        scores = {model.name: self.store.fetch('score', keys[model.name]) for model in models}
+        stale = [model for model in models if scores[model.name] is MISSING]
+        if stale:
+            # Score only the models without cached scores, still in one pass over the postings
+            for name, model_scores in score_models(CollectionStatistics(index), query, stale).items():
+                self.store.put(keys[name], model_scores)
+                scores[name] = model_scores
+        return index.doc_ids, {name: (keys[name], model_scores) for name, model_scores in scores.items()}
+
+    def score_all(self, models, output_folder=None, output_format='dat'):
+        """
+        Score every topic with every model; optionally write the rankings as ranking.py would.
+        Returns {model name: {query_id: (doc ids, score key, scores)}}.
+        """
+        results = {model.name: {} for model in models}
+        for query_id, query in self.queries().items():
+            doc_ids, scores = self.score(query_id, query, models)
+            for name, (key, model_scores) in scores.items():
+                results[name][query_id] = (doc_ids, key, model_scores)
+        if output_folder:
+            for model in models:
+                with RankingWriter(output_folder, MODEL_REGISTRY[model.name].prefix, output_format) as writer:
+                    for query_id, (doc_ids, _, model_scores) in results[model.name].items():
+                        writer.write(query_id, dict(zip(doc_ids, model_scores.tolist())))
+        return results
+
+    def evaluate(self, models, output_folder=None, output_format='dat'):
+        """
+        {model name: {query_id: (ri, recall, map) or None}} over every topic, from cached scores.
+        """
+        judgements = [file_digest(path) for path in benchmark_files(self.benchmark_folder)]
+        results = {}
+        for name, topics in self.score_all(models, output_folder, output_format).items():
+            score_keys = {query_id: key for query_id, (_, key, _) in topics.items()}
+            results[name] = self.store.cached('evaluate', artifact_key('evaluate', score_keys, judgements),
+                                              lambda topics=topics: self.evaluate_topics(topics))
+        return results
+
+    def evaluate_topics(self, topics):
+        qrels = load_qrels(self.benchmark_folder)
+        results = {}
+        for query_id, (doc_ids, _, scores) in topics.items():
+            if query_id in qrels:
+                # Same order as the written rankings, so the metrics match evaluation.py on those files
+                ranking = [doc_id for doc_id, _ in ranked(dict(zip(doc_ids, scores.tolist())))]
+                relevant = qrels.gather(query_id, ranking) > 0
+                results[query_id] = list(evaluate_relevance(relevant, qrels.relevant_count(query_id)))
+            else:
+                results[query_id] = None
+        return results
+
+
+def parse_params(specs):
+    """
+    Parse repeated 'k1=1.5' options into a {name: float} dictionary of model parameters.
+    """
+    params = {}
+    for spec in specs or ():
+        name, _, value = spec.partition('=')
+        params[name] = float(value)
+    return params
+
+
+def print_summary(store, start):
+    counts = ', '.join(f"{stage} {store.hits[stage]} cached/{store.misses[stage]} built"
+                       for stage in STAGES if store.hits[stage] or store.misses[stage])
+    print(f"{counts} in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ingest, index, score and evaluate stages over a "
+                                                 "content-addressed artifact cache.")
+    parser.add_argument('stage', choices=('ingest', 'index', 'score', 'evaluate', 'gc'),
+                        help="the stage to bring up to date, with whatever it needs upstream; or gc")
+    parser.add_argument('--store', default=DEFAULT_STORE)
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--stop-words', default=paths.STOP_WORDS_FILE)
+    parser.add_argument('--benchmark', default=paths.BENCHMARK_DIRECTORY)
+    parser.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    parser.add_argument('--model', action='append', choices=tuple(MODEL_REGISTRY),
+                        help="repeatable, defaults to bm25 and jm_lm")
+    parser.add_argument('--param', action='append', metavar='NAME=VALUE',
+                        help="model parameter such as k1=1.5, applied to every model that has it (repeatable)")
+    parser.add_argument('--output', default=None, help="also write the rankings to this folder")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='dat')
+    parser.add_argument('--max-age', type=float, default=None, help="gc: days since an artifact was last used")
+    parser.add_argument('--max-size', type=float, default=None, help="gc: MiB the store may keep")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.store)
+    # Runs with the same options share one root file, so repeating a run replaces its roots
+    run = hashlib.sha256(json.dumps(vars(args), sort_keys=True).encode()).hexdigest()[:16]
+    start = time.perf_counter()
+    if args.stage == 'gc':
+        if args.max_age is None and args.max_size is None:
+            parser.error("gc needs --max-age and/or --max-size")
+        max_bytes = args.max_size * 2**20 if args.max_size is not None else None
+        removed, freed = store.gc(args.max_age, max_bytes)
+        remaining = store.entries()
+        print(f"Removed {removed} artifacts ({freed / 2**20:.1f} MiB); {len(remaining)} left "
+              f"({sum(size for _, size, _ in remaining) / 2**20:.1f} MiB)")
+        return
+
+    pipeline = Pipeline(store, args.data, args.queries, args.stop_words, args.benchmark, args.tokenizer)
+    models = get_models(args.model or ['bm25', 'jm_lm'], **parse_params(args.param))
+    collections = [f"Data_C{query_id[1:]}" for query_id in pipeline.queries()]
+    if args.stage == 'ingest':
+        documents = sum(len(pipeline.ingest(collection)) for collection in collections)
+        print(f"{documents} documents in {len(collections)} collections")
+    elif args.stage == 'index':
+        for collection in collections:
+            pipeline.index(collection)
+        print(f"{len(collections)} collection indexes")
+    elif args.stage == 'score':
+        pipeline.score_all(models, args.output, args.format)
+        print(f"{len(collections)} topics scored with {', '.join(model.name for model in models)}")
+    else:
+        query_ids = list(pipeline.queries())
+        print_comparison(pipeline.evaluate(models, args.output, args.format), query_ids)
+    store.save_roots(run)
+    print_summary(store, start)
+
+
+if __name__ == "__main__":
+    main()
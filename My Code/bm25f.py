@@ -0,0 +1,174 @@
+import argparse
+import html
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+import paths
+from documents import read_collection
+from index import load_index, save_index
+from run_writer import OUTPUT_FORMATS, RankingWriter
+from weighted_query import query_terms
+
+FIELDS = ('title', 'headline', 'text')
+_FIELD_RE = re.compile(r'<(title|headline|text)>(.*?)</\1>', re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def extract_fields(xml_text):
+    """
+    Return {field: plain text} for the title, headline and text elements of a newsitem.
+    """
+    fields = dict.fromkeys(FIELDS, '')
+    for field, content in _FIELD_RE.findall(xml_text):
+        fields[field] += ' ' + html.unescape(_TAG_RE.sub(' ', content))
+    return fields
+
+
+class FieldedIndex:
+    """
+    Inverted index of one collection keeping a term frequency and a length per field.
+    """
+
+    def __init__(self, name='', fields=FIELDS):
+        self.name = name
+        self.fields = fields
+        self.doc_ids = []
+        self.field_lengths = []         # document number -> tuple of field lengths
+        self.postings = {}              # term -> {document number: tuple of field term frequencies}
+
+    @property
+    def N(self):
+        return len(self.doc_ids)
+
+    def add_document(self, doc_id, field_tokens):
+        """
+        Add one document given as a list of stemmed token lists, one per field.
+        """
+        doc = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.field_lengths.append(tuple(len(tokens) for tokens in field_tokens))
+        counts = [Counter(tokens) for tokens in field_tokens]
+        for term in set().union(*counts):
+            self.postings.setdefault(term, {})[doc] = tuple(count[term] for count in counts)
+        return doc
+
+
+def build_fielded_index(directory_path, lexicon, name=None, tokenizer=None):
+    """
+    Analyse every document of a collection field by field through the lexicon.
+    """
+    index = FieldedIndex(name or os.path.basename(os.path.normpath(directory_path)))
+    for filename, text in read_collection(directory_path):
+        fields = extract_fields(text)
+        index.add_document(filename, [lexicon.analyze(fields[field], tokenizer) for field in index.fields])
+    return index
+
+
+def fielded_path(index_directory, collection):
+    return os.path.join(index_directory, f"{collection}.fld")
+
+
+class BM25F:
+    """
+    BM25F: field term frequencies are length-normalised per field, weighted and summed into one
+    pseudo frequency that goes through a single BM25 saturation. The per-field normalisers
+    w_f / ((1 - b_f) + b_f * len_f / avglen_f) are computed once per collection.
+    """
+
+    defaults = {'k1': 1.2, 'k2': 500, 'weights': {'title': 3.0, 'headline': 2.0, 'text': 1.0},
+                'b': {'title': 0.5, 'headline': 0.5, 'text': 0.75}}
+
+    def __init__(self, **params):
+        self.params = dict(self.defaults, **params)
+
+    def prepare(self, index):
+        """
+        Per-document field normalisers (N x fields) and the postings arrays cache for one collection.
+        """
+        lengths = np.array(index.field_lengths, dtype=np.float64).reshape(index.N, len(index.fields))
+        average = lengths.mean(axis=0)
+        average[average == 0] = 1.0
+        weights = np.array([self.params['weights'].get(field, 0.0) for field in index.fields])
+        b = np.array([self.params['b'].get(field, 0.75) for field in index.fields])
+        return {'normalisers': weights / ((1 - b) + b * lengths / average), 'postings': {}}
+
+    def postings(self, index, context, term):
+        cached = context['postings'].get(term)
+        if cached is None and term in index.postings:
+            term_postings = index.postings[term]
+            cached = context['postings'][term] = (np.fromiter(term_postings.keys(), dtype=np.int64),
+                                                  np.array(list(term_postings.values()), dtype=np.float64))
+        return cached
+
+    def score(self, index, context, query):
+        """
+        Score every document for one query, returning an array indexed by document number.
+        """
+        k1, k2 = self.params['k1'], self.params['k2']
+        N = index.N
+        scores = np.zeros(N)
+        for term, qf in query_terms(query).items():
+            found = self.postings(index, context, term)
+            if found is None:
+                continue
+            docs, tfs = found
+            n = len(docs)
+            pseudo_tf = (tfs * context['normalisers'][docs]).sum(axis=1)
+            # The +1 keeps the idf positive for terms found in most documents
+            idf = np.log(1 + (N - n + 0.5) / (n + 0.5))
+            scores[docs] += idf * ((k1 + 1) * pseudo_tf / (k1 + pseudo_tf)) * ((k2 + 1) * qf / (k2 + qf))
+        return scores
+
+
+def parse_field_values(spec):
+    """
+    Parse 'title=3,headline=2,text=1' into a {field: float} dictionary.
+    """
+    values = {}
+    for item in spec.split(','):
+        field, _, value = item.partition('=')
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field '{field}', expected one of {FIELDS}")
+        values[field] = float(value)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Field-weighted BM25F ranking over title, headline and text.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--output', default='RankingOutputs-BM25F')
+    parser.add_argument('--weights', default=None, help="e.g. title=3,headline=2,text=1")
+    parser.add_argument('--b', default=None, help="per-field length normalisation, e.g. title=0.5,text=0.75")
+    parser.add_argument('--k1', type=float, default=1.2)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='dat')
+    parser.add_argument('--k', type=int, default=None)
+    parser.add_argument('--rebuild', action='store_true', help="rebuild fielded indexes that already exist")
+    args = parser.parse_args()
+
+    params = {'k1': args.k1}
+    if args.weights:
+        params['weights'] = dict(BM25F.defaults['weights'], **parse_field_values(args.weights))
+    if args.b:
+        params['b'] = dict(BM25F.defaults['b'], **parse_field_values(args.b))
+    model = BM25F(**params)
+    queries = load_index(os.path.join(args.index_dir, 'queries.idx'))
+    lexicon = load_index(os.path.join(args.index_dir, 'lexicon.idx'))
+    with RankingWriter(args.output, 'BM25F', args.format, args.k) as writer:
+        for query_id, query in queries.items():
+            collection = f"Data_C{query_id[1:]}"
+            file_path = fielded_path(args.index_dir, collection)
+            if args.rebuild or not os.path.exists(file_path):
+                index = build_fielded_index(paths.collection_directory(query_id, args.data), lexicon)
+                save_index(index, file_path)
+            else:
+                index = load_index(file_path)
+            scores = model.score(index, model.prepare(index), query)
+            writer.write(query_id, dict(zip(index.doc_ids, scores.tolist())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words, parse_queries
+from documents import read_collection
+from lexicon import Lexicon
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def shingle_hashes(term_ids, size=5, seed=0):
+    """
+    Distinct 64-bit hashes of every run of size consecutive term ids; shorter documents are one shingle.
+    """
+    ids = np.asarray(term_ids, dtype=np.uint64)
+    if len(ids) == 0:
+        return ids
+    size = min(size, len(ids))
+    multipliers = np.random.default_rng(seed).integers(1, 1 << 63, size=size, dtype=np.uint64) | np.uint64(1)
+    # uint64 arithmetic wraps around, which is what a multiplicative hash wants
+    windows = np.lib.stride_tricks.sliding_window_view(ids, size)
+    return np.unique((windows * multipliers).sum(axis=1, dtype=np.uint64))
+
+
+class MinHasher:
+    """
+    num_perm universal hash functions (a * x + b) mod 2^31 - 1; a document's signature is the minimum
+    of each function over its shingles, and the fraction of equal entries estimates Jaccard similarity.
+    """
+
+    def __init__(self, num_perm=128, seed=0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, hashes):
+        values = (hashes % np.uint64(MERSENNE_PRIME))[None, :]
+        return ((self.a * values + self.b) % np.uint64(MERSENNE_PRIME)).min(axis=1).astype(np.uint32)
+
+
+def estimate_jaccard(signature, other):
+    return float(np.mean(signature == other))
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing: signatures are cut into bands of rows values, and documents that
+    agree on every value of at least one band become candidate pairs.
+    """
+
+    def __init__(self, bands=16, rows=8):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = defaultdict(list)    # (band, band bytes) -> document keys
+        self.signatures = {}
+
+    def add(self, key, signature):
+        if len(signature) != self.bands * self.rows:
+            raise ValueError(f"Signatures of {len(signature)} values do not split into {self.bands}x{self.rows} bands")
+        self.signatures[key] = signature
+        for band in range(self.bands):
+            self.buckets[band, signature[band * self.rows:(band + 1) * self.rows].tobytes()].append(key)
+
+    def candidate_pairs(self):
+        pairs = set()
+        for keys in self.buckets.values():
+            for i in range(1, len(keys)):
+                for j in range(i):
+                    pairs.add((keys[j], keys[i]))
+        return pairs
+
+    def duplicate_pairs(self, threshold=0.8):
+        """
+        Candidate pairs whose estimated Jaccard similarity reaches the threshold.
+        """
+        return [(first, second) for first, second in self.candidate_pairs()
+                if estimate_jaccard(self.signatures[first], self.signatures[second]) >= threshold]
+
+
+class DuplicateMap:
+    """
+    Clusters of near-duplicate (collection, file name) documents. Collections are ranked on their own,
+    so each collection keeps the first member of a cluster it contains as that cluster's representative.
+    """
+
+    def __init__(self, clusters):
+        self.clusters = sorted(sorted(cluster) for cluster in clusters)
+        self.collections = defaultdict(dict)    # collection -> {duplicate file name: representative file name}
+        for cluster in self.clusters:
+            representatives = {}
+            for collection, filename in cluster:
+                if collection in representatives:
+                    self.collections[collection][filename] = representatives[collection]
+                else:
+                    representatives[collection] = filename
+
+    def duplicates(self, collection):
+        """
+        {duplicate file name: representative file name} within one collection.
+        """
+        return self.collections.get(collection, {})
+
+    def cross_collection_clusters(self):
+        return [cluster for cluster in self.clusters if len({collection for collection, _ in cluster}) > 1]
+
+    def expand(self, collection, scores):
+        """
+        Give every duplicate left out of a collection's index the score of its representative.
+        """
+        scores = dict(scores)
+        for filename, representative in self.duplicates(collection).items():
+            if filename not in scores and representative in scores:
+                scores[filename] = scores[representative]
+        return scores
+
+
+def cluster_pairs(pairs):
+    """
+    Union-find over duplicate pairs; returns the connected groups.
+    """
+    parent = {}
+
+    def find(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for first, second in pairs:
+        parent[find(first)] = find(second)
+    groups = defaultdict(list)
+    for key in parent:
+        groups[find(key)].append(key)
+    return list(groups.values())
+
+
+def find_duplicates(data_directory, collections, lexicon, tokenizer=None, shingle_size=5, num_perm=128, bands=16,
+                    threshold=0.8, seed=0):
+    """
+    Shingle, MinHash and LSH every document of the given Data_C collections; returns a DuplicateMap.
+    """
+    hasher = MinHasher(num_perm, seed)
+    lsh = LSHIndex(bands, num_perm // bands)
+    for collection in collections:
+        for filename, text in read_collection(os.path.join(data_directory, collection)):
+            hashes = shingle_hashes(lexicon.analyze_ids(text, tokenizer), shingle_size, seed)
+            if len(hashes):
+                lsh.add((collection, filename), hasher.signature(hashes))
+    return DuplicateMap(cluster_pairs(lsh.duplicate_pairs(threshold)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate newsitems within and across collections.")
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--stop-words', default=paths.STOP_WORDS_FILE)
+    parser.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    parser.add_argument('--shingle-size', type=int, default=5)
+    parser.add_argument('--num-perm', type=int, default=128)
+    parser.add_argument('--bands', type=int, default=16)
+    parser.add_argument('--threshold', type=float, default=0.8, help="estimated Jaccard similarity")
+    parser.add_argument('--save', default=None, help="write the DuplicateMap, e.g. indexes/duplicates.idx")
+    args = parser.parse_args()
+
+    lexicon = Lexicon(load_stop_words(args.stop_words), args.tokenizer)
+    collections = [f"Data_C{query_id[1:]}" for query_id in parse_queries(args.queries)]
+    start = time.perf_counter()
+    duplicates = find_duplicates(args.data, collections, lexicon, args.tokenizer, args.shingle_size, args.num_perm,
+                                 args.bands, args.threshold)
+    removable = sum(len(duplicates.duplicates(collection)) for collection in collections)
+    print(f"{len(duplicates.clusters)} clusters covering {sum(map(len, duplicates.clusters))} documents, "
+          f"{len(duplicates.cross_collection_clusters())} spanning collections; {removable} documents "
+          f"can be left out of the indexes ({time.perf_counter() - start:.2f}s)")
+    if args.save:
+        # index imports this module for build_all, so it is only imported here
+        from index import save_index
+        save_index(duplicates, args.save)
+
+
+if __name__ == "__main__":
+    main()
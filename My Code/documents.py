@@ -0,0 +1,141 @@
+import argparse
+import codecs
+import os
+import re
+import time
+import tracemalloc
+from array import array
+from collections import Counter
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words, parse_queries, process_text
+from lexicon import Lexicon
+
+XML_DECLARATION_RE = re.compile(rb'^\s*<\?xml[^>]*?\sencoding\s*=\s*["\']([A-Za-z][A-Za-z0-9._-]*)["\']')
+# Checked before the declaration, which a byte order mark or a UTF-16 encoding would hide from the regex
+BYTE_ORDER_MARKS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+class DocumentRecord:
+    """
+    One analysed document as sorted (term id, tf) pairs held in two unsigned int arrays,
+    instead of a list with one string reference per token. This only shrinks documents while they are
+    loaded and analysed; CollectionIndex.add_record maps the ids back to string-keyed postings, so a
+    built index takes as much memory as before.
+    """
+
+    __slots__ = ('doc_id', 'length', 'term_ids', 'tfs')
+
+    def __init__(self, doc_id, length, term_ids, tfs):
+        self.doc_id = doc_id
+        self.length = length            # number of indexed tokens
+        self.term_ids = term_ids        # array('I') of ascending term ids
+        self.tfs = tfs                  # array('I') of matching term frequencies
+
+    @classmethod
+    def from_term_ids(cls, doc_id, ids):
+        counts = sorted(Counter(ids).items())
+        return cls(doc_id, len(ids), array('I', [term_id for term_id, _ in counts]),
+                   array('I', [tf for _, tf in counts]))
+
+    def __len__(self):
+        return self.length
+
+    def items(self):
+        return zip(self.term_ids, self.tfs)
+
+    def __repr__(self):
+        return f"DocumentRecord({self.doc_id!r}, length={self.length}, terms={len(self.term_ids)})"
+
+
+def declared_encoding(data, default='utf-8'):
+    """
+    Encoding named by a document's byte order mark or XML declaration, or default when it has none Python knows.
+    """
+    for mark, encoding in BYTE_ORDER_MARKS:
+        if data.startswith(mark):
+            return encoding
+    match = XML_DECLARATION_RE.match(data)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return default
+
+
+def read_collection_bytes(directory_path):
+    """
+    Yield (file name, raw bytes, declared encoding) for every document of a collection in file name order.
+    """
+    for filename in sorted(os.listdir(directory_path)):
+        with open(os.path.join(directory_path, filename), 'rb') as file:
+            data = file.read()
+        yield filename, data.strip(), declared_encoding(data)
+
+
+def read_collection(directory_path):
+    """
+    Yield (file name, text) for every document of a collection in file name order, decoded with the
+    encoding its XML declaration names.
+    """
+    for filename, data, encoding in read_collection_bytes(directory_path):
+        yield filename, data.decode(encoding).strip()
+
+
+def load_documents(directory_path, lexicon, tokenizer=None):
+    """
+    Analyse every document of a collection into DocumentRecords.
+    """
+    return [DocumentRecord.from_term_ids(filename, lexicon.analyze_ids(text, tokenizer))
+            for filename, text in read_collection(directory_path)]
+
+
+def measure(load):
+    """
+    Run a loader under tracemalloc; returns (result, peak bytes, seconds).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of token lists and DocumentRecords "
+                                                 "when loading every collection, before any index is built.")
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--stop-words', default=paths.STOP_WORDS_FILE)
+    parser.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    args = parser.parse_args()
+
+    stop_words = load_stop_words(args.stop_words)
+    directories = [paths.collection_directory(query_id, args.data) for query_id in parse_queries(args.queries)]
+
+    def load_token_lists():
+        documents = {}
+        for directory in directories:
+            for filename, text in read_collection(directory):
+                documents[(directory, filename)] = process_text(text, stop_words, args.tokenizer)
+        return documents
+
+    def load_records():
+        lexicon = Lexicon(stop_words, args.tokenizer)
+        return lexicon, [record for directory in directories for record in load_documents(directory, lexicon)]
+
+    token_lists, list_peak, list_time = measure(load_token_lists)
+    tokens = sum(len(tokens) for tokens in token_lists.values())
+    del token_lists
+    (lexicon, records), record_peak, record_time = measure(load_records)
+    print(f"{len(records)} documents, {tokens} tokens, {len(lexicon)} terms")
+    print(f"dict of token lists: peak {list_peak / 2**20:8.1f} MiB in {list_time:.2f}s")
+    print(f"DocumentRecords:     peak {record_peak / 2**20:8.1f} MiB in {record_time:.2f}s "
+          f"({list_peak / record_peak:.1f}x less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words
+from evaluation import parse_runs
+from index import build_index, index_path, load_index
+from lexicon import Lexicon, analyze_queries
+from models import MODEL_REGISTRY, CollectionStatistics, get_models, score_models
+from run_writer import ranked
+from scaling_benchmark import legacy_ingest, load_legacy
+
+ENGINES = ('legacy', 'registry', 'saved')
+LEGACY_MODELS = ('bm25', 'jm_lm')
+
+# Reference runs as model name -> path prefix of the per-topic ranking files. Task4.py scored every
+# topic against every collection and only kept the last one, so its RankingOutputs all rank Data_C150.
+REFERENCE_SETS = {
+    'new-2': {'runs': {'bm25': os.path.join(paths.REPO_ROOT, 'My Code', 'RankingOutputs-New-2', 'BM25_'),
+                       'jm_lm': os.path.join(paths.REPO_ROOT, 'My Code', 'RankingOutputs-New-2', 'JM_LM_')},
+              'collection': None},
+    'original': {'runs': {'bm25_log10': os.path.join(paths.REPO_ROOT, 'RankingOutputs', 'BM25_'),
+                          'jm_lm': os.path.join(paths.REPO_ROOT, 'RankingOutputs', 'JM_')},
+                 'collection': 'R150'},
+}
+DEFAULT_TOLERANCES = {'score': 1e-9, 'tau': 1.0, 'overlap': 1.0}
+
+
+def read_ranking(results_file):
+    """
+    (doc_id, score) pairs of a tab or space separated ranking file, in file order.
+    """
+    with open(results_file) as f:
+        return [(fields[0], float(fields[1])) for fields in (line.split() for line in f) if len(fields) >= 2]
+
+
+def tied_pairs(starts):
+    """
+    Number of tied pairs in a sorted array, given the mask of positions that start a new run of equal values.
+    """
+    lengths = np.diff(np.append(np.flatnonzero(starts), len(starts)))
+    return int((lengths * (lengths - 1) // 2).sum())
+
+
+def count_inversions(values):
+    """
+    Number of pairs i < j with values[i] > values[j], by bottom-up merge sort. At each level every element
+    of a right-hand block counts the larger elements of its left-hand neighbour with one searchsorted
+    over block-offset ranks; a stable sort of two sorted runs then merges the blocks in linear time.
+    """
+    n = len(values)
+    ranks = np.unique(values, return_inverse=True)[1].astype(np.int64).ravel()
+    positions = np.arange(n, dtype=np.int64)
+    inversions, width = 0, 1
+    while width < n:
+        blocks = positions // width
+        keys = blocks * n + ranks
+        right = blocks % 2 == 1
+        larger = blocks[right] * width - np.searchsorted(keys, keys[right] - n, side='right')
+        inversions += int(larger.sum())
+        width *= 2
+        ranks = np.sort((positions // width) * n + ranks, kind='stable') % n
+    return inversions
+
+
+def kendall_tau(x, y):
+    """
+    Kendall tau-b between two score vectors over the same documents, with Knight's O(n log n) algorithm;
+    1.0 when neither has any variation, 0.0 when only one has none.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = len(x)
+    pairs = n * (n - 1) // 2
+    # Ordered by x and then y, a discordant pair is one where y decreases
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    new_x = np.diff(x, prepend=np.nan) != 0
+    x_ties = tied_pairs(new_x)
+    y_ties = tied_pairs(np.diff(np.sort(y), prepend=np.nan) != 0)
+    joint_ties = tied_pairs(new_x | (np.diff(y, prepend=np.nan) != 0))
+    denominator = math.sqrt(float(pairs - x_ties) * float(pairs - y_ties))
+    if denominator == 0:
+        return 1.0 if pairs == x_ties and pairs == y_ties else 0.0
+    discordant = count_inversions(y)
+    return (pairs - x_ties - y_ties + joint_ties - 2 * discordant) / denominator
+
+
+def top_k_overlap(reference_ids, candidate_ids, k):
+    """
+    Fraction of the reference's top k documents that are also in the candidate's top k.
+    """
+    k = min(k, len(reference_ids))
+    return len(set(reference_ids[:k]) & set(candidate_ids[:k])) / k if k else 1.0
+
+
+def compare_ranking(reference, scores, k=10, tolerances=DEFAULT_TOLERANCES):
+    """
+    Align a candidate {doc_id: score} dictionary with a reference ranking and measure how far it drifted.
+    """
+    reference_scores = dict(reference)
+    common = [doc_id for doc_id, _ in reference if doc_id in scores]
+    expected = np.array([reference_scores[doc_id] for doc_id in common])
+    actual = np.array([scores[doc_id] for doc_id in common])
+    result = {
+        'documents': len(reference),
+        'missing': len(reference) - len(common),
+        'extra': len(set(scores) - set(reference_scores)),
+        'max_delta': float(np.abs(actual - expected).max()) if common else 0.0,
+        'tau': kendall_tau(expected, actual),
+        'overlap': top_k_overlap([doc_id for doc_id, _ in reference], [doc_id for doc_id, _ in ranked(scores)], k),
+    }
+    result['passed'] = (result['missing'] == 0 and result['extra'] == 0 and result['max_delta'] <= tolerances['score']
+                        and result['tau'] >= tolerances['tau'] and result['overlap'] >= tolerances['overlap'])
+    return result
+
+
+def run_engine(engine, topics, model_names, stop_words, tokenizer, lexicon, index_directory=paths.INDEX_DIRECTORY):
+    """
+    Ingest and score every (query_id, query, directory) topic with one engine.
+    Returns ({model name: {query_id: {doc_id: score}}}, seconds).
+    """
+    scores = {name: {} for name in model_names}
+    legacy = load_legacy() if engine == 'legacy' else None
+    models = get_models(model_names)
+    start = time.perf_counter()
+    for query_id, query, directory in topics:
+        if engine == 'legacy':
+            documents, df, frequency = legacy_ingest(directory, stop_words, tokenizer, legacy)
+            N = len(documents)
+            avgdl = sum(len(doc) for doc in documents.values()) / N
+            if 'bm25' in scores:
+                scores['bm25'][query_id] = legacy.calculate_bm25(N, avgdl, documents, {query_id: query}, df)[query_id]
+            if 'jm_lm' in scores:
+                scores['jm_lm'][query_id] = legacy.calculate_jm_scores({query_id: query}, documents, frequency,
+                                                                       sum(frequency.values()))[query_id]
+            continue
+        if engine == 'saved':
+            index = load_index(index_path(index_directory, os.path.basename(directory)))
+        else:
+            index = build_index(directory, stop_words, tokenizer=tokenizer, lexicon=lexicon)
+        for name, values in score_models(CollectionStatistics(index), query, models).items():
+            scores[name][query_id] = dict(zip(index.doc_ids, values.tolist()))
+    return scores, time.perf_counter() - start
+
+
+def supported_models(engine):
+    return LEGACY_MODELS if engine == 'legacy' else tuple(MODEL_REGISTRY)
+
+
+def check_equivalence(references, scores, k=10, tolerances=DEFAULT_TOLERANCES):
+    """
+    Compare every model's scores with its reference run topic by topic; topics without a reference file are skipped.
+    """
+    results = {}
+    for name, run_prefix in references.items():
+        results[name] = {}
+        for query_id, topic_scores in scores[name].items():
+            results_file = f"{run_prefix}{query_id}Ranking.dat"
+            if os.path.exists(results_file):
+                results[name][query_id] = compare_ranking(read_ranking(results_file), topic_scores, k, tolerances)
+    return results
+
+
+def print_summary(results, timings):
+    print(f"{'Model':<12} {'Topics':>6} {'Failed':>6} {'Max delta':>10} {'Min tau':>8} {'Min overlap':>11}")
+    for name, topics in results.items():
+        values = list(topics.values())
+        failed = [query_id for query_id, result in topics.items() if not result['passed']]
+        print(f"{name:<12} {len(values):>6} {len(failed):>6} {max((r['max_delta'] for r in values), default=0):>10.3g} "
+              f"{min((r['tau'] for r in values), default=1):>8.4f} {min((r['overlap'] for r in values), default=1):>11.2f}")
+        for query_id in failed:
+            result = topics[query_id]
+            print(f"    {query_id}: missing {result['missing']} extra {result['extra']} "
+                  f"delta {result['max_delta']:.3g} tau {result['tau']:.4f} overlap {result['overlap']:.2f}")
+    line = f"engine {timings['engine_seconds']:.2f}s"
+    if timings.get('baseline_seconds') is not None:
+        line += f", baseline {timings['baseline_seconds']:.2f}s, speedup {timings['speedup']:.1f}x"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that an engine reproduces the reference rankings.")
+    parser.add_argument('--engine', choices=ENGINES, default='registry')
+    parser.add_argument('--baseline', choices=ENGINES + ('none',), default='legacy',
+                        help="engine timed for the speedup, 'none' to skip it")
+    parser.add_argument('--reference-set', choices=tuple(REFERENCE_SETS), default='new-2')
+    parser.add_argument('--reference', action='append',
+                        help="MODEL=path prefix, replaces the reference set, e.g. bm25='RankingOutputs-New-2/BM25_'")
+    parser.add_argument('--collections', type=int, nargs='*', default=None, help="e.g. 101 102, defaults to all")
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--stop-words', default=paths.STOP_WORDS_FILE)
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY, help="indexes read by the 'saved' engine")
+    parser.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    parser.add_argument('--k', type=int, default=10, help="depth of the top-k overlap")
+    parser.add_argument('--score-tol', type=float, default=DEFAULT_TOLERANCES['score'])
+    parser.add_argument('--min-tau', type=float, default=DEFAULT_TOLERANCES['tau'])
+    parser.add_argument('--min-overlap', type=float, default=DEFAULT_TOLERANCES['overlap'])
+    parser.add_argument('--report', default=None, help="optional JSON file for the full per-topic results")
+    args = parser.parse_args()
+
+    if args.reference:
+        references, collection = parse_runs(args.reference), None
+    else:
+        references, collection = REFERENCE_SETS[args.reference_set]['runs'], REFERENCE_SETS[args.reference_set]['collection']
+    model_names = list(references)
+    for engine in (args.engine, args.baseline):
+        unsupported = [name for name in model_names if engine != 'none' and name not in supported_models(engine)]
+        if unsupported:
+            parser.error(f"engine '{engine}' cannot score {', '.join(unsupported)}")
+    tolerances = {'score': args.score_tol, 'tau': args.min_tau, 'overlap': args.min_overlap}
+
+    stop_words = load_stop_words(args.stop_words)
+    lexicon = Lexicon(stop_words, args.tokenizer)
+    queries = analyze_queries(args.queries, lexicon)
+    topics = [(query_id, query, paths.collection_directory(collection or query_id, args.data))
+              for query_id, query in queries.items()
+              if args.collections is None or int(query_id[1:]) in args.collections]
+
+    scores, seconds = run_engine(args.engine, topics, model_names, stop_words, args.tokenizer, lexicon, args.index_dir)
+    timings = {'engine': args.engine, 'engine_seconds': seconds, 'baseline': args.baseline, 'baseline_seconds': None}
+    if args.baseline != 'none':
+        _, timings['baseline_seconds'] = run_engine(args.baseline, topics, model_names, stop_words, args.tokenizer,
+                                                    lexicon, args.index_dir)
+        timings['speedup'] = timings['baseline_seconds'] / seconds if seconds else float('inf')
+    results = check_equivalence(references, scores, args.k, tolerances)
+    print_summary(results, timings)
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump({'tolerances': tolerances, 'timings': timings, 'results': results}, file, indent=1, sort_keys=True)
+    if not all(result['passed'] for topics in results.values() for result in topics.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
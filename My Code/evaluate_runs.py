@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import paths
+from evaluation import METRICS, evaluate_relevance, print_performance_table, read_ranked_doc_ids
+from qrels import benchmark_files, fingerprint, load_qrels
+
+RUN_FILE_RE = re.compile(r'^(?P<prefix>.+_)(?P<query_id>R\d+)Ranking\.dat$')
+SKIPPED_DIRECTORIES = {'__pycache__', 'indexes', '.git'}
+DEFAULT_CACHE = os.path.join(paths.INDEX_DIRECTORY, 'evaluation-cache.json')
+
+
+def discover_runs(roots, prefixes=None):
+    """
+    Find every run under the given directories: each distinct '{prefix}R1xxRanking.dat' file prefix in a folder.
+    Returns {name: path prefix} with names like 'Outputs-Task1-New/BM25', optionally only for the given prefixes.
+    With several roots each name starts with its root's folder name; two runs that still share a name
+    raise a ValueError rather than one silently replacing the other.
+    """
+    runs = {}
+    for root in roots:
+        label = os.path.basename(os.path.normpath(os.path.abspath(root))) if len(roots) > 1 else '.'
+        for directory, subdirectories, filenames in os.walk(root):
+            subdirectories[:] = sorted(name for name in subdirectories if name not in SKIPPED_DIRECTORIES)
+            found = sorted({match.group('prefix') for match in map(RUN_FILE_RE.match, filenames) if match})
+            for prefix in found:
+                if prefixes is None or prefix in prefixes:
+                    relative = os.path.normpath(os.path.join(label, os.path.relpath(directory, root)))
+                    name = prefix.rstrip('_') if relative == '.' else f"{relative}/{prefix.rstrip('_')}"
+                    run_prefix = os.path.join(directory, prefix)
+                    if name in runs and runs[name] != run_prefix:
+                        raise ValueError(f"Runs {runs[name]!r} and {run_prefix!r} are both named '{name}'")
+                    runs[name] = run_prefix
+    return runs
+
+
+def run_hash(run_prefix, query_ids, judgements):
+    """
+    SHA-256 of the run's ranking files together with the judgements fingerprint, as the cache key.
+    """
+    digest = hashlib.sha256('\n'.join(judgements).encode())
+    for query_id in query_ids:
+        results_file = f"{run_prefix}{query_id}Ranking.dat"
+        if os.path.exists(results_file):
+            digest.update(query_id.encode())
+            with open(results_file, 'rb') as file:
+                digest.update(hashlib.file_digest(file, 'sha256').digest())
+    return digest.hexdigest()
+
+
+def evaluate_all_metrics(run_prefix, query_ids, benchmark_folder=paths.BENCHMARK_DIRECTORY):
+    """
+    (ri, recall, map) of one run for every query in a single read of each file; None where a ranking
+    or the judgements are missing.
+    """
+    qrels = load_qrels(benchmark_folder)
+    results = {}
+    for query_id in query_ids:
+        results_file = f"{run_prefix}{query_id}Ranking.dat"
+        if query_id in qrels and os.path.exists(results_file):
+            relevant = qrels.gather(query_id, read_ranked_doc_ids(results_file)) > 0
+            results[query_id] = list(evaluate_relevance(relevant, qrels.relevant_count(query_id)))
+        else:
+            results[query_id] = None
+    return results
+
+
+def load_cache(cache_path):
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            return json.load(file)
+    return {}
+
+
+def save_cache(cache, cache_path):
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    temp_path = f"{cache_path}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(cache, file, sort_keys=True)
+    os.replace(temp_path, cache_path)
+
+
+def evaluate_runs(runs, query_ids, benchmark_folder=paths.BENCHMARK_DIRECTORY, cache_path=DEFAULT_CACHE,
+                  workers=None):
+    """
+    Evaluate every run on a process pool, reusing cached results for runs whose files have not changed.
+    Returns ({run name: {query_id: (ri, recall, map) or None}}, number of runs evaluated rather than cached).
+    """
+    judgements = fingerprint(benchmark_files(benchmark_folder)).tolist()
+    # Build the binary qrels cache once so the workers only read it
+    load_qrels(benchmark_folder)
+    cache = load_cache(cache_path)
+    keys = {name: run_hash(run_prefix, query_ids, judgements) for name, run_prefix in runs.items()}
+    missing = {name: run_prefix for name, run_prefix in runs.items() if keys[name] not in cache}
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(evaluate_all_metrics, run_prefix, query_ids, benchmark_folder)
+                       for name, run_prefix in missing.items()}
+            for name, future in futures.items():
+                cache[keys[name]] = future.result()
+        if cache_path:
+            save_cache(cache, cache_path)
+    return {name: cache[keys[name]] for name in runs}, len(missing)
+
+
+def metric_columns(results, query_ids, metric):
+    """
+    Per-topic matrix of one metric (rows are queries, columns runs), NaN where a result is missing.
+    """
+    position = {'ri': 0, 'recall': 1, 'map': 2}[metric]
+    return np.array([[np.nan if topics.get(query_id) is None else topics[query_id][position]
+                      for topics in results.values()] for query_id in query_ids], dtype=np.float64)
+
+
+def print_comparison(results, query_ids, sort_metric=None):
+    averages = {metric: np.nanmean(metric_columns(results, query_ids, metric), axis=0) if results else []
+                for metric in METRICS}
+    topics = [sum(value is not None for value in results[name].values()) for name in results]
+    rows = list(zip(results, topics, averages['map'], averages['recall'], averages['ri']))
+    if sort_metric:
+        column = {'map': 2, 'recall': 3, 'ri': 4}[sort_metric]
+        rows.sort(key=lambda row: -np.nan_to_num(row[column], nan=-np.inf))
+    width = max([len(name) for name in results] + [3])
+    print(f"{'Run':<{width}} | {'Topics':>6} | {'MAP':>8} | {'Recall':>8} | {'RI':>8}")
+    print("-" * (width + 42))
+    for name, count, map1, recall, ri in rows:
+        print(f"{name:<{width}} | {count:>6} | {map1:>8.4f} | {recall:>8.4f} | {ri:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover ranking runs and evaluate them all in parallel.")
+    parser.add_argument('roots', nargs='*', default=[os.path.join(paths.REPO_ROOT, 'My Code')],
+                        help="directories searched for run folders, defaults to 'My Code'")
+    parser.add_argument('--prefix', action='append', help="only runs with this file prefix, e.g. BM25_ (repeatable)")
+    parser.add_argument('--benchmark', default=paths.BENCHMARK_DIRECTORY)
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="results cache, '' to disable")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sort', choices=METRICS, default=None, help="order the table by this metric")
+    parser.add_argument('--per-topic', choices=METRICS, default=None, help="also print the per-topic table")
+    args = parser.parse_args()
+
+    try:
+        runs = discover_runs(args.roots, set(args.prefix) if args.prefix else None)
+    except ValueError as error:
+        parser.error(str(error))
+    if not runs:
+        parser.error(f"no '*_R1xxRanking.dat' runs found under {', '.join(args.roots)}")
+    query_ids = [f"R{query_id}" for query_id in range(101, 151)]
+    start = time.perf_counter()
+    results, evaluated = evaluate_runs(runs, query_ids, args.benchmark, args.cache, args.workers)
+    print_comparison(results, query_ids, args.sort)
+    if args.per_topic:
+        print()
+        print_performance_table(query_ids, list(results), metric_columns(results, query_ids, args.per_topic))
+    print(f"\n{len(runs)} runs, {evaluated} evaluated and {len(runs) - evaluated} from the cache, "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
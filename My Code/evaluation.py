@@ -0,0 +1,107 @@
+import argparse
+import os
+
+import numpy as np
+
+import paths
+from qrels import load_qrels
+
+METRICS = ('map', 'recall', 'ri')
+
+# Runs compared by default, as name -> path prefix of the per-topic ranking files
+DEFAULT_RUNS = {
+    'BM25': os.path.join(paths.REPO_ROOT, 'My Code', 'RankingOutputs-New-2', 'BM25_'),
+    'JM_LM': os.path.join(paths.REPO_ROOT, 'My Code', 'RankingOutputs-New-2', 'JM_LM_'),
+    'My_PRM': os.path.join(paths.REPO_ROOT, 'My Code', 'Outputs-Task3-New', 'My_PRM_'),
+}
+
+
+def read_ranked_doc_ids(results_file):
+    """
+    Document ids of a ranking file in rank order.
+    """
+    with open(results_file) as f:
+        return [line.split(None, 1)[0] for line in f if line.strip()]
+
+
+def evaluate_relevance(relevant, R):
+    """
+    Relevant documents retrieved, recall and mean precision at each retrieved relevant document of a
+    boolean is-relevant vector in rank order, with R relevant documents judged; returns (ri, recall, map1).
+    """
+    if R == 0:
+        return 0, 0, 0
+    hits = np.flatnonzero(relevant)
+    ri = len(hits)
+    map1 = float((np.arange(1, ri + 1) / (hits + 1)).mean()) if ri else 0
+    return ri, ri / R, map1
+
+
+def evaluate_run(run_prefix, query_ids, benchmark_folder=paths.BENCHMARK_DIRECTORY, metric='map', qrels=None):
+    """
+    Evaluate one run for every query; queries without a ranking or judgements map to None.
+    Judgements come from the qrels store, loaded once from its binary cache when not given.
+    """
+    if qrels is None:
+        qrels = load_qrels(benchmark_folder)
+    position = {'ri': 0, 'recall': 1, 'map': 2}[metric]
+    results = {}
+    for query_id in query_ids:
+        results_file = f"{run_prefix}{query_id}Ranking.dat"
+        if query_id in qrels and os.path.exists(results_file):
+            relevant = qrels.gather(query_id, read_ranked_doc_ids(results_file)) > 0
+            results[query_id] = evaluate_relevance(relevant, qrels.relevant_count(query_id))[position]
+        else:
+            results[query_id] = None
+    return results
+
+
+def metric_matrix(runs, query_ids, benchmark_folder=paths.BENCHMARK_DIRECTORY, metric='map', qrels=None):
+    """
+    Build the per-topic metric matrix (one row per query, one column per run); missing results are NaN.
+    """
+    if qrels is None:
+        qrels = load_qrels(benchmark_folder)
+    matrix = np.full((len(query_ids), len(runs)), np.nan)
+    for column, run_prefix in enumerate(runs.values()):
+        results = evaluate_run(run_prefix, query_ids, benchmark_folder, metric, qrels)
+        for row, query_id in enumerate(query_ids):
+            if results[query_id] is not None:
+                matrix[row, column] = results[query_id]
+    return matrix
+
+
+def parse_runs(run_specs):
+    """
+    Turn 'NAME=path/prefix_' command line arguments into an ordered run dictionary.
+    """
+    runs = {}
+    for spec in run_specs:
+        name, _, prefix = spec.partition('=')
+        runs[name] = prefix
+    return runs
+
+
+def print_performance_table(query_ids, run_names, matrix):
+    print(f"{'Topic':<10} | " + " | ".join(f"{name:<10}" for name in run_names))
+    print("-" * (13 * (len(run_names) + 1)))
+    for query_id, row in zip(query_ids, matrix):
+        print(f"{query_id:<10} | " + " | ".join("N/A".ljust(10) if np.isnan(v) else f"{v:<10.4f}" for v in row))
+    print(f"{'Average':<10} | " + " | ".join(f"{v:<10.4f}" for v in np.nanmean(matrix, axis=0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-topic evaluation of ranking runs against the benchmark.")
+    parser.add_argument('--run', action='append', help="NAME=path prefix, e.g. BM25='RankingOutputs-New-2/BM25_'")
+    parser.add_argument('--metric', choices=METRICS, default='map')
+    parser.add_argument('--benchmark', default=paths.BENCHMARK_DIRECTORY)
+    args = parser.parse_args()
+
+    runs = parse_runs(args.run) if args.run else DEFAULT_RUNS
+    query_ids = [f"R{query_id}" for query_id in range(101, 151)]
+    matrix = metric_matrix(runs, query_ids, args.benchmark, args.metric)
+    print_performance_table(query_ids, list(runs), matrix)
+
+
+if __name__ == "__main__":
+    main()
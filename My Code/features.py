@@ -0,0 +1,136 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import paths
+from bm25f import FIELDS, BM25F, build_fielded_index, fielded_path
+from index import index_path, load_index, save_index
+from models import MODEL_REGISTRY, CollectionStatistics, get_models, score_models
+from qrels import load_qrels
+from weighted_query import query_terms
+
+OUTPUT_FORMATS = ('svmlight', 'numpy', 'both')
+
+
+def feature_names(model_names):
+    return ([*model_names, 'bm25f', 'doc_length', 'matched_terms', 'coverage']
+            + [f"{field}_matches" for field in FIELDS])
+
+
+def topic_features(index, fielded, query, models, k=100, candidate_model='bm25'):
+    """
+    Feature rows for the top-k candidates of one topic, every model scored in a single pass over the postings.
+    Returns (candidate document numbers, float32 matrix with one column per feature_names entry).
+    """
+    stats = CollectionStatistics(index)
+    scores = score_models(stats, query, models)
+    ranking = scores[candidate_model]
+    candidates = np.lexsort((np.arange(index.N), -ranking))[:k]
+    columns = [scores[model.name][candidates] for model in models]
+
+    # BM25F and the field matches come from the fielded index, which numbers documents by the same file order
+    fielded_numbers = {doc_id: doc for doc, doc_id in enumerate(fielded.doc_ids)}
+    fielded_candidates = np.array([fielded_numbers[index.doc_ids[doc]] for doc in candidates], dtype=np.int64)
+    bm25f = BM25F()
+    columns.append(bm25f.score(fielded, bm25f.prepare(fielded), query)[fielded_candidates])
+    columns.append(stats.doc_lengths[candidates])
+
+    terms = query_terms(query)
+    matched = np.zeros(len(candidates))
+    field_matches = np.zeros((len(candidates), len(fielded.fields)))
+    for term in terms:
+        found = stats.postings(term)
+        if found is not None:
+            matched += np.isin(candidates, found[0])
+        field_postings = fielded.postings.get(term, {})
+        for row, doc in enumerate(fielded_candidates.tolist()):
+            if doc in field_postings:
+                field_matches[row] += np.array(field_postings[doc]) > 0
+    columns.append(matched)
+    columns.append(matched / len(terms) if terms else matched)
+    columns.extend(field_matches.T)
+    return candidates, np.column_stack(columns).astype(np.float32)
+
+
+def extract_topic(index_directory, data_directory, query_id, query, model_names, k, candidate_model):
+    """
+    Load (or build) one topic's collection and fielded index in a worker and extract its feature rows.
+    """
+    collection = f"Data_C{query_id[1:]}"
+    index = load_index(index_path(index_directory, collection))
+    file_path = fielded_path(index_directory, collection)
+    if os.path.exists(file_path):
+        fielded = load_index(file_path)
+    else:
+        lexicon = load_index(os.path.join(index_directory, 'lexicon.idx'))
+        fielded = build_fielded_index(paths.collection_directory(query_id, data_directory), lexicon)
+        save_index(fielded, file_path)
+    candidates, features = topic_features(index, fielded, query, get_models(model_names), k, candidate_model)
+    return query_id, [index.doc_ids[doc] for doc in candidates], features
+
+
+def extract_features(index_directory, data_directory, queries, model_names, k=100, candidate_model='bm25',
+                     workers=None):
+    """
+    Extract every topic's feature rows in parallel, one topic per task, in query order.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(extract_topic, index_directory, data_directory, query_id, query, model_names,
+                                   k, candidate_model) for query_id, query in queries.items()]
+        return [future.result() for future in futures]
+
+
+def write_svmlight(file_path, features, labels, query_ids, doc_ids, names):
+    """
+    One 'label qid:101 1:value ... # doc_id' line per candidate, features numbered from 1.
+    """
+    with open(file_path, 'w') as file:
+        file.write(f"# {' '.join(f'{number}:{name}' for number, name in enumerate(names, start=1))}\n")
+        for row, label, query_id, doc_id in zip(features, labels.tolist(), query_ids, doc_ids):
+            values = ' '.join(f"{number}:{value:.7g}" for number, value in enumerate(row.tolist(), start=1))
+            file.write(f"{label} qid:{query_id[1:]} {values} # {doc_id}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Learning-to-rank features for the top-k candidates of every topic.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY, help="read to build missing fielded indexes")
+    parser.add_argument('--benchmark', default=paths.BENCHMARK_DIRECTORY)
+    parser.add_argument('--model', action='append', choices=tuple(MODEL_REGISTRY),
+                        help="repeatable, defaults to every registered model")
+    parser.add_argument('--candidate-model', choices=tuple(MODEL_REGISTRY), default='bm25')
+    parser.add_argument('--k', type=int, default=100, help="candidates per topic")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='features', help="path without extension")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='both')
+    args = parser.parse_args()
+
+    model_names = args.model or list(MODEL_REGISTRY)
+    if args.candidate_model not in model_names:
+        model_names.append(args.candidate_model)
+    queries = load_index(os.path.join(args.index_dir, 'queries.idx'))
+    start = time.perf_counter()
+    results = extract_features(args.index_dir, args.data, queries, model_names, args.k, args.candidate_model,
+                               args.workers)
+    qrels = load_qrels(args.benchmark)
+    features = np.concatenate([rows for _, _, rows in results])
+    labels = np.concatenate([qrels.gather(query_id, doc_ids) for query_id, doc_ids, _ in results]).astype(np.int8)
+    query_ids = [query_id for query_id, doc_ids, _ in results for _ in doc_ids]
+    doc_ids = [doc_id for _, topic_doc_ids, _ in results for doc_id in topic_doc_ids]
+    names = feature_names(model_names)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    if args.format in ('numpy', 'both'):
+        np.savez(f"{args.output}.npz", features=features, labels=labels, query_ids=np.array(query_ids),
+                 doc_ids=np.array(doc_ids), feature_names=np.array(names))
+    if args.format in ('svmlight', 'both'):
+        write_svmlight(f"{args.output}.svm", features, labels, query_ids, doc_ids, names)
+    print(f"{features.shape[0]} candidates x {features.shape[1]} features over {len(results)} topics, "
+          f"{int((labels > 0).sum())} relevant, in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import heapq
+import math
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import paths
+from analysis import parse_queries
+from ranking import save_scores, top_k
+
+FUSION_METHODS = ('combsum', 'combmnz', 'rrf')
+NORMALISATIONS = ('none', 'minmax', 'sum', 'zscore')
+
+
+DEFAULT_DEPTH = 1000
+
+
+def read_run(file_path, depth=DEFAULT_DEPTH):
+    """
+    Lazily yield (doc_id, score) pairs from a ranking .dat file, stopping after depth lines.
+    """
+    with open(file_path, 'r') as file:
+        for line in islice(file, depth):
+            fields = line.split()
+            if len(fields) >= 2:
+                yield fields[0], float(fields[1])
+
+
+class RunFile:
+    """
+    A saved ranking that is re-read from disk each time it is iterated, so normalise() can take its
+    score range in a first pass and rescale in a second without holding the ranking in memory.
+    """
+
+    def __init__(self, file_path, depth=DEFAULT_DEPTH):
+        self.file_path = file_path
+        self.depth = depth
+
+    def __iter__(self):
+        return read_run(self.file_path, self.depth)
+
+
+def score_summary(ranking):
+    """
+    (count, highest, lowest, sum, sum of squares) of a ranking's scores, in one pass without storing it.
+    For a best-first ranking the highest and lowest are simply its head and its tail.
+    """
+    count, high, low, total, squares = 0, -math.inf, math.inf, 0.0, 0.0
+    for _, score in ranking:
+        count += 1
+        high, low = max(high, score), min(low, score)
+        total += score
+        squares += score * score
+    return count, high, low, total, squares
+
+
+def normalise(ranking, method='minmax', depth=None):
+    """
+    Lazily rescale the first depth scores of one ranked list so runs with different score ranges can be
+    summed. Every method but 'none' reads the ranking twice, so it must be re-iterable (a list or a RunFile).
+    """
+    if method not in NORMALISATIONS:
+        raise ValueError(f"Unknown normalisation '{method}', expected one of {NORMALISATIONS}")
+    if method == 'none':
+        return islice(ranking, depth)
+    count, high, low, total, squares = score_summary(islice(ranking, depth))
+    if method == 'minmax':
+        span = high - low
+        return ((doc_id, (score - low) / span if span else 1.0) for doc_id, score in islice(ranking, depth))
+    if method == 'sum':
+        return ((doc_id, score / total if total else 0.0) for doc_id, score in islice(ranking, depth))
+    mean = total / count if count else 0.0
+    std = math.sqrt(max(squares / count - mean * mean, 0.0)) if count else 0.0
+    return ((doc_id, (score - mean) / std if std else 0.0) for doc_id, score in islice(ranking, depth))
+
+
+def fuse(rankings, method='combsum', normalisation='minmax', k=None, depth=DEFAULT_DEPTH, rrf_k=60):
+    """
+    Merge several best-first (doc_id, score) rankings for one topic into a fused top-k list.
+    Only the first `depth` entries of each ranking are read; CombSUM and CombMNZ read them twice
+    to normalise, so their rankings must be re-iterable.
+    """
+    fused = defaultdict(float)
+    hits = Counter()
+    for ranking in rankings:
+        if method == 'rrf':
+            for rank, (doc_id, _) in enumerate(islice(ranking, depth), start=1):
+                fused[doc_id] += 1.0 / (rrf_k + rank)
+        elif method in ('combsum', 'combmnz'):
+            for doc_id, score in normalise(ranking, normalisation, depth):
+                fused[doc_id] += score
+                hits[doc_id] += 1
+        else:
+            raise ValueError(f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}")
+    if method == 'combmnz':
+        for doc_id in fused:
+            fused[doc_id] *= hits[doc_id]
+    return heapq.nlargest(k or len(fused), fused.items(), key=lambda x: x[1])
+
+
+def run_file(run_prefix, query_id):
+    """
+    Ranking file of one topic for a run given as a path prefix such as 'RankingOutputs-New-2/BM25_'.
+    """
+    return f"{run_prefix}{query_id}Ranking.dat"
+
+
+def fuse_topic(query_id, run_prefixes, output_folder, prefix, method, normalisation, k, depth, rrf_k):
+    """
+    Fuse the saved runs of one topic and write the result; runs missing the topic are skipped.
+    """
+    runs = [RunFile(run_file(run_prefix, query_id), depth)
+            for run_prefix in run_prefixes if os.path.exists(run_file(run_prefix, query_id))]
+    fused = fuse(runs, method, normalisation, k, depth, rrf_k)
+    save_scores(dict(fused), output_folder, prefix, query_id)
+    return query_id, len(runs), len(fused)
+
+
+def fuse_runs(run_prefixes, query_ids, output_folder, prefix='Fused', method='combsum', normalisation='minmax',
+              k=None, depth=DEFAULT_DEPTH, rrf_k=60, workers=None):
+    """
+    Fuse saved runs for every topic in parallel, one topic per task.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fuse_topic, query_id, run_prefixes, output_folder, prefix,
+                                   method, normalisation, k, depth, rrf_k) for query_id in query_ids]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuse BM25, JM_LM and PRM rankings per topic.")
+    parser.add_argument('--run', action='append', required=True,
+                        help="path prefix of a run, e.g. 'RankingOutputs-New-2/BM25_' (repeat for each run)")
+    parser.add_argument('--method', choices=FUSION_METHODS, default='combsum')
+    parser.add_argument('--normalisation', choices=NORMALISATIONS, default='minmax')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help="entries read from each run per topic")
+    parser.add_argument('--k', type=int, default=None, help="length of each fused ranking")
+    parser.add_argument('--rrf-k', type=int, default=60)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--output', default='Outputs-Fusion')
+    parser.add_argument('--prefix', default=None, help="output file prefix, defaults to the method name")
+    args = parser.parse_args()
+
+    query_ids = list(parse_queries(args.queries))
+    results = fuse_runs(args.run, query_ids, args.output, args.prefix or args.method.upper(), args.method,
+                        args.normalisation, args.k, args.depth, args.rrf_k, args.workers)
+    for query_id, runs, fused in results:
+        print(f"{query_id}: fused {runs} runs into {fused} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+import paths
+from index import index_path, load_duplicates, load_index, save_index
+from run_writer import OUTPUT_FORMATS, RankingWriter
+from weighted_query import query_terms
+
+CHUNK_SIZE = 4096
+
+
+class ImpactIndex:
+    """
+    Postings of one collection ordered by quantised BM25 impact. Each term's documents are sorted by
+    impact, highest first, and grouped into segments that share one impact value.
+    """
+
+    def __init__(self, name, doc_ids, scale, bits):
+        self.name = name
+        self.doc_ids = doc_ids
+        self.scale = scale              # quantised impact units per unit of BM25 score
+        self.bits = bits
+        self.postings = {}              # term -> (segment impacts, segment starts plus end, documents)
+
+    @property
+    def N(self):
+        return len(self.doc_ids)
+
+
+def build_impact_index(index, k1=1.2, b=0.75, bits=8):
+    """
+    Precompute idf * tf weight for every posting of a CollectionIndex and quantise it to bits bits.
+    The idf is log(1 + (N - n + 0.5) / (n + 0.5)) so that every impact is positive.
+    """
+    if not 1 <= bits <= 16:
+        raise ValueError(f"Impacts are quantised to 1-16 bits, not {bits}")
+    N = index.N
+    K = k1 * ((1 - b) + b * np.array(index.doc_lengths, dtype=np.float64) / index.avgdl)
+    impacts = {}
+    for term, term_postings in index.postings.items():
+        docs = np.fromiter(term_postings.keys(), dtype=np.int64, count=len(term_postings))
+        tfs = np.fromiter(term_postings.values(), dtype=np.float64, count=len(term_postings))
+        idf = math.log(1 + (N - len(docs) + 0.5) / (len(docs) + 0.5))
+        impacts[term] = (docs, idf * (k1 + 1) * tfs / (K[docs] + tfs))
+    largest = max((values.max() for _, values in impacts.values()), default=1.0)
+    impact_index = ImpactIndex(index.name, index.doc_ids, ((1 << bits) - 1) / largest, bits)
+    for term, (docs, values) in impacts.items():
+        quantised = np.maximum(np.rint(values * impact_index.scale), 1).astype(np.int32)
+        order = np.lexsort((docs, -quantised))
+        quantised, docs = quantised[order], docs[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(quantised)) + 1, [len(docs)]))
+        impact_index.postings[term] = (quantised[starts[:-1]].astype(np.uint16), starts.astype(np.int32),
+                                       docs.astype(np.int32))
+    return impact_index
+
+
+def impact_path(index_directory, collection):
+    return os.path.join(index_directory, f"{collection}.imp")
+
+
+def score_at_a_time(index, query, k=10, time_budget=None, postings_budget=None, k2=500):
+    """
+    Anytime BM25 top-k: process the segments of all query terms in decreasing order of query weight times
+    impact until every posting is scored or a time (seconds) or postings budget runs out. The result is
+    provably exact, for the quantised scores, when no document's remaining upper bound can change the top k.
+    """
+    start = time.perf_counter()
+    terms = [((k2 + 1) * qf / (k2 + qf), *index.postings[term])
+             for term, qf in query_terms(query).items() if term in index.postings]
+    # Every segment of every term, highest weighted impact first; a term's own segments keep their order
+    queue = sorted(((float(weight * impacts[segment]), position, segment)
+                    for position, (weight, impacts, _, _) in enumerate(terms) for segment in range(len(impacts))),
+                   key=lambda item: (-item[0], item[1], item[2]))
+    remaining = [float(weight * impacts[0]) for weight, impacts, _, _ in terms]
+    accumulators = np.zeros(index.N)
+    processed = 0
+    exhausted = False
+    for contribution, position, segment in queue:
+        weight, impacts, starts, docs = terms[position]
+        begin, end = starts[segment], starts[segment + 1]
+        while begin < end:
+            if ((postings_budget is not None and processed >= postings_budget)
+                    or (time_budget is not None and time.perf_counter() - start >= time_budget)):
+                exhausted = True
+                break
+            stop = min(end, begin + CHUNK_SIZE)
+            if postings_budget is not None:
+                stop = min(stop, begin + postings_budget - processed)
+            accumulators[docs[begin:stop]] += contribution
+            processed += stop - begin
+            begin = stop
+        if exhausted:
+            break
+        remaining[position] = float(weight * impacts[segment + 1]) if segment + 1 < len(impacts) else 0.0
+
+    # Any document can still gain at most the sum of each term's next unprocessed impact
+    bound = sum(remaining) if exhausted else 0.0
+    count = min(k + 1, index.N)
+    candidates = np.argpartition(-accumulators, count - 1)[:count] if count < index.N else np.arange(index.N)
+    candidates = candidates[np.lexsort((candidates, -accumulators[candidates]))]
+    top = accumulators[candidates]
+    exact = bound == 0.0 or bool(np.all(top[:-1] - top[1:] > bound))
+    return {'results': [(index.doc_ids[doc], float(accumulators[doc]) / index.scale) for doc in candidates[:k]],
+            'exact': exact, 'bound': bound / index.scale, 'postings': processed,
+            'total_postings': sum(len(docs) for *_, docs in terms), 'seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anytime top-k BM25 over impact-ordered postings.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--output', default='RankingOutputs-Impact')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--time-budget', type=float, default=None, help="milliseconds per query")
+    parser.add_argument('--postings-budget', type=int, default=None, help="postings scored per query")
+    parser.add_argument('--bits', type=int, default=8, help="impact quantisation")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='dat')
+    parser.add_argument('--rebuild', action='store_true', help="rebuild impact indexes that already exist")
+    args = parser.parse_args()
+
+    queries = load_index(os.path.join(args.index_dir, 'queries.idx'))
+    time_budget = args.time_budget / 1000 if args.time_budget is not None else None
+    exact, processed, total, latencies = 0, 0, 0, []
+    with RankingWriter(args.output, 'BM25_IMPACT', args.format, args.k,
+                       duplicates=load_duplicates(args.index_dir)) as writer:
+        for query_id, query in queries.items():
+            collection = f"Data_C{query_id[1:]}"
+            file_path = impact_path(args.index_dir, collection)
+            if args.rebuild or not os.path.exists(file_path):
+                index = build_impact_index(load_index(index_path(args.index_dir, collection)), bits=args.bits)
+                save_index(index, file_path)
+            else:
+                index = load_index(file_path)
+            result = score_at_a_time(index, query, args.k, time_budget, args.postings_budget)
+            writer.write(query_id, dict(result['results']))
+            exact += result['exact']
+            processed += result['postings']
+            total += result['total_postings']
+            latencies.append(result['seconds'])
+    print(f"{exact}/{len(queries)} topics provably exact, {processed}/{total} postings scored, "
+          f"mean {1000 * sum(latencies) / len(latencies):.2f} ms, max {1000 * max(latencies):.2f} ms per query")
+
+
+if __name__ == "__main__":
+    main()
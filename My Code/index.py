@@ -0,0 +1,254 @@
+import argparse
+import importlib
+import os
+import pickle
+import sys
+import time
+from collections import Counter
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words, process_text
+from dedup import find_duplicates
+from documents import DocumentRecord, read_collection, read_collection_bytes
+from lexicon import Lexicon, analyze_queries
+from positional import PositionalIndex
+
+INDEX_VERSION = 1
+
+
+class CollectionIndex:
+    """
+    Inverted index for one document collection: postings, document lengths and corpus statistics.
+    """
+
+    def __init__(self, name=''):
+        self.name = name
+        self.doc_ids = []               # document number -> xml file name
+        self.doc_lengths = []           # document number -> number of indexed terms
+        self.postings = {}              # term -> {document number: term frequency}
+        self.corpus_frequency = Counter()
+        self.corpus_length = 0
+
+    @property
+    def N(self):
+        return len(self.doc_ids)
+
+    @property
+    def avgdl(self):
+        return self.corpus_length / self.N if self.N else 0.0
+
+    def df(self, term):
+        """
+        Number of documents in the collection that contain the term.
+        """
+        return len(self.postings.get(term, ()))
+
+    def add_document(self, doc_id, tokens):
+        """
+        Add one processed document to the index.
+        """
+        doc = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(len(tokens))
+        self.corpus_length += len(tokens)
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[doc] = tf
+            self.corpus_frequency[term] += tf
+        return doc
+
+    def add_record(self, record, terms):
+        """
+        Add one DocumentRecord, mapping its term ids back to stems through the lexicon's terms list.
+        The postings stay keyed by stem, so the record's compact arrays do not shrink the index itself.
+        """
+        doc = len(self.doc_ids)
+        self.doc_ids.append(record.doc_id)
+        self.doc_lengths.append(record.length)
+        self.corpus_length += record.length
+        for term_id, tf in record.items():
+            term = terms[term_id]
+            self.postings.setdefault(term, {})[doc] = tf
+            self.corpus_frequency[term] += tf
+        return doc
+
+
+def build_index(directory_path, stop_words, name=None, tokenizer='nltk', lexicon=None, positional=None,
+                exclude=()):
+    """
+    Load and process all documents from a specified directory into a CollectionIndex.
+    Token positions are also recorded when a PositionalIndex is given; files named in exclude are skipped.
+    """
+    index = CollectionIndex(name or os.path.basename(os.path.normpath(directory_path)))
+    if lexicon is not None:
+        for filename, data, encoding in read_collection_bytes(directory_path):
+            if filename in exclude:
+                continue
+            # Term ids avoid building a string list per document; stems are only looked up for positions
+            ids = lexicon.analyze_document_ids(data, encoding, tokenizer)
+            doc = index.add_record(DocumentRecord.from_term_ids(filename, ids), lexicon.terms)
+            if positional is not None:
+                positional.add_document(doc, [lexicon.terms[term_id] for term_id in ids])
+        return index
+    for filename, text in read_collection(directory_path):
+        if filename in exclude:
+            continue
+        tokens = process_text(text, stop_words, tokenizer)
+        doc = index.add_document(filename, tokens)
+        if positional is not None:
+            positional.add_document(doc, tokens)
+    return index
+
+
+def index_path(index_directory, collection):
+    """
+    Location of the saved index for a collection such as 'Data_C101'.
+    """
+    return os.path.join(index_directory, f"{collection}.idx")
+
+
+def main_module_name():
+    """
+    Import name of the script running as __main__, e.g. 'index' for `python index.py`.
+    """
+    main = sys.modules['__main__']
+    spec = getattr(main, '__spec__', None)
+    if spec is not None:
+        return spec.name
+    return os.path.splitext(os.path.basename(main.__file__))[0]
+
+
+class ModuleReference:
+    """
+    Pickles as an import of the named module.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __reduce__(self):
+        return importlib.import_module, (self.name,)
+
+
+class IndexPickler(pickle.Pickler):
+    """
+    Pickler that records classes defined by a script run as __main__ (such as CollectionIndex under
+    `python index.py`) as attributes of the script's module, so every other module can load them.
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, type) and obj.__module__ == '__main__':
+            return getattr, (ModuleReference(main_module_name()), obj.__qualname__)
+        return NotImplemented
+
+
+def save_index(obj, file_path):
+    """
+    Persist an index (or any analysed artefact) to disk.
+    """
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    # Write to a temporary file and rename so readers never see a half-written index
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'wb') as file:
+        IndexPickler(file, protocol=pickle.HIGHEST_PROTOCOL).dump((INDEX_VERSION, obj))
+    os.replace(temp_path, file_path)
+
+
+def load_index(file_path):
+    """
+    Load an artefact written by save_index, rejecting files from another index version.
+    """
+    with open(file_path, 'rb') as file:
+        version, obj = pickle.load(file)
+    if version != INDEX_VERSION:
+        raise ValueError(f"{file_path} was built with index version {version}, expected {INDEX_VERSION}; rebuild it")
+    return obj
+
+
+def read_generation(index_directory):
+    """
+    Return the generation stamp of the last completed build in an index directory, or None.
+    """
+    try:
+        with open(os.path.join(index_directory, 'GENERATION'), 'r') as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_generation(index_directory):
+    """
+    Mark a build as complete with a new generation stamp; written last so readers only see finished builds.
+    """
+    generation = str(time.time_ns())
+    temp_path = os.path.join(index_directory, 'GENERATION.tmp')
+    with open(temp_path, 'w') as file:
+        file.write(generation)
+    os.replace(temp_path, os.path.join(index_directory, 'GENERATION'))
+    return generation
+
+
+def positions_path(index_directory, collection):
+    return os.path.join(index_directory, f"{collection}.pos")
+
+
+def duplicates_path(index_directory):
+    return os.path.join(index_directory, 'duplicates.idx')
+
+
+def load_duplicates(index_directory):
+    """
+    The DuplicateMap of a deduplicated build, or None when the collection indexes hold every document.
+    """
+    file_path = duplicates_path(index_directory)
+    return load_index(file_path) if os.path.exists(file_path) else None
+
+
+def build_all(data_directory, query_file_path, stop_words_file, index_directory, tokenizer='nltk', positions=False,
+              dedup_threshold=None):
+    """
+    Index every Data_C collection and save the lexicon and analysed queries next to the indexes.
+    With positions, a PositionalIndex is saved beside each collection index as well. With a dedup
+    threshold, near-duplicates are found first and only each collection's representatives are indexed.
+    """
+    stop_words = load_stop_words(stop_words_file)
+    lexicon = Lexicon(stop_words, tokenizer)
+    queries = analyze_queries(query_file_path, lexicon)
+    save_index(queries, os.path.join(index_directory, 'queries.idx'))
+    duplicates = None
+    if dedup_threshold is not None:
+        duplicates = find_duplicates(data_directory, [f"Data_C{query_id[1:]}" for query_id in queries], lexicon,
+                                     tokenizer, threshold=dedup_threshold)
+        save_index(duplicates, duplicates_path(index_directory))
+    elif os.path.exists(duplicates_path(index_directory)):
+        os.remove(duplicates_path(index_directory))
+    for query_id in queries:
+        positional = PositionalIndex() if positions else None
+        collection = f"Data_C{query_id[1:]}"
+        index = build_index(paths.collection_directory(query_id, data_directory), stop_words,
+                            tokenizer=tokenizer, lexicon=lexicon, positional=positional,
+                            exclude=duplicates.duplicates(collection) if duplicates else ())
+        save_index(index, index_path(index_directory, index.name))
+        if positional is not None:
+            save_index(positional, positions_path(index_directory, index.name))
+        print(f"Indexed {index.name}: {index.N} documents, {len(index.postings)} terms")
+    save_index(lexicon, os.path.join(index_directory, 'lexicon.idx'))
+    print(f"Lexicon: {len(lexicon.surface_forms)} surface forms, {len(lexicon)} terms")
+    print(f"Index generation {write_generation(index_directory)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the per-collection indexes used for ranking.")
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--stop-words', default=paths.STOP_WORDS_FILE)
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    parser.add_argument('--positions', action='store_true', help="also build positional indexes for proximity scoring")
+    parser.add_argument('--dedup', type=float, default=None, metavar='THRESHOLD',
+                        help="index one representative per near-duplicate cluster, e.g. 0.8 estimated Jaccard")
+    args = parser.parse_args()
+    build_all(args.data, args.queries, args.stop_words, args.index_dir, args.tokenizer, args.positions, args.dedup)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from analysis import parse_queries, tokenize, tokenize_document
+from nltk_resources import porter_stemmer
+
+STOPWORD = -1
+
+
+class Lexicon:
+    """
+    Table of surface forms to stemmed term ids, with stop words flagged, built while indexing.
+    """
+
+    def __init__(self, stop_words, tokenizer='nltk'):
+        self.stop_words = frozenset(stop_words)
+        self.tokenizer = tokenizer
+        self.terms = []                 # term id -> stemmed term
+        self.term_ids = {}              # stemmed term -> term id
+        self.surface_forms = {}         # lower-cased token -> term id, or STOPWORD
+
+    def __len__(self):
+        return len(self.terms)
+
+    def term_id(self, term):
+        """
+        Return the id of a stemmed term, assigning the next free id the first time it is seen.
+        """
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def lookup(self, token):
+        """
+        Return the term id (or STOPWORD) of a lower-cased alphanumeric token.
+        """
+        term_id = self.surface_forms.get(token)
+        if term_id is None:
+            # Unseen word: fall back to the full stop word check and Porter stemmer once
+            if token in self.stop_words:
+                term_id = STOPWORD
+            else:
+                term_id = self.term_id(porter_stemmer().stem(token))
+            self.surface_forms[token] = term_id
+        return term_id
+
+    def analyze_ids(self, text, tokenizer=None):
+        """
+        Tokenize text and return the term ids of its non-stop-word tokens.
+        """
+        return self._token_ids(tokenize(text.lower(), tokenizer or self.tokenizer))
+
+    def analyze_document_ids(self, data, encoding='utf-8', tokenizer=None):
+        """
+        analyze_ids for a raw document in the given encoding, tokenized on the bytes where the mode allows it.
+        """
+        return self._token_ids(tokenize_document(data, encoding, tokenizer or self.tokenizer))
+
+    def _token_ids(self, tokens):
+        ids = []
+        for token in tokens:
+            if token.isalnum():
+                term_id = self.surface_forms.get(token)
+                if term_id is None:
+                    term_id = self.lookup(token)
+                if term_id != STOPWORD:
+                    ids.append(term_id)
+        return ids
+
+    def analyze(self, text, tokenizer=None):
+        """
+        Drop-in replacement for analysis.process_text that returns the same stemmed tokens.
+        """
+        terms = self.terms
+        return [terms[term_id] for term_id in self.analyze_ids(text, tokenizer)]
+
+
+def analyze_queries(query_file_path, lexicon):
+    """
+    Load queries from a file and analyse them through the lexicon.
+    """
+    queries = {}
+    for number, topic in parse_queries(query_file_path).items():
+        full_query = f"{topic['title']} {topic['description']} {topic['narrative']}"
+        queries[number] = lexicon.analyze(full_query)
+    return queries
@@ -0,0 +1,289 @@
+import argparse
+import math
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+import paths
+from artifacts import file_digest
+from index import index_path, load_duplicates, load_index, save_index
+from models import MODEL_REGISTRY, CollectionStatistics, get_models, score_models
+from run_writer import OUTPUT_FORMATS, RankingWriter
+from weighted_query import query_terms
+
+SCOPES = ('collection', 'global')
+# Latent dimensions kept by default; a collection holds a few dozen documents, so it needs far fewer
+DEFAULT_DIMS = {'collection': 20, 'global': 200}
+TERM_BLOCK = 2048
+ENTRY_BLOCK = 1 << 16
+# Up to this many documents the exact N x N Gram matrix is decomposed; larger scopes use a randomized
+# subspace iteration that only keeps N x (OVERSAMPLING * dims) dense arrays
+GRAM_LIMIT = 8192
+OVERSAMPLING = 2
+POWER_ITERATIONS = 4
+
+
+class LSIEmbedding:
+    """
+    Truncated SVD A ~ U_k S_k V_k^T of the row-normalised tf-idf matrix of one or more collections.
+    Rows of U_k S_k are the document vectors, kept in a float32 .npy file beside the pickle and
+    memory-mapped by load_embedding, so only the rows a query touches are read.
+    """
+
+    def __init__(self, name, digests, offsets, singular_values, norms, df, N, max_dims):
+        self.name = name
+        self.max_dims = max_dims                # dimensions asked for; fewer are kept below that rank
+        self.digests = digests                  # collection -> digest of the index it was built from
+        self.offsets = offsets                  # collection -> (first row, end row), rows in index doc order
+        self.singular_values = singular_values
+        self.norms = norms                      # row -> length of the document's tf-idf vector
+        self.df = df                            # term -> document frequency over the whole scope
+        self.N = N
+        self.vectors = None
+
+    @property
+    def dims(self):
+        return len(self.singular_values)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['vectors'] = None
+        return state
+
+    def idf(self, term):
+        return math.log(self.N / self.df[term])
+
+    def fold_query(self, indexes, query):
+        """
+        Project a query into the latent space: q V_k = (A q) U_k S_k^-1 = (A q) (U_k S_k) / S_k^2,
+        with A q taken from the postings of the scope's collection indexes.
+        """
+        products = np.zeros(self.N)
+        for term, qf in query_terms(query).items():
+            if term not in self.df:
+                continue
+            weight = (1 + math.log(qf)) * self.idf(term)
+            for index in indexes:
+                postings = index.postings.get(term)
+                if postings:
+                    docs = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+                    tfs = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+                    rows = docs + self.offsets[index.name][0]
+                    products[rows] += weight * (1 + np.log(tfs)) * self.idf(term) / self.norms[rows]
+        rows = np.flatnonzero(products)
+        return products[rows] @ self.vectors[rows] / self.singular_values ** 2
+
+
+def tfidf_matrix(indexes, df, N):
+    """
+    (rows, term columns, values) of the L2-normalised (1 + log tf) * log(N / df) matrix, plus the row norms.
+    """
+    term_ids = {term: column for column, term in enumerate(df)}
+    rows, columns, values = [], [], []
+    start = 0
+    for index in indexes:
+        for term, postings in index.postings.items():
+            docs = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            rows.append(docs + start)
+            columns.append(np.full(len(docs), term_ids[term], dtype=np.int64))
+            values.append((1 + np.log(tfs)) * math.log(N / df[term]))
+        start += index.N
+    rows, columns, values = (np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+                             for parts, dtype in ((rows, np.int64), (columns, np.int64), (values, np.float64)))
+    norms = np.sqrt(np.bincount(rows, values ** 2, minlength=N))
+    norms[norms == 0] = 1.0
+    return rows, columns, values / norms[rows], norms
+
+
+def gram_eigh(rows, columns, values, N, terms):
+    """
+    Exact eigendecomposition of the document Gram matrix A A^T, accumulated over dense blocks of term
+    columns of A given as (rows, columns, values) sorted by column. O(N^2) memory and O(N^3) time.
+    """
+    gram = np.zeros((N, N))
+    for first in range(0, terms, TERM_BLOCK):
+        begin, end = np.searchsorted(columns, [first, first + TERM_BLOCK])
+        block = np.zeros((N, TERM_BLOCK))
+        block[rows[begin:end], columns[begin:end] - first] = values[begin:end]
+        gram += block @ block.T
+    return np.linalg.eigh(gram)
+
+
+def sparse_product(targets, sources, values, dense, size):
+    """
+    M @ dense for the sparse (size x len(dense)) matrix M with entries (targets, sources, values)
+    sorted by target, summing ENTRY_BLOCK entries at a time.
+    """
+    product = np.zeros((size, dense.shape[1]))
+    for begin in range(0, len(targets), ENTRY_BLOCK):
+        block = slice(begin, begin + ENTRY_BLOCK)
+        ids = targets[block]
+        starts = np.flatnonzero(np.diff(ids, prepend=-1))
+        product[ids[starts]] += np.add.reduceat(values[block, None] * dense[sources[block]], starts)
+    return product
+
+
+def randomized_eigh(rows, columns, values, N, terms, dims):
+    """
+    Leading eigenpairs of A A^T by randomized subspace iteration (Halko, Martinsson and Tropp, 2011):
+    a Gaussian start block of OVERSAMPLING * dims columns is multiplied by A A^T = A (A^T .) over the
+    sparse entries POWER_ITERATIONS times, re-orthonormalised each time, and the Rayleigh-Ritz pairs of
+    the final subspace are returned. The entries come sorted by column; a row-sorted copy serves A.
+    """
+    by_row = np.argsort(rows, kind='stable')
+    row_entries = rows[by_row], columns[by_row], values[by_row]
+
+    def gram_product(basis):
+        return sparse_product(*row_entries, sparse_product(columns, rows, values, basis, terms), N)
+
+    width = min(N, OVERSAMPLING * dims)
+    basis = np.linalg.qr(np.random.default_rng(0).standard_normal((N, width)))[0]
+    for _ in range(POWER_ITERATIONS):
+        basis = np.linalg.qr(gram_product(basis))[0]
+    eigenvalues, rotation = np.linalg.eigh(basis.T @ gram_product(basis))
+    return eigenvalues, basis @ rotation
+
+
+def build_embedding(name, indexes, dims=200):
+    """
+    LSI over the given collection indexes. The SVD comes from the eigendecomposition of the document
+    Gram matrix A A^T, exactly up to GRAM_LIMIT documents and by randomized subspace iteration over
+    the sparse matrix beyond. Returns (LSIEmbedding, float32 document vectors).
+    """
+    N = sum(index.N for index in indexes)
+    df = Counter()
+    for index in indexes:
+        df.update({term: len(postings) for term, postings in index.postings.items()})
+    rows, columns, values, norms = tfidf_matrix(indexes, df, N)
+    order = np.argsort(columns, kind='stable')
+    rows, columns, values = rows[order], columns[order], values[order]
+    if N <= GRAM_LIMIT:
+        eigenvalues, eigenvectors = gram_eigh(rows, columns, values, N, len(df))
+    else:
+        eigenvalues, eigenvectors = randomized_eigh(rows, columns, values, N, len(df), dims)
+    # eigh sorts ascending; keep the largest dims values that are not numerically zero
+    keep = np.flatnonzero(eigenvalues > eigenvalues.max(initial=0.0) * 1e-10)[::-1][:dims]
+    singular_values = np.sqrt(eigenvalues[keep])
+    offsets, start = {}, 0
+    for index in indexes:
+        offsets[index.name] = (start, start + index.N)
+        start += index.N
+    embedding = LSIEmbedding(name, {}, offsets, singular_values, norms, dict(df), N, dims)
+    return embedding, (eigenvectors[:, keep] * singular_values).astype(np.float32)
+
+
+def lsi_path(index_directory, name):
+    return os.path.join(index_directory, f"{name}.lsi")
+
+
+def vectors_path(index_directory, name):
+    return os.path.join(index_directory, f"{name}.lsi.npy")
+
+
+def save_embedding(embedding, vectors, index_directory):
+    """
+    Write the document vectors through a memory map, then the pickle, which marks the embedding complete.
+    """
+    file_path = vectors_path(index_directory, embedding.name)
+    temp_path = f"{file_path}.tmp"
+    mapped = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32, shape=vectors.shape)
+    mapped[:] = vectors
+    mapped.flush()
+    del mapped
+    os.replace(temp_path, file_path)
+    save_index(embedding, lsi_path(index_directory, embedding.name))
+
+
+def load_embedding(index_directory, name):
+    embedding = load_index(lsi_path(index_directory, name))
+    embedding.vectors = np.load(vectors_path(index_directory, name), mmap_mode='r')
+    return embedding
+
+
+def update_embeddings(index_directory, collections, scope='global', dims=200, rebuild=False):
+    """
+    Build the embeddings whose collection indexes changed since they were built, one per collection
+    or a single 'global' one. A global SVD depends on every document, so any change rebuilds it.
+    Returns the names of the embeddings that were rebuilt.
+    """
+    digests = {collection: file_digest(index_path(index_directory, collection)) for collection in collections}
+    groups = {'global': list(collections)} if scope == 'global' else {collection: [collection]
+                                                                        for collection in collections}
+    rebuilt = []
+    for name, members in groups.items():
+        wanted = {collection: digests[collection] for collection in members}
+        file_path = lsi_path(index_directory, name)
+        if not rebuild and os.path.exists(file_path) and os.path.exists(vectors_path(index_directory, name)):
+            current = load_index(file_path)
+            if current.digests == wanted and current.max_dims == dims:
+                continue
+        embedding, vectors = build_embedding(name, [load_index(index_path(index_directory, collection))
+                                                    for collection in members], dims)
+        embedding.digests = wanted
+        save_embedding(embedding, vectors, index_directory)
+        rebuilt.append(name)
+    return rebuilt
+
+
+def lsi_rerank(index, embedding, scope_indexes, query, k=100, weight=1.0, model='bm25'):
+    """
+    Score a query with a registry model, then add weight times the candidates' score spread times the
+    latent-space cosine of each of the top-k candidates with the query, in one matrix product.
+    Documents outside the top-k keep their first-stage score, so the full ranking stays comparable.
+    """
+    scores = score_models(CollectionStatistics(index), query, get_models([model]))[model]
+    candidates = np.lexsort((np.arange(index.N), -scores))[:k]
+    if len(candidates) == 0:
+        return scores
+    query_vector = embedding.fold_query(scope_indexes, query)
+    vectors = np.asarray(embedding.vectors[embedding.offsets[index.name][0] + candidates], dtype=np.float64)
+    lengths = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+    cosine = np.divide(vectors @ query_vector, lengths, out=np.zeros(len(candidates)), where=lengths > 0)
+    spread = scores[candidates].max() - scores[candidates].min()
+    scores[candidates] += weight * spread * cosine
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latent semantic (truncated SVD) reranking of a model's top-k.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--output', default='RankingOutputs-LSI')
+    parser.add_argument('--scope', choices=SCOPES, default='global',
+                        help="one embedding over every collection, or one per collection")
+    parser.add_argument('--dims', type=int, default=None,
+                        help="latent dimensions kept, defaults to 200 for global and 20 for collection scope")
+    parser.add_argument('--model', choices=tuple(MODEL_REGISTRY), default='bm25', help="first-stage model")
+    parser.add_argument('--k', type=int, default=100, help="candidates reranked per query")
+    parser.add_argument('--weight', type=float, default=1.0, help="cosine weight, in units of the model's score spread")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='dat')
+    parser.add_argument('--rebuild', action='store_true', help="rebuild embeddings even if their indexes are unchanged")
+    args = parser.parse_args()
+    dims = args.dims or DEFAULT_DIMS[args.scope]
+
+    queries = load_index(os.path.join(args.index_dir, 'queries.idx'))
+    collections = [f"Data_C{query_id[1:]}" for query_id in queries]
+    start = time.perf_counter()
+    rebuilt = update_embeddings(args.index_dir, collections, args.scope, dims, args.rebuild)
+    print(f"Rebuilt {len(rebuilt)} embeddings in {time.perf_counter() - start:.2f}s")
+
+    indexes = {collection: load_index(index_path(args.index_dir, collection)) for collection in collections}
+    embedding = load_embedding(args.index_dir, 'global') if args.scope == 'global' else None
+    start = time.perf_counter()
+    prefix = f"{MODEL_REGISTRY[args.model].prefix}_LSI"
+    with RankingWriter(args.output, prefix, args.format, duplicates=load_duplicates(args.index_dir)) as writer:
+        for query_id, query in queries.items():
+            index = indexes[f"Data_C{query_id[1:]}"]
+            if args.scope == 'global':
+                scores = lsi_rerank(index, embedding, indexes.values(), query, args.k, args.weight, args.model)
+            else:
+                scores = lsi_rerank(index, load_embedding(args.index_dir, index.name), [index], query,
+                                    args.k, args.weight, args.model)
+            writer.write(query_id, dict(zip(index.doc_ids, scores.tolist())))
+    print(f"Reranked {len(queries)} topics in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
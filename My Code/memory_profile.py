@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words, process_text
+from documents import read_collection
+from index import build_index
+from lexicon import Lexicon, analyze_queries
+from models import CollectionStatistics, get_models, score_models
+from run_writer import RankingWriter
+from scaling_benchmark import load_legacy
+
+ENGINES = ('legacy', 'index')
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class RSSSampler:
+    """
+    Background thread recording the highest RSS seen while a stage runs.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+class MemoryProfiler:
+    """
+    Per-stage memory report: Python heap (tracemalloc current and peak), RSS at the start, end and
+    peak of the stage, and the source lines that allocated the most memory during it.
+    """
+
+    def __init__(self, top=10, frames=1, sample_interval=0.01):
+        self.top = top
+        self.frames = frames
+        self.sample_interval = sample_interval
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        rss_start = current_rss()
+        start = time.perf_counter()
+        with RSSSampler(self.sample_interval) as sampler:
+            yield
+        seconds = time.perf_counter() - start
+        rss_end = current_rss()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        changes = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        self.stages.append({
+            'stage': name,
+            'seconds': round(seconds, 3),
+            'traced_current': current,
+            'traced_peak': peak,
+            'rss_start': rss_start,
+            'rss_end': rss_end,
+            'rss_peak': sampler.peak,
+            'top_allocations': [{'site': self.site(change.traceback), 'size_diff': change.size_diff,
+                                 'count_diff': change.count_diff}
+                                for change in changes[:self.top] if change.size_diff > 0],
+        })
+
+    @staticmethod
+    def site(traceback):
+        frame = traceback[0]
+        return f"{os.path.relpath(frame.filename, paths.REPO_ROOT)}:{frame.lineno}"
+
+    def report(self):
+        return {'stages': self.stages, 'peak_rss': max(((stage['rss_peak'] or 0) for stage in self.stages), default=0)}
+
+    def save(self, file_path):
+        with open(file_path, 'w') as file:
+            json.dump(self.report(), file, indent=1, sort_keys=True)
+
+
+def print_report(report):
+    print(f"{'Stage':<10} {'Seconds':>8} {'Heap MiB':>9} {'Heap peak':>9} {'RSS MiB':>8} {'RSS peak':>8}")
+    for stage in report['stages']:
+        print(f"{stage['stage']:<10} {stage['seconds']:>8.2f} {stage['traced_current'] / 2**20:>9.1f} "
+              f"{stage['traced_peak'] / 2**20:>9.1f} {(stage['rss_end'] or 0) / 2**20:>8.1f} "
+              f"{(stage['rss_peak'] or 0) / 2**20:>8.1f}")
+        for allocation in stage['top_allocations'][:3]:
+            print(f"    {allocation['size_diff'] / 2**20:8.2f} MiB  {allocation['site']}")
+
+
+def diff_reports(old, new):
+    """
+    Print the change of every stage's heap and RSS peaks between two saved reports.
+    """
+    old_stages = {stage['stage']: stage for stage in old['stages']}
+    print(f"{'Stage':<10} {'Heap peak diff MiB':>19} {'RSS peak diff MiB':>18} {'Seconds diff':>13}")
+    for stage in new['stages']:
+        previous = old_stages.get(stage['stage'])
+        if previous is None:
+            print(f"{stage['stage']:<10} (new stage)")
+            continue
+        print(f"{stage['stage']:<10} {(stage['traced_peak'] - previous['traced_peak']) / 2**20:>19.1f} "
+              f"{((stage['rss_peak'] or 0) - (previous['rss_peak'] or 0)) / 2**20:>18.1f} "
+              f"{stage['seconds'] - previous['seconds']:>13.2f}")
+
+
+def profile_run(profiler, engine, data_directory, query_file_path, stop_words_file, output_folder,
+                tokenizer='nltk', collections=None):
+    """
+    Run ingest, stats build, scoring and output as separate stages over the selected collections.
+    Like Task4_Try4, every stage's results are kept until the end so the stages' memory adds up.
+    The legacy engine uses Task4-NEW's token lists, score dictionaries and scorers.
+    """
+    stop_words = load_stop_words(stop_words_file)
+    lexicon = Lexicon(stop_words, tokenizer)
+    queries = analyze_queries(query_file_path, lexicon)
+    query_ids = [query_id for query_id in queries if collections is None or int(query_id[1:]) in collections]
+    directories = {query_id: paths.collection_directory(query_id, data_directory) for query_id in query_ids}
+    models = get_models(['bm25', 'jm_lm'])
+    legacy = load_legacy() if engine == 'legacy' else None
+
+    with profiler.stage('ingest'):
+        if engine == 'legacy':
+            documents = {query_id: {filename: process_text(text, stop_words, tokenizer)
+                                    for filename, text in read_collection(directory)}
+                         for query_id, directory in directories.items()}
+        else:
+            documents = {query_id: build_index(directory, stop_words, tokenizer=tokenizer, lexicon=lexicon)
+                         for query_id, directory in directories.items()}
+    with profiler.stage('stats'):
+        if engine == 'legacy':
+            statistics = {}
+            for query_id, docs in documents.items():
+                df = {}
+                for tokens in docs.values():
+                    for word in set(tokens):
+                        df[word] = df.get(word, 0) + 1
+                statistics[query_id] = (df, legacy.build_corpus_frequency(docs))
+        else:
+            statistics = {}
+            for query_id, index in documents.items():
+                stats = statistics[query_id] = CollectionStatistics(index)
+                # Postings arrays and model contexts are otherwise built lazily during scoring;
+                # build them all here, as the legacy engine builds df over every word
+                for term in index.postings:
+                    stats.postings(term)
+                for model in models:
+                    stats.context(model)
+    with profiler.stage('scoring'):
+        if engine == 'legacy':
+            scores = {}
+            for query_id in query_ids:
+                docs, (df, corpus_frequency) = documents[query_id], statistics[query_id]
+                N = len(docs)
+                avgdl = sum(len(tokens) for tokens in docs.values()) / N
+                query = {query_id: queries[query_id]}
+                scores[query_id] = {
+                    'bm25': legacy.calculate_bm25(N, avgdl, docs, query, df)[query_id],
+                    'jm_lm': legacy.calculate_jm_scores(query, docs, corpus_frequency,
+                                                        sum(corpus_frequency.values()))[query_id]}
+        else:
+            scores = {query_id: {name: dict(zip(documents[query_id].doc_ids, values.tolist())) for name, values
+                                 in score_models(statistics[query_id], queries[query_id], models).items()}
+                      for query_id in query_ids}
+    with profiler.stage('output'):
+        for model in models:
+            with RankingWriter(output_folder, model.prefix) as writer:
+                for query_id in query_ids:
+                    writer.write(query_id, scores[query_id][model.name])
+    return documents, statistics, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage memory profile of an index-and-rank run.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run = subparsers.add_parser('run', help="profile a run and save a JSON report")
+    run.add_argument('--engine', choices=ENGINES, default='index')
+    run.add_argument('--data', default=paths.DATA_DIRECTORY)
+    run.add_argument('--queries', default=paths.QUERY_FILE)
+    run.add_argument('--stop-words', default=paths.STOP_WORDS_FILE)
+    run.add_argument('--collections', type=int, nargs='*', default=None, help="e.g. 101 102, defaults to all")
+    run.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    run.add_argument('--output', default='RankingOutputs-Profile')
+    run.add_argument('--report', default='memory-profile.json')
+    run.add_argument('--top', type=int, default=10, help="allocation sites kept per stage")
+    diff = subparsers.add_parser('diff', help="compare two saved reports")
+    diff.add_argument('old')
+    diff.add_argument('new')
+    args = parser.parse_args()
+
+    if args.command == 'diff':
+        with open(args.old) as old_file, open(args.new) as new_file:
+            diff_reports(json.load(old_file), json.load(new_file))
+        return
+    profiler = MemoryProfiler(top=args.top)
+    profile_run(profiler, args.engine, args.data, args.queries, args.stop_words, args.output,
+                args.tokenizer, set(args.collections) if args.collections else None)
+    tracemalloc.stop()
+    profiler.save(args.report)
+    print_report(profiler.report())
+
+
+if __name__ == "__main__":
+    main()
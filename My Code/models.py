@@ -0,0 +1,255 @@
+import abc
+
+import numpy as np
+
+from weighted_query import query_terms
+
+MODEL_REGISTRY = {}
+
+
+def register(model_class):
+    """
+    Class decorator adding a scoring model to MODEL_REGISTRY under its name.
+    """
+    MODEL_REGISTRY[model_class.name] = model_class
+    return model_class
+
+
+class CollectionStatistics:
+    """
+    NumPy view of a CollectionIndex shared by every model: document lengths plus postings arrays,
+    converted once per term the first time a query asks for it.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.doc_ids = index.doc_ids
+        self.doc_lengths = np.array(index.doc_lengths, dtype=np.float64)
+        self.N = index.N
+        self.corpus_length = index.corpus_length
+        self.avgdl = index.avgdl
+        self.contexts = {}              # model key -> prepared per-collection arrays
+        self._postings = {}
+
+    def postings(self, term):
+        """
+        Return (docs, tfs, collection frequency) of a term, or None if no document contains it.
+        """
+        cached = self._postings.get(term)
+        if cached is None and term in self.index.postings:
+            term_postings = self.index.postings[term]
+            cached = self._postings[term] = (np.fromiter(term_postings.keys(), dtype=np.int64, count=len(term_postings)),
+                                             np.fromiter(term_postings.values(), dtype=np.float64, count=len(term_postings)),
+                                             self.index.corpus_frequency[term])
+        return cached
+
+    def context(self, model):
+        """
+        The model's prepared per-collection arrays, built the first time the model scores this collection.
+        """
+        if model.key not in self.contexts:
+            self.contexts[model.key] = model.prepare(self)
+        return self.contexts[model.key]
+
+    def query_postings(self, query):
+        """
+        Yield (docs, tfs, collection frequency, query weight) for every distinct query term in the collection.
+        """
+        for term, qf in query_terms(query).items():
+            found = self.postings(term)
+            if found is not None:
+                yield (*found, qf)
+
+
+class ScoringModel(abc.ABC):
+    """
+    Base scorer. prepare() precomputes per-collection arrays once, term_scores() is the vectorised kernel
+    for one query term's postings, and base_scores() adds whatever every document receives.
+    """
+
+    name = None
+    prefix = None
+
+    defaults = {}
+
+    def __init__(self, **params):
+        self.params = dict(self.defaults, **params)
+        self.key = (self.name, tuple(sorted(self.params.items())))
+
+    def prepare(self, stats):
+        return None
+
+    @abc.abstractmethod
+    def term_scores(self, stats, context, docs, tfs, cf, qf):
+        """
+        Scores the documents docs gain from one query term with term frequencies tfs.
+        """
+
+    def base_scores(self, stats, context, terms):
+        """
+        Score shared by all documents given the query's (cf, qf) pairs; a scalar or a per-document array.
+        """
+        return 0.0
+
+
+class BM25Base(ScoringModel):
+    defaults = {'k1': 1.2, 'k2': 500, 'b': 0.75}
+
+    def prepare(self, stats):
+        k1, b = self.params['k1'], self.params['b']
+        return k1 * ((1 - b) + b * stats.doc_lengths / stats.avgdl)
+
+    def tf_weight(self, K, docs, tfs):
+        k1 = self.params['k1']
+        return ((k1 + 1) * tfs) / (K[docs] + tfs)
+
+    def qf_weight(self, qf):
+        k2 = self.params['k2']
+        return ((k2 + 1) * qf) / (k2 + qf)
+
+
+@register
+class BM25(BM25Base):
+    """
+    Task4-NEW form: log(((2N - n + 0.5) / (n - 0.5)) * tf weight * query weight).
+    """
+    name, prefix = 'bm25', 'BM25'
+
+    def term_scores(self, stats, K, docs, tfs, cf, qf):
+        N, n = stats.N, len(docs)
+        return np.log((((2*N)-n+0.5)/(n-0.5)) * self.tf_weight(K, docs, tfs) * self.qf_weight(qf))
+
+
+@register
+class BM25Log10(BM25Base):
+    """
+    Task4 form: log10 Robertson-Sparck Jones idf times tf and query weights.
+    """
+    name, prefix = 'bm25_log10', 'BM25_LOG10'
+
+    def term_scores(self, stats, K, docs, tfs, cf, qf):
+        n = len(docs)
+        return np.log10((stats.N - n + 0.5) / (n + 0.5)) * self.tf_weight(K, docs, tfs) * self.qf_weight(qf)
+
+
+@register
+class BM25Clipped(BM25Base):
+    """
+    Assignment 2 form: natural-log idf with query weight, each term's score clipped at zero.
+    """
+    name, prefix = 'bm25_clipped', 'BM25_CLIPPED'
+
+    def term_scores(self, stats, K, docs, tfs, cf, qf):
+        n = len(docs)
+        idf = np.log((stats.N - n + 0.5) / (n + 0.5))
+        return np.maximum(idf * self.tf_weight(K, docs, tfs) * self.qf_weight(qf), 0.0)
+
+
+@register
+class BM25NaturalIdf(BM25Base):
+    """
+    The term weight of Task3-New's My_PRM: natural-log idf, no query weight, repeated query terms counted
+    each time. It uses per-collection statistics and the full query, so unlike My_PRM (df, N and avgdl
+    over every collection, title-only queries) it does not reproduce the Outputs-Task3-New runs.
+    """
+    name, prefix = 'bm25_ln', 'BM25_LN'
+
+    def term_scores(self, stats, K, docs, tfs, cf, qf):
+        n = len(docs)
+        return qf * np.log((stats.N - n + 0.5) / (n + 0.5)) * self.tf_weight(K, docs, tfs)
+
+
+@register
+class JelinekMercer(ScoringModel):
+    """
+    Task4-NEW form: sum of (1 - lambda) P(t|d) + lambda P(t|C) over query terms.
+    """
+    name, prefix = 'jm_lm', 'JM_LM'
+    defaults = {'lambda_param': 0.4}
+
+    def term_scores(self, stats, context, docs, tfs, cf, qf):
+        return qf * (1 - self.params['lambda_param']) * (tfs / stats.doc_lengths[docs])
+
+    def base_scores(self, stats, context, terms):
+        if stats.corpus_length == 0:
+            return 0.0
+        return sum(qf * self.params['lambda_param'] * cf / stats.corpus_length for cf, qf in terms)
+
+
+@register
+class JelinekMercerLog(ScoringModel):
+    """
+    Task4_Try4 form: query log-likelihood, sum of log((1 - lambda) P(t|d) + lambda P(t|C)).
+    """
+    name, prefix = 'jm_lm_log', 'JM_LM_LOG'
+    defaults = {'lambda_param': 0.4}
+
+    def term_scores(self, stats, context, docs, tfs, cf, qf):
+        lambda_param = self.params['lambda_param']
+        background = lambda_param * cf / stats.corpus_length
+        return qf * (np.log((1 - lambda_param) * tfs / stats.doc_lengths[docs] + background) - np.log(background))
+
+    def base_scores(self, stats, context, terms):
+        lambda_param = self.params['lambda_param']
+        return sum(qf * np.log(lambda_param * cf / stats.corpus_length) for cf, qf in terms if cf > 0)
+
+
+@register
+class Dirichlet(ScoringModel):
+    """
+    Dirichlet-smoothed query likelihood, sum of log((tf + mu P(t|C)) / (dl + mu)).
+    """
+    name, prefix = 'dirichlet', 'DIRICHLET'
+    defaults = {'mu': 2000}
+
+    def prepare(self, stats):
+        return np.log(stats.doc_lengths + self.params['mu'])
+
+    def term_scores(self, stats, log_norm, docs, tfs, cf, qf):
+        return qf * np.log1p(tfs / (self.params['mu'] * cf / stats.corpus_length))
+
+    def base_scores(self, stats, log_norm, terms):
+        # Every document gets the smoothed probability of each query term; matches add log1p(tf / mu P(t|C))
+        mu = self.params['mu']
+        smoothed = sum(qf * np.log(mu * cf / stats.corpus_length) for cf, qf in terms if cf > 0)
+        return smoothed - sum(qf for cf, qf in terms if cf > 0) * log_norm
+
+
+@register
+class TFIDF(ScoringModel):
+    """
+    Log-scaled term frequency times natural-log inverse document frequency.
+    """
+    name, prefix = 'tfidf', 'TFIDF'
+
+    def term_scores(self, stats, context, docs, tfs, cf, qf):
+        return qf * (1 + np.log(tfs)) * np.log(stats.N / len(docs))
+
+
+def get_models(names, **params):
+    """
+    Instantiate registered models by name; params apply to every model that declares them.
+    """
+    models = []
+    for name in names:
+        if name not in MODEL_REGISTRY:
+            raise ValueError(f"Unknown model '{name}', expected one of {tuple(MODEL_REGISTRY)}")
+        model_class = MODEL_REGISTRY[name]
+        models.append(model_class(**{key: value for key, value in params.items() if key in model_class.defaults}))
+    return models
+
+
+def score_models(stats, query, models):
+    """
+    Score one query with several models in a single pass over its postings.
+    Returns {model name: array of scores indexed by document number}.
+    """
+    contexts = [stats.context(model) for model in models]
+    scores = [np.zeros(stats.N) for _ in models]
+    terms = []
+    for docs, tfs, cf, qf in stats.query_postings(query):
+        terms.append((cf, qf))
+        for model, context, model_scores in zip(models, contexts, scores):
+            model_scores[docs] += model.term_scores(stats, context, docs, tfs, cf, qf)
+    return {model.name: model_scores + model.base_scores(stats, context, terms)
+            for model, context, model_scores in zip(models, contexts, scores)}
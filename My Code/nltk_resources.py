@@ -0,0 +1,107 @@
+import os
+
+# Local copy of the NLTK data the analyzers need. Populate it once on a
+# connected machine with `python nltk_resources.py` and copy the folder to
+# hosts without network access; NLTK_BUNDLE_DIR overrides the location.
+BUNDLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data')
+BUNDLE_RESOURCES = ('punkt', 'punkt_tab')
+# NLTK's English stop word list ships with the code, so stopping never needs the bundle
+STOPWORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'english_stopwords.txt')
+
+_nltk = None
+_stemmer = None
+
+
+def bundle_dir():
+    """
+    Return the directory holding the offline NLTK resource bundle.
+    """
+    return os.environ.get('NLTK_BUNDLE_DIR', BUNDLE_DIR)
+
+
+def load_nltk():
+    """
+    Import NLTK on first use and point its data path at the local bundle.
+    """
+    global _nltk
+    if _nltk is None:
+        import nltk
+        path = bundle_dir()
+        if path not in nltk.data.path:
+            nltk.data.path.insert(0, path)
+        _nltk = nltk
+    return _nltk
+
+
+def english_stopwords():
+    """
+    Load the NLTK English stop word list from the copy shipped with the code.
+    """
+    with open(STOPWORDS_FILE, 'r', encoding='utf-8') as file:
+        return {line.strip() for line in file if line.strip()}
+    #returns a new set each call so callers can extend it
+
+
+def punkt_directory():
+    """
+    Return the bundle directory of the English punkt_tab model.
+    """
+    return os.path.join(bundle_dir(), 'tokenizers', 'punkt_tab', 'english')
+
+
+def require_punkt():
+    """
+    Raise LookupError unless the bundle holds the English punkt_tab model that word_tokenize and the
+    regex tokenizer's abbreviation list both read, so the two modes can be compared at all.
+    """
+    if not os.path.exists(os.path.join(punkt_directory(), 'abbrev_types.txt')):
+        raise LookupError(f"punkt_tab is missing from the NLTK bundle at {bundle_dir()}; build it with "
+                          f"`python nltk_resources.py` on a connected host and copy it here")
+
+
+def punkt_abbreviations():
+    """
+    Load the English Punkt abbreviation list from the bundle, or an empty set if it is not installed.
+    """
+    abbrev_file = os.path.join(punkt_directory(), 'abbrev_types.txt')
+    if not os.path.exists(abbrev_file):
+        return frozenset()
+    with open(abbrev_file, 'r', encoding='utf-8') as file:
+        return frozenset(line.strip() for line in file if line.strip())
+
+
+def word_tokenize(text):
+    """
+    Tokenize text with nltk.word_tokenize, importing NLTK only when first called.
+    """
+    load_nltk()
+    from nltk.tokenize import word_tokenize as nltk_word_tokenize
+    return nltk_word_tokenize(text)
+
+
+def porter_stemmer():
+    """
+    Return a shared PorterStemmer, importing NLTK only when first called.
+    """
+    global _stemmer
+    if _stemmer is None:
+        load_nltk()
+        from nltk.stem import PorterStemmer
+        _stemmer = PorterStemmer()
+    return _stemmer
+
+
+def build_bundle(download_dir=None):
+    """
+    Download the tokenizer resources into the bundle directory.
+    """
+    nltk = load_nltk()
+    download_dir = download_dir or bundle_dir()
+    for resource in BUNDLE_RESOURCES:
+        if not nltk.download(resource, download_dir=download_dir, quiet=True):
+            print(f"Could not download NLTK resource '{resource}'")
+    return download_dir
+
+
+if __name__ == "__main__":
+    print(f"NLTK resources saved to {build_bundle()}")
@@ -0,0 +1,17 @@
+import os
+
+# Default locations of the assignment data, relative to the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIRECTORY = os.path.join(REPO_ROOT, 'Data_Collection-1', 'Data_Collection')
+QUERY_FILE = os.path.join(REPO_ROOT, 'the50Queries.txt')
+STOP_WORDS_FILE = os.path.join(REPO_ROOT, 'common-english-words.txt')
+BENCHMARK_DIRECTORY = os.path.join(REPO_ROOT, 'EvaluationBenchmark-1', 'EvaluationBenchmark')
+INDEX_DIRECTORY = os.path.join(REPO_ROOT, 'My Code', 'indexes')
+PIPELINE_DIRECTORY = os.path.join(REPO_ROOT, 'My Code', 'pipeline')
+
+
+def collection_directory(query_id, base_directory=DATA_DIRECTORY):
+    """
+    Return the Data_C folder that belongs to a query such as 'R101'.
+    """
+    return os.path.join(base_directory, f"Data_C{query_id[1:]}")
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import time
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words
+from artifacts import file_digest
+from index import build_index, duplicates_path, index_path, load_index, save_index, write_generation
+from lexicon import Lexicon, analyze_queries
+from models import MODEL_REGISTRY, CollectionStatistics, get_models, score_models
+from ranking import save_scores
+
+
+class Manifest:
+    """
+    Record of finished pipeline units and the files they wrote, saved after every unit so a rerun
+    can skip them. A manifest written with a different configuration is discarded.
+    """
+
+    def __init__(self, file_path, config):
+        self.file_path = file_path
+        self.config = config
+        self.units = {}
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as file:
+                saved = json.load(file)
+            if saved.get('config') == config:
+                self.units = saved.get('units', {})
+            else:
+                print("Configuration changed since the last run, starting over")
+
+    def done(self, unit):
+        """
+        True if the unit finished and all of its output files still exist.
+        """
+        entry = self.units.get(unit)
+        return entry is not None and all(os.path.exists(output) for output in entry['outputs'])
+
+    def mark(self, unit, outputs):
+        self.units[unit] = {'outputs': outputs, 'completed_at': time.time()}
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({'config': self.config, 'units': self.units}, file, indent=1)
+        os.replace(temp_path, self.file_path)
+
+
+def run_pipeline(data_directory, query_file_path, stop_words_file, work_directory, output_folder,
+                 model_names=('bm25', 'jm_lm'), tokenizer='nltk', restart=False, duplicates_file=None):
+    """
+    Index and rank the collections one at a time, checkpointing each index and each topic's rankings.
+    Only one collection index is held in memory at once. Given a saved DuplicateMap, only each
+    collection's representatives are indexed and the rankings fill the near-duplicates back in.
+    """
+    os.makedirs(work_directory, exist_ok=True)
+    config = {'data': os.path.abspath(data_directory), 'queries': os.path.abspath(query_file_path),
+              'stop_words': os.path.abspath(stop_words_file), 'output': os.path.abspath(output_folder),
+              'models': list(model_names), 'tokenizer': tokenizer,
+              'duplicates': file_digest(duplicates_file) if duplicates_file else None}
+    manifest_path = os.path.join(work_directory, 'manifest.json')
+    if restart and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    manifest = Manifest(manifest_path, config)
+    models = get_models(model_names)
+    lexicon_path = os.path.join(work_directory, 'lexicon.idx')
+    queries_path = os.path.join(work_directory, 'queries.idx')
+
+    if manifest.done('queries'):
+        lexicon = load_index(lexicon_path)
+        queries = load_index(queries_path)
+    else:
+        lexicon = Lexicon(load_stop_words(stop_words_file), tokenizer)
+        queries = analyze_queries(query_file_path, lexicon)
+        save_index(queries, queries_path)
+        save_index(lexicon, lexicon_path)
+        manifest.mark('queries', [queries_path, lexicon_path])
+
+    # The map is copied beside the indexes so tools reading the work directory see the same documents
+    duplicates = None
+    if duplicates_file:
+        duplicates = load_index(duplicates_file)
+        save_index(duplicates, duplicates_path(work_directory))
+    elif os.path.exists(duplicates_path(work_directory)):
+        os.remove(duplicates_path(work_directory))
+    for query_id, query in queries.items():
+        collection = f"Data_C{query_id[1:]}"
+        collection_index_path = index_path(work_directory, collection)
+        index = None
+        if not manifest.done(f"index:{collection}"):
+            index = build_index(paths.collection_directory(query_id, data_directory), lexicon.stop_words,
+                                tokenizer=tokenizer, lexicon=lexicon,
+                                exclude=duplicates.duplicates(collection) if duplicates else ())
+            save_index(index, collection_index_path)
+            # The lexicon grows with every collection, so it is checkpointed with each index
+            save_index(lexicon, lexicon_path)
+            manifest.mark(f"index:{collection}", [collection_index_path])
+            print(f"Indexed {collection}: {index.N} documents, {len(index.postings)} terms")
+        if manifest.done(f"rank:{query_id}"):
+            print(f"Skipping {query_id}, already ranked")
+            continue
+        if index is None:
+            index = load_index(collection_index_path)
+        outputs = []
+        for name, scores in score_models(CollectionStatistics(index), query, models).items():
+            prefix = MODEL_REGISTRY[name].prefix
+            save_scores(dict(zip(index.doc_ids, scores.tolist())), output_folder, prefix, query_id, duplicates)
+            outputs.append(os.path.join(output_folder, f"{prefix}_{query_id}Ranking.dat"))
+        manifest.mark(f"rank:{query_id}", outputs)
+        print(f"Ranked {query_id} with {', '.join(model_names)}")
+    write_generation(work_directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable index-and-rank run over the 50 collections.")
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--stop-words', default=paths.STOP_WORDS_FILE)
+    parser.add_argument('--work-dir', default=paths.PIPELINE_DIRECTORY, help="indexes, lexicon and manifest")
+    parser.add_argument('--output', default='RankingOutputs-Pipeline')
+    parser.add_argument('--model', action='append', choices=tuple(MODEL_REGISTRY),
+                        help="repeatable, defaults to bm25 and jm_lm")
+    parser.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    parser.add_argument('--restart', action='store_true', help="ignore the manifest and redo every unit")
+    parser.add_argument('--duplicates', default=None,
+                        help="DuplicateMap to index representatives only, e.g. from dedup.py --save")
+    args = parser.parse_args()
+    run_pipeline(args.data, args.queries, args.stop_words, args.work_dir, args.output,
+                 args.model or ['bm25', 'jm_lm'], args.tokenizer, args.restart, args.duplicates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+
+def encode_positions(positions):
+    """
+    Variable-byte encode the gaps between ascending token positions.
+    """
+    data = bytearray()
+    previous = 0
+    for position in positions:
+        gap = position - previous
+        previous = position
+        while gap >= 0x80:
+            data.append(gap & 0x7F)
+            gap >>= 7
+        data.append(gap | 0x80)
+    return bytes(data)
+
+
+def decode_positions(data):
+    """
+    Decode variable-byte position gaps back into ascending token positions.
+    """
+    positions = []
+    position = gap = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            position += gap | ((byte & 0x7F) << shift)
+            positions.append(position)
+            gap = shift = 0
+        else:
+            gap |= byte << shift
+            shift += 7
+    return positions
+
+
+class PositionalIndex:
+    """
+    Compressed token positions of one collection, kept apart from the CollectionIndex so positions
+    are only loaded and decoded when proximity scoring asks for them.
+    """
+
+    def __init__(self):
+        self.positions = {}             # term -> {document number: encoded position gaps}
+
+    def add_document(self, doc, tokens):
+        """
+        Record the positions of every term of one processed document.
+        """
+        term_positions = defaultdict(list)
+        for position, term in enumerate(tokens):
+            term_positions[term].append(position)
+        for term, positions in term_positions.items():
+            self.positions.setdefault(term, {})[doc] = encode_positions(positions)
+
+    def get(self, term, doc):
+        """
+        Decoded positions of a term in one document, empty if it does not occur.
+        """
+        data = self.positions.get(term, {}).get(doc)
+        return decode_positions(data) if data else []
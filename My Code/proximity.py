@@ -0,0 +1,99 @@
+import argparse
+import math
+import os
+from bisect import bisect_left
+
+import paths
+from analysis import parse_queries
+from index import index_path, load_duplicates, load_index, positions_path
+from models import CollectionStatistics, get_models, score_models
+from ranking import save_scores, top_k
+
+
+def phrase_count(term_positions):
+    """
+    Number of places where the terms occur consecutively in query order.
+    """
+    if not term_positions or not all(term_positions):
+        return 0
+    later = [set(positions) for positions in term_positions[1:]]
+    return sum(1 for start in term_positions[0]
+               if all(start + offset in positions for offset, positions in enumerate(later, start=1)))
+
+
+def ordered_count(first, second):
+    """
+    Number of times second directly follows first.
+    """
+    following = set(second)
+    return sum(1 for position in first if position + 1 in following)
+
+
+def window_count(first, second, window=8):
+    """
+    Number of (first, second) occurrence pairs, in either order, less than window positions apart.
+    """
+    count = 0
+    for position in first:
+        count += bisect_left(second, position + window) - bisect_left(second, position - window + 1)
+    return count
+
+
+def proximity_features(positional, doc, phrase, window=8):
+    """
+    Phrase, ordered-pair and unordered-window counts of a query phrase in one document.
+    Positions are decoded here, for this document only.
+    """
+    term_positions = [positional.get(term, doc) for term in phrase]
+    pairs = list(zip(term_positions, term_positions[1:]))
+    return {'phrase': phrase_count(term_positions) if len(phrase) > 1 else 0,
+            'ordered': sum(ordered_count(first, second) for first, second in pairs),
+            'window': sum(window_count(first, second, window) for first, second in pairs)}
+
+
+def proximity_rerank(index, positional, query, phrase, k=100, window=8,
+                     phrase_weight=1.0, ordered_weight=0.5, window_weight=0.25):
+    """
+    Score a query with BM25, then add proximity features of the phrase to the top-k candidates.
+    Documents outside the top-k keep their BM25 score, so the full ranking stays comparable.
+    """
+    bm25 = score_models(CollectionStatistics(index), query, get_models(['bm25']))['bm25']
+    scores = dict(zip(index.doc_ids, bm25.tolist()))
+    doc_numbers = {doc_id: doc for doc, doc_id in enumerate(index.doc_ids)}
+    for doc_id, score in top_k(scores, k):
+        features = proximity_features(positional, doc_numbers[doc_id], phrase, window)
+        scores[doc_id] = (score + phrase_weight * math.log1p(features['phrase'])
+                          + ordered_weight * math.log1p(features['ordered'])
+                          + window_weight * math.log1p(features['window']))
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 with title phrase and proximity reranking of the top-k.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    parser.add_argument('--output', default='RankingOutputs-Proximity')
+    parser.add_argument('--k', type=int, default=100, help="candidates reranked per query")
+    parser.add_argument('--window', type=int, default=8)
+    parser.add_argument('--phrase-weight', type=float, default=1.0)
+    parser.add_argument('--ordered-weight', type=float, default=0.5)
+    parser.add_argument('--window-weight', type=float, default=0.25)
+    args = parser.parse_args()
+
+    queries = load_index(os.path.join(args.index_dir, 'queries.idx'))
+    lexicon = load_index(os.path.join(args.index_dir, 'lexicon.idx'))
+    topics = parse_queries(args.queries)
+    duplicates = load_duplicates(args.index_dir)
+    for query_id, query in queries.items():
+        collection = f"Data_C{query_id[1:]}"
+        index = load_index(index_path(args.index_dir, collection))
+        positional = load_index(positions_path(args.index_dir, collection))
+        # The title is the multi-word concept, e.g. "Economic espionage"
+        phrase = lexicon.analyze(topics[query_id]['title'])
+        scores = proximity_rerank(index, positional, query, phrase, args.k, args.window,
+                                  args.phrase_weight, args.ordered_weight, args.window_weight)
+        save_scores(scores, args.output, 'BM25_PROX', query_id, duplicates)
+
+
+if __name__ == "__main__":
+    main()
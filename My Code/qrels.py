@@ -0,0 +1,145 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+import paths
+
+CACHE_VERSION = 1
+DEFAULT_CACHE = os.path.join(paths.INDEX_DIRECTORY, 'qrels.npz')
+
+
+def topic_number(query_id):
+    """
+    'R101' -> 101.
+    """
+    return int(query_id.lstrip('R'))
+
+
+def doc_number(doc_id):
+    """
+    '61780.xml' or '61780' -> 61780; ids that are not numbers map to -1 and never match a judgement.
+    """
+    doc_id = doc_id.removesuffix('.xml')
+    return int(doc_id) if doc_id.isdigit() else -1
+
+
+def benchmark_files(benchmark_folder):
+    return sorted(os.path.join(benchmark_folder, name) for name in os.listdir(benchmark_folder)
+                  if name.startswith('Dataset') and name.endswith('.txt'))
+
+
+def fingerprint(files):
+    """
+    Names, sizes and modification times of the benchmark files, to tell when the cache is stale.
+    """
+    return np.array([f"{os.path.abspath(path)}:{os.path.getsize(path)}:{os.path.getmtime(path)}" for path in files])
+
+
+class QrelsStore:
+    """
+    Every relevance judgement as three parallel arrays (topic, doc, relevance) sorted by topic then doc,
+    plus a dictionary on packed (topic, doc) keys for O(1) single lookups.
+    """
+
+    def __init__(self, topics, docs, relevance):
+        order = np.lexsort((docs, topics))
+        self.topics = np.asarray(topics, dtype=np.int32)[order]
+        self.docs = np.asarray(docs, dtype=np.int64)[order]
+        self.relevance = np.asarray(relevance, dtype=np.int8)[order]
+        self.lookup = dict(zip(((self.topics.astype(np.int64) << 32) | self.docs).tolist(), self.relevance.tolist()))
+        bounds = np.flatnonzero(np.diff(self.topics)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(self.topics)]))
+        self.ranges = {int(self.topics[start]): (start, end) for start, end in zip(starts, ends) if end > start}
+
+    def __len__(self):
+        return len(self.topics)
+
+    def __contains__(self, query_id):
+        return topic_number(query_id) in self.ranges
+
+    def get(self, query_id, doc_id, default=None):
+        """
+        Relevance of one document for one topic, or default if it was not judged.
+        """
+        return self.lookup.get((topic_number(query_id) << 32) | doc_number(doc_id), default)
+
+    def judgements(self, query_id):
+        """
+        {doc id: relevance} for one topic, as read from its benchmark file.
+        """
+        start, end = self.ranges.get(topic_number(query_id), (0, 0))
+        return {str(doc): float(rel) for doc, rel in zip(self.docs[start:end].tolist(),
+                                                          self.relevance[start:end].tolist())}
+
+    def relevant_count(self, query_id):
+        start, end = self.ranges.get(topic_number(query_id), (0, 0))
+        return int((self.relevance[start:end] > 0).sum())
+
+    def gather(self, query_id, doc_ids, default=0):
+        """
+        Relevance vector for a ranked list of document ids; unjudged documents get default.
+        """
+        start, end = self.ranges.get(topic_number(query_id), (0, 0))
+        topic_docs = self.docs[start:end]
+        wanted = np.fromiter((doc_number(doc_id) for doc_id in doc_ids), dtype=np.int64)
+        if len(topic_docs) == 0:
+            return np.full(len(wanted), default, dtype=np.int8)
+        positions = np.minimum(np.searchsorted(topic_docs, wanted), len(topic_docs) - 1)
+        found = topic_docs[positions] == wanted
+        return np.where(found, self.relevance[start:end][positions], default).astype(np.int8)
+
+
+def parse_benchmark_files(files):
+    """
+    Read 'R101 6146 0' lines from every benchmark file into (topics, docs, relevance) lists.
+    """
+    topics, docs, relevance = [], [], []
+    for path in files:
+        with open(path, 'r') as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) >= 3:
+                    topics.append(topic_number(fields[0]))
+                    docs.append(doc_number(fields[1]))
+                    relevance.append(int(float(fields[2])))
+    return topics, docs, relevance
+
+
+def load_qrels(benchmark_folder=paths.BENCHMARK_DIRECTORY, cache_path=DEFAULT_CACHE):
+    """
+    Load every judgement, from the binary cache when it matches the benchmark files, otherwise by
+    parsing the text files and rewriting the cache. cache_path=None disables the cache.
+    """
+    files = benchmark_files(benchmark_folder)
+    stamp = fingerprint(files)
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if int(cached['version']) == CACHE_VERSION and np.array_equal(cached['fingerprint'], stamp):
+                return QrelsStore(cached['topics'], cached['docs'], cached['relevance'])
+    store = QrelsStore(*parse_benchmark_files(files))
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        temp_path = f"{cache_path}.tmp.npz"
+        np.savez(temp_path, version=CACHE_VERSION, fingerprint=stamp,
+                 topics=store.topics, docs=store.docs, relevance=store.relevance)
+        os.replace(temp_path, cache_path)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the binary qrels cache from the benchmark files.")
+    parser.add_argument('--benchmark', default=paths.BENCHMARK_DIRECTORY)
+    parser.add_argument('--cache', default=DEFAULT_CACHE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = load_qrels(args.benchmark, args.cache)
+    print(f"{len(store)} judgements over {len(store.ranges)} topics, "
+          f"{int((store.relevance > 0).sum())} relevant, loaded in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import paths
+from index import index_path, load_duplicates, load_index, read_generation
+from models import MODEL_REGISTRY, CollectionStatistics, get_models, score_models
+from ranking import top_k
+
+
+class IndexSnapshot:
+    """
+    One generation of resident indexes: every collection index, the lexicon, the analysed queries and
+    the near-duplicate map of a deduplicated build.
+    """
+
+    def __init__(self, index_directory):
+        self.generation = read_generation(index_directory)
+        self.lexicon = load_index(os.path.join(index_directory, 'lexicon.idx'))
+        self.queries = load_index(os.path.join(index_directory, 'queries.idx'))
+        self.duplicates = load_duplicates(index_directory)
+        self.collections = {}
+        self.statistics = {}            # collection -> CollectionStatistics, postings arrays cached across requests
+        for query_id in self.queries:
+            collection = f"Data_C{query_id[1:]}"
+            file_path = index_path(index_directory, collection)
+            if os.path.exists(file_path):
+                self.collections[collection] = load_index(file_path)
+                self.statistics[collection] = CollectionStatistics(self.collections[collection])
+        self.loaded_at = time.time()
+        # The lexicon memoises unseen words, so query analysis is serialised per snapshot
+        self.analyze_lock = threading.Lock()
+
+    def analyze(self, text):
+        with self.analyze_lock:
+            return self.lexicon.analyze(text)
+
+
+class QueryService:
+    """
+    Keeps the current IndexSnapshot resident, swaps in a new one when the index generation changes,
+    and records request metrics.
+    """
+
+    def __init__(self, index_directory, reload_interval=5.0):
+        self.index_directory = index_directory
+        self.reload_interval = reload_interval
+        self.models = {model.name: model for model in get_models(MODEL_REGISTRY)}
+        self.snapshot = IndexSnapshot(index_directory)
+        self.started_at = time.time()
+        self.reload_lock = threading.Lock()
+        self.metrics_lock = threading.Lock()
+        self.metrics = {'requests': 0, 'errors': 0, 'reloads': 0, 'reload_failures': 0,
+                        'search_seconds': 0.0, 'models': {model: 0 for model in self.models}}
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def reload(self, force=False):
+        """
+        Load a new snapshot if the generation changed; requests keep using the old one until the swap.
+        """
+        with self.reload_lock:
+            generation = read_generation(self.index_directory)
+            if not force and generation == self.snapshot.generation:
+                return False
+            try:
+                snapshot = IndexSnapshot(self.index_directory)
+            except (OSError, ValueError, EOFError) as error:
+                self.count('reload_failures')
+                print(f"Reload of generation {generation} failed: {error}")
+                return False
+            self.snapshot = snapshot
+            self.count('reloads')
+            print(f"Loaded index generation {snapshot.generation}: {len(snapshot.collections)} collections")
+            return True
+
+    def watch(self):
+        """
+        Poll the generation stamp in the background until stop() is called.
+        """
+        def loop():
+            while not self._stop.wait(self.reload_interval):
+                self.reload()
+        self._watcher = threading.Thread(target=loop, name='index-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def count(self, key, amount=1):
+        with self.metrics_lock:
+            self.metrics[key] += amount
+
+    def search(self, collection, model='bm25', query=None, topic=None, k=10):
+        """
+        Score one query against one collection and return the top-k results as a JSON-ready dict.
+        The query is free text, or the analysed topic when only topic is given.
+        """
+        if collection is None and topic is None:
+            raise ValueError("A 'collection' or a 'topic' is required")
+        if query is None and topic is None:
+            raise ValueError("A query 'q' or a known 'topic' is required")
+        if model not in self.models:
+            raise ValueError(f"Unknown model '{model}', expected one of {tuple(self.models)}")
+        snapshot = self.snapshot
+        if collection is None and topic is not None:
+            collection = f"Data_C{topic[1:]}"
+        index = snapshot.collections.get(collection)
+        if index is None:
+            raise KeyError(f"Unknown collection '{collection}'")
+        if query is not None:
+            terms = snapshot.analyze(query)
+        elif topic in snapshot.queries:
+            terms = snapshot.queries[topic]
+        else:
+            raise ValueError("A query 'q' or a known 'topic' is required")
+        start = time.perf_counter()
+        scores = score_models(snapshot.statistics[collection], terms, [self.models[model]])[model]
+        scores = dict(zip(index.doc_ids, scores.tolist()))
+        if snapshot.duplicates is not None:
+            scores = snapshot.duplicates.expand(collection, scores)
+        results = top_k(scores, k)
+        elapsed = time.perf_counter() - start
+        with self.metrics_lock:
+            self.metrics['search_seconds'] += elapsed
+            self.metrics['models'][model] += 1
+        return {'collection': collection, 'model': model, 'generation': snapshot.generation, 'terms': terms,
+                'results': [{'rank': rank, 'doc_id': doc_id, 'score': score}
+                            for rank, (doc_id, score) in enumerate(results, start=1)]}
+
+    def health(self):
+        snapshot = self.snapshot
+        return {'status': 'ok', 'generation': snapshot.generation, 'collections': len(snapshot.collections),
+                'loaded_at': snapshot.loaded_at, 'uptime': time.time() - self.started_at}
+
+    def metrics_report(self):
+        with self.metrics_lock:
+            report = dict(self.metrics, models=dict(self.metrics['models']))
+        searches = sum(report['models'].values())
+        report['mean_search_ms'] = 1000 * report['search_seconds'] / searches if searches else 0.0
+        report['generation'] = self.snapshot.generation
+        return report
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    GET /search?q=...&collection=Data_C101&model=bm25&k=10, GET /models, GET /health, GET /metrics,
+    POST /reload.
+    """
+
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.service.count('requests')
+        if url.path == '/health':
+            return self.send_json(200, self.service.health())
+        if url.path == '/metrics':
+            return self.send_json(200, self.service.metrics_report())
+        if url.path == '/models':
+            return self.send_json(200, {name: model.params for name, model in self.service.models.items()})
+        if url.path != '/search':
+            return self.send_error_json(404, f"Unknown path '{url.path}'")
+        try:
+            k = int(params.get('k', 10))
+            result = self.service.search(params.get('collection'), params.get('model', 'bm25'),
+                                         params.get('q'), params.get('topic'), k)
+        except KeyError as error:
+            return self.send_error_json(404, error.args[0])
+        except ValueError as error:
+            return self.send_error_json(400, str(error))
+        except Exception as error:
+            # Any other failure still answers the client and shows up in the error count
+            print(f"Search failed: {error!r}", file=sys.stderr)
+            return self.send_error_json(500, f"Internal error: {type(error).__name__}")
+        self.send_json(200, result)
+
+    def do_POST(self):
+        self.service.count('requests')
+        if urlparse(self.path).path != '/reload':
+            return self.send_error_json(404, f"Unknown path '{self.path}'")
+        reloaded = self.service.reload(force=True)
+        self.send_json(200, {'reloaded': reloaded, 'generation': self.service.snapshot.generation})
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message):
+        self.service.count('errors')
+        self.send_json(status, {'error': message})
+
+    def address_string(self):
+        # Unix-socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(service, host='127.0.0.1', port=8000, unix_socket=None, verbose=False):
+    """
+    Create a threaded HTTP server over TCP, or over a Unix socket when unix_socket is given.
+    """
+    handler = type('BoundQueryHandler', (QueryHandler,), {'service': service})
+    if unix_socket:
+        server = ThreadingUnixHTTPServer(unix_socket, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve queries with any registered scoring model from resident indexes.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix-socket', default=None, help="serve on this Unix socket path instead of TCP")
+    parser.add_argument('--reload-interval', type=float, default=5.0, help="seconds between generation checks")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    service = QueryService(args.index_dir, args.reload_interval)
+    service.watch()
+    server = make_server(service, args.host, args.port, args.unix_socket, args.verbose)
+    # Shut down cleanly on SIGTERM as well as Ctrl+C so the Unix socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving generation {service.snapshot.generation} on {args.unix_socket or f'{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
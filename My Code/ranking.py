@@ -0,0 +1,72 @@
+import argparse
+import heapq
+import os
+
+import paths
+from index import index_path, load_duplicates, load_index
+from models import MODEL_REGISTRY, CollectionStatistics, get_models, score_models
+from run_writer import OUTPUT_FORMATS, RankingWriter
+from weighted_query import WeightedQuery, parse_field_weights, weighted_queries
+
+
+def top_k(scores, k):
+    """
+    Return the k best (doc_id, score) pairs of a score dictionary, best first.
+    """
+    return heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+
+
+def save_scores(scores, output_folder, prefix, query_id, duplicates=None):
+    """
+    Save one query's scores in the legacy '{prefix}_{query_id}Ranking.dat' layout,
+    filling in near-duplicates from the DuplicateMap when one is given.
+    """
+    RankingWriter(output_folder, prefix, duplicates=duplicates).write(query_id, scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank every collection from previously built indexes.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--output', default='RankingOutputs-Index')
+    parser.add_argument('--model', action='append', choices=tuple(MODEL_REGISTRY),
+                        help="repeatable, defaults to bm25 and jm_lm")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='dat',
+                        help="per-topic .dat files or one TREC run file per model")
+    parser.add_argument('--k', type=int, default=None, help="results kept per topic, defaults to all documents")
+    parser.add_argument('--field-weights', default=None,
+                        help="re-analyse the topics with per-field weights, e.g. title=3,description=1,narrative=0.5")
+    parser.add_argument('--queries', default=paths.QUERY_FILE, help="topics file read when --field-weights is given")
+    parser.add_argument('--max-terms', type=int, default=None,
+                        help="keep only this many query terms per collection, highest idf first")
+    parser.add_argument('--collapse-duplicates', action='store_true',
+                        help="rank only near-duplicate representatives of a deduplicated index")
+    args = parser.parse_args()
+
+    models = get_models(args.model or ['bm25', 'jm_lm'])
+    if args.field_weights:
+        lexicon = load_index(os.path.join(args.index_dir, 'lexicon.idx'))
+        queries = weighted_queries(args.queries, lexicon, parse_field_weights(args.field_weights))
+    else:
+        queries = {query_id: WeightedQuery.from_terms(query)
+                   for query_id, query in load_index(os.path.join(args.index_dir, 'queries.idx')).items()}
+    duplicates = None if args.collapse_duplicates else load_duplicates(args.index_dir)
+    writers = {model.name: RankingWriter(args.output, model.prefix, args.format, args.k, duplicates=duplicates)
+               for model in models}
+    try:
+        for query_id, query in queries.items():
+            index = load_index(index_path(args.index_dir, f"Data_C{query_id[1:]}"))
+            if args.max_terms:
+                query = query.capped(index.df, args.max_terms)
+            # Every requested model is scored in one pass over the query's postings
+            for name, scores in score_models(CollectionStatistics(index), query, models).items():
+                writers[name].write(query_id, dict(zip(index.doc_ids, scores.tolist())))
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
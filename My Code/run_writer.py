@@ -0,0 +1,100 @@
+import heapq
+import os
+
+OUTPUT_FORMATS = ('dat', 'trec')
+BUFFER_SIZE = 1 << 20
+
+
+def ranked(scores, k=None):
+    """
+    Best-first (doc_id, score) pairs of a score dictionary, cut to k when given.
+    """
+    if k is None:
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    return heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+
+
+def dat_lines(ranking):
+    return ''.join([f"{doc_id}\t{score}\n" for doc_id, score in ranking])
+
+
+def trec_lines(query_id, ranking, run_tag):
+    # TREC document numbers are the file names without their '.xml' extension
+    return ''.join([f"{query_id} Q0 {doc_id.removesuffix('.xml')} {rank} {score} {run_tag}\n"
+                    for rank, (doc_id, score) in enumerate(ranking, start=1)])
+
+
+def write_atomic(file_path, text, buffer_size=BUFFER_SIZE):
+    """
+    Write text through one large buffer to a temporary file and rename it into place.
+    """
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w', buffering=buffer_size) as file:
+        file.write(text)
+    os.replace(temp_path, file_path)
+
+
+class RankingWriter:
+    """
+    Streams per-topic rankings of one model either to the legacy '{prefix}_{query_id}Ranking.dat' files
+    or to a single '{prefix}.run' TREC file. Each topic is formatted into one string; the TREC file
+    is written through a large buffer and renamed into place on close, so readers never see a partial run.
+    Given the DuplicateMap of a deduplicated index, documents left out as near-duplicates are written
+    with their representative's score.
+    """
+
+    def __init__(self, output_folder, prefix, output_format='dat', k=None, run_tag=None, buffer_size=BUFFER_SIZE,
+                 duplicates=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+        os.makedirs(output_folder, exist_ok=True)
+        self.output_folder = output_folder
+        self.prefix = prefix
+        self.output_format = output_format
+        self.k = k
+        self.run_tag = run_tag or prefix
+        self.buffer_size = buffer_size
+        self.duplicates = duplicates
+        self.run_path = os.path.join(output_folder, f"{prefix}.run")
+        self.file = None
+        if output_format == 'trec':
+            self.file = open(f"{self.run_path}.tmp", 'w', buffering=buffer_size)
+
+    def topic_path(self, query_id):
+        return os.path.join(self.output_folder, f"{self.prefix}_{query_id}Ranking.dat")
+
+    def write(self, query_id, scores):
+        """
+        Write one topic's scores, a {doc_id: score} dictionary.
+        """
+        if self.duplicates is not None:
+            scores = self.duplicates.expand(f"Data_C{query_id[1:]}", scores)
+        ranking = ranked(scores, self.k)
+        if self.file is not None:
+            self.file.write(trec_lines(query_id, ranking, self.run_tag))
+        else:
+            write_atomic(self.topic_path(query_id), dat_lines(ranking), self.buffer_size)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.replace(f"{self.run_path}.tmp", self.run_path)
+
+    def abort(self):
+        """
+        Drop a partially written TREC run, leaving any previous complete run in place.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(f"{self.run_path}.tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,128 @@
+import argparse
+import csv
+import importlib.util
+import os
+import time
+
+import paths
+from analysis import TOKENIZER_MODES, load_stop_words, process_text
+from documents import read_collection
+from index import build_index
+from lexicon import Lexicon, analyze_queries
+from models import CollectionStatistics, get_models, score_models
+from synthetic import CorpusModel, generate_corpus
+
+ENGINES = ('legacy', 'registry')
+
+
+def load_legacy():
+    """
+    Import Task4-NEW.py, whose name is not a valid module name, for its token-list scorers.
+    """
+    spec = importlib.util.spec_from_file_location('task4_new', os.path.join(os.path.dirname(__file__), 'Task4-NEW.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_ingest(directory, stop_words, tokenizer, legacy):
+    """
+    Task4-NEW's ingest: token lists per document, the df comprehension and the corpus frequency.
+    """
+    documents = {filename: process_text(text, stop_words, tokenizer) for filename, text in read_collection(directory)}
+    df = {word: sum(1 for doc in documents.values() if word in doc) for doc in documents.values() for word in set(doc)}
+    return documents, df, legacy.build_corpus_frequency(documents)
+
+
+def benchmark_scale(corpus_directory, engines, tokenizer, legacy=None):
+    """
+    Time ingest and query of every collection of one generated corpus; returns {engine: totals}.
+    """
+    stop_words = load_stop_words(paths.STOP_WORDS_FILE)
+    lexicon = Lexicon(stop_words, tokenizer)
+    queries = analyze_queries(os.path.join(corpus_directory, 'the50Queries.txt'), lexicon)
+    totals = {engine: {'documents': 0, 'ingest_seconds': 0.0, 'query_seconds': 0.0} for engine in engines}
+    models = get_models(['bm25', 'jm_lm'])
+    for query_id, query in queries.items():
+        directory = paths.collection_directory(query_id, os.path.join(corpus_directory, 'Data_Collection'))
+        if 'registry' in engines:
+            start = time.perf_counter()
+            index = build_index(directory, stop_words, tokenizer=tokenizer, lexicon=lexicon)
+            totals['registry']['ingest_seconds'] += time.perf_counter() - start
+            start = time.perf_counter()
+            score_models(CollectionStatistics(index), query, models)
+            totals['registry']['query_seconds'] += time.perf_counter() - start
+            totals['registry']['documents'] += index.N
+        if 'legacy' in engines:
+            start = time.perf_counter()
+            documents, df, frequency = legacy_ingest(directory, stop_words, tokenizer, legacy)
+            totals['legacy']['ingest_seconds'] += time.perf_counter() - start
+            N = len(documents)
+            avgdl = sum(len(doc) for doc in documents.values()) / N
+            start = time.perf_counter()
+            legacy.calculate_bm25(N, avgdl, documents, {query_id: query}, df)
+            legacy.calculate_jm_scores({query_id: query}, documents, frequency, sum(frequency.values()))
+            totals['legacy']['query_seconds'] += time.perf_counter() - start
+            totals['legacy']['documents'] += N
+    return totals
+
+
+def plot_results(rows, file_path):
+    """
+    Log-log plot of ingest and query time against corpus size, if matplotlib is installed.
+    """
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed, skipping the plot")
+        return
+    figure, axes = plt.subplots(1, 2, figsize=(11, 4))
+    for axis, column in zip(axes, ('ingest_seconds', 'query_seconds')):
+        for engine in sorted({row['engine'] for row in rows}):
+            points = [(row['documents'], row[column]) for row in rows if row['engine'] == engine]
+            axis.loglog(*zip(*points), marker='o', label=engine)
+        axis.set_xlabel('documents')
+        axis.set_ylabel(column.replace('_', ' '))
+        axis.legend()
+    figure.tight_layout()
+    figure.savefig(file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest and query time of each engine on synthetic corpora.")
+    parser.add_argument('--work-dir', required=True, help="where the synthetic corpora are generated")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--collections', type=int, nargs='*', default=None, help="e.g. 101 102, defaults to all")
+    parser.add_argument('--engine', action='append', choices=ENGINES, help="repeatable, defaults to all")
+    parser.add_argument('--legacy-max-scale', type=float, default=2,
+                        help="largest scale the quadratic legacy engine is run at")
+    parser.add_argument('--tokenizer', choices=TOKENIZER_MODES, default='nltk')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='scaling.csv')
+    args = parser.parse_args()
+
+    engines = args.engine or list(ENGINES)
+    legacy = load_legacy() if 'legacy' in engines else None
+    model = None
+    rows = []
+    for scale in args.scales:
+        corpus_directory = os.path.join(args.work_dir, f"scale-{scale:g}-seed-{args.seed}")
+        if not os.path.exists(os.path.join(corpus_directory, 'the50Queries.txt')):
+            model = model or CorpusModel(paths.DATA_DIRECTORY, paths.QUERY_FILE)
+            generate_corpus(corpus_directory, scale, args.collections, args.seed, model=model)
+        scale_engines = [engine for engine in engines if engine != 'legacy' or scale <= args.legacy_max_scale]
+        for engine, totals in benchmark_scale(corpus_directory, scale_engines, args.tokenizer, legacy).items():
+            rows.append({'scale': scale, 'engine': engine, **totals})
+            print(f"scale {scale:g} {engine:<9} {totals['documents']:>8} docs  ingest {totals['ingest_seconds']:8.2f}s  "
+                  f"query {totals['query_seconds']:8.3f}s")
+    with open(args.output, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['scale', 'engine', 'documents', 'ingest_seconds', 'query_seconds'])
+        writer.writeheader()
+        writer.writerows(rows)
+    plot_results(rows, os.path.splitext(args.output)[0] + '.png')
+
+
+if __name__ == "__main__":
+    main()
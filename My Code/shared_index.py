@@ -0,0 +1,257 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import paths
+from index import index_path, load_duplicates, load_index
+from models import MODEL_REGISTRY, get_models, score_models
+from run_writer import RankingWriter
+from weighted_query import WeightedQuery
+
+ALIGNMENT = 64
+
+
+class SharedCollection:
+    """
+    Read-only NumPy views of one collection inside a SharedIndex block.
+    """
+
+    def __init__(self, terms, starts, docs, tfs, corpus_frequency, doc_lengths):
+        self.terms = terms                          # sorted term ids present in the collection
+        self.starts = starts                        # term position -> first posting, plus one end entry
+        self.docs = docs
+        self.tfs = tfs
+        self.corpus_frequency = corpus_frequency    # term position -> collection frequency
+        self.doc_lengths = doc_lengths
+        self.N = len(doc_lengths)
+        self.corpus_length = int(doc_lengths.sum())
+        self.avgdl = self.corpus_length / self.N if self.N else 0.0
+        self.contexts = {}
+
+    def context(self, model):
+        """
+        The model's prepared per-collection arrays, built the first time the model scores this collection.
+        """
+        if model.key not in self.contexts:
+            self.contexts[model.key] = model.prepare(self)
+        return self.contexts[model.key]
+
+    def postings(self, term_id):
+        """
+        Return (position, docs, tfs) of a term id, or None if the collection does not contain it.
+        """
+        position = np.searchsorted(self.terms, term_id)
+        if position == len(self.terms) or self.terms[position] != term_id:
+            return None
+        start, end = self.starts[position], self.starts[position + 1]
+        return position, self.docs[start:end], self.tfs[start:end]
+
+    def query_postings(self, query):
+        """
+        Yield (docs, tfs, collection frequency, query frequency) for every query term in the collection.
+        """
+        for term_id, qf in query.items():
+            found = self.postings(term_id)
+            if found is not None:
+                position, docs, tfs = found
+                yield docs, tfs, self.corpus_frequency[position], qf
+
+
+class SharedIndex:
+    """
+    Every collection index flattened into contiguous NumPy arrays in one buffer, so worker processes
+    can attach to a shared memory block (or a memory-mapped file) without copying the postings.
+    """
+
+    def __init__(self, buffer, layout, collections):
+        self.buffer = buffer
+        self.layout = layout
+        self.collections = collections              # collection name -> position in the block
+        self.arrays = {name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=length, offset=offset)
+                       for name, (dtype, offset, length) in layout.items()}
+
+    def collection(self, name):
+        c = self.collections[name]
+        a = self.arrays
+        t0, t1 = a['collection_terms'][c], a['collection_terms'][c + 1]
+        d0, d1 = a['collection_docs'][c], a['collection_docs'][c + 1]
+        # starts holds one end entry per collection, hence the + c offsets
+        starts = a['starts'][t0 + c:t1 + c + 1]
+        p0, p1 = starts[0], starts[-1]
+        return SharedCollection(a['terms'][t0:t1], starts - p0, a['docs'][p0:p1], a['tfs'][p0:p1],
+                                a['corpus_frequency'][t0:t1], a['doc_lengths'][d0:d1])
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+def flatten_indexes(indexes, vocabulary):
+    """
+    Turn CollectionIndex objects into the flat arrays of a SharedIndex; new terms are added to vocabulary.
+    """
+    parts = {name: [] for name in ('terms', 'starts', 'docs', 'tfs', 'corpus_frequency', 'doc_lengths')}
+    collection_terms, collection_docs = [0], [0]
+    for index in indexes:
+        for term in index.postings:
+            vocabulary.setdefault(term, len(vocabulary))
+        ordered = sorted(index.postings, key=vocabulary.__getitem__)
+        lengths = [len(index.postings[term]) for term in ordered]
+        parts['terms'].append(np.array([vocabulary[term] for term in ordered], dtype=np.int32))
+        parts['starts'].append(np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))))
+        parts['docs'].append(np.fromiter((doc for term in ordered for doc in index.postings[term]), dtype=np.int32))
+        parts['tfs'].append(np.fromiter((tf for term in ordered for tf in index.postings[term].values()),
+                                        dtype=np.int32))
+        parts['corpus_frequency'].append(np.array([index.corpus_frequency[term] for term in ordered], dtype=np.int64))
+        parts['doc_lengths'].append(np.array(index.doc_lengths, dtype=np.int32))
+        collection_terms.append(collection_terms[-1] + len(ordered))
+        collection_docs.append(collection_docs[-1] + index.N)
+    # Posting starts are made global so one array serves every collection
+    posting_base = 0
+    for i, starts in enumerate(parts['starts']):
+        parts['starts'][i] = starts + posting_base
+        posting_base += starts[-1]
+    arrays = {name: np.concatenate(chunks) if chunks else np.zeros(0) for name, chunks in parts.items()}
+    arrays['collection_terms'] = np.array(collection_terms, dtype=np.int64)
+    arrays['collection_docs'] = np.array(collection_docs, dtype=np.int64)
+    return arrays
+
+
+def plan_layout(arrays):
+    """
+    Assign each array an aligned byte offset; returns (layout, total size).
+    """
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = (array.dtype.str, offset, len(array))
+        offset += array.nbytes
+    return layout, max(offset, 1)
+
+
+def copy_arrays(buffer, arrays, layout):
+    for name, array in arrays.items():
+        dtype, offset, length = layout[name]
+        np.frombuffer(buffer, dtype=np.dtype(dtype), count=length, offset=offset)[:] = array
+
+
+def create_shared_index(indexes, vocabulary):
+    """
+    Copy the indexes into a new shared memory block; the caller must close() and unlink() it.
+    """
+    arrays = flatten_indexes(indexes, vocabulary)
+    layout, size = plan_layout(arrays)
+    block = shared_memory.SharedMemory(create=True, size=size)
+    copy_arrays(block.buf, arrays, layout)
+    collections = {index.name: c for c, index in enumerate(indexes)}
+    return block, SharedIndex(block.buf, layout, collections)
+
+
+def save_shared_index(indexes, vocabulary, file_path):
+    """
+    Write the flat arrays to a file that open_shared_index can memory-map; returns (layout, collections).
+    """
+    arrays = flatten_indexes(indexes, vocabulary)
+    layout, size = plan_layout(arrays)
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    mapped = np.memmap(file_path, dtype=np.uint8, mode='w+', shape=(size,))
+    copy_arrays(mapped, arrays, layout)
+    mapped.flush()
+    del mapped
+    return layout, {index.name: c for c, index in enumerate(indexes)}
+
+
+def open_shared_index(file_path, layout, collections):
+    return SharedIndex(np.memmap(file_path, dtype=np.uint8, mode='r'), layout, collections)
+
+
+def score_shared(collection, query, model='bm25'):
+    """
+    Score every document of a SharedCollection for a query given as {term id: query weight}.
+    """
+    return score_models(collection, query, get_models([model]))[model]
+
+
+_worker_index = None
+
+
+def _attach(block_name, layout, collections):
+    """
+    Pool initializer: attach to the parent's block once per worker, without copying it.
+    """
+    global _worker_index
+    block = shared_memory.SharedMemory(name=block_name)
+    _worker_index = (block, SharedIndex(block.buf, layout, collections))
+
+
+def _score_batch(batch, k):
+    """
+    Score a batch of (query_id, collection, model, query) tasks in a worker; returns top-k document numbers,
+    or every document number best-first when k is None.
+    """
+    results = []
+    for query_id, collection_name, model, query in batch:
+        scores = score_shared(_worker_index[1].collection(collection_name), query, model)
+        order = np.argsort(-scores, kind='stable')[:k]
+        results.append((query_id, collection_name, model, order, scores[order]))
+    return results
+
+
+def score_parallel(block, shared, tasks, workers=None, k=None, batch_size=8):
+    """
+    Score (query_id, collection, model, query) tasks on a process pool attached to one shared block.
+    """
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                             initargs=(block.name, shared.layout, shared.collections)) as executor:
+        futures = [executor.submit(_score_batch, batch, k) for batch in batches]
+        return [result for future in futures for result in future.result()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank every collection with workers sharing one in-memory index.")
+    parser.add_argument('--index-dir', default=paths.INDEX_DIRECTORY)
+    parser.add_argument('--output', default='RankingOutputs-Shared')
+    parser.add_argument('--model', action='append', choices=tuple(MODEL_REGISTRY), help="repeatable, defaults to bm25 and jm_lm")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--k', type=int, default=None, help="results kept per query, defaults to all documents")
+    args = parser.parse_args()
+
+    queries = load_index(os.path.join(args.index_dir, 'queries.idx'))
+    indexes = [load_index(index_path(args.index_dir, f"Data_C{query_id[1:]}")) for query_id in queries]
+    doc_ids = {index.name: index.doc_ids for index in indexes}
+    duplicates = load_duplicates(args.index_dir)
+    vocabulary = {}
+    block, shared = create_shared_index(indexes, vocabulary)
+    del indexes
+    try:
+        tasks = []
+        for model in args.model or ['bm25', 'jm_lm']:
+            for query_id, query in queries.items():
+                # Terms no collection contains are dropped, they match nothing
+                terms = WeightedQuery.from_terms(query).map_terms(vocabulary)
+                tasks.append((query_id, f"Data_C{query_id[1:]}", model, terms))
+        start = time.perf_counter()
+        # Near-duplicates take their representative's score, so the writer expands before it cuts to k
+        results = score_parallel(block, shared, tasks, args.workers, args.k if duplicates is None else None)
+        print(f"Scored {len(tasks)} queries in {time.perf_counter() - start:.2f}s "
+              f"from a {shared.nbytes / 2**20:.1f} MiB shared index")
+        writers = {}
+        for query_id, collection_name, model, docs, scores in results:
+            if model not in writers:
+                writers[model] = RankingWriter(args.output, MODEL_REGISTRY[model].prefix, k=args.k,
+                                               duplicates=duplicates)
+            names = doc_ids[collection_name]
+            writers[model].write(query_id, {names[doc]: float(score) for doc, score in zip(docs, scores)})
+    finally:
+        del shared
+        block.close()
+        block.unlink()
+
+
+if __name__ == "__main__":
+    main()
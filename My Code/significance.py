@@ -0,0 +1,179 @@
+import argparse
+import math
+import time
+from itertools import combinations
+
+import numpy as np
+
+import paths
+from evaluation import DEFAULT_RUNS, METRICS, metric_matrix, parse_runs
+
+BATCH_SIZE = 10000
+
+
+def _betacf(a, b, x):
+    """
+    Continued fraction for the regularized incomplete beta function (modified Lentz method).
+    """
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        for numerator in (m * (b - m) * x / ((a + m2 - 1.0) * (a + m2)),
+                          -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1.0))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-15:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """
+    Regularized incomplete beta function I_x(a, b).
+    """
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def paired_t_test(a, b):
+    """
+    Two-sided paired t-test; returns (t statistic, p value).
+    """
+    d = np.asarray(a, dtype=float) - np.asarray(b, dtype=float)
+    n = len(d)
+    sd = d.std(ddof=1) if n > 1 else 0.0
+    if sd == 0.0:
+        return 0.0, 1.0
+    t = d.mean() / (sd / math.sqrt(n))
+    df = n - 1
+    return float(t), _betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def wilcoxon_test(a, b):
+    """
+    Two-sided Wilcoxon signed-rank test (normal approximation, zero differences dropped,
+    tie-corrected variance); returns (W statistic, p value).
+    """
+    d = np.asarray(a, dtype=float) - np.asarray(b, dtype=float)
+    d = d[d != 0]
+    n = len(d)
+    if n == 0:
+        return 0.0, 1.0
+    magnitudes = np.abs(d)
+    order = np.argsort(magnitudes, kind='mergesort')
+    sorted_magnitudes = magnitudes[order]
+    ranks = np.empty(n)
+    # Average the ranks of tied magnitudes
+    _, first, counts = np.unique(sorted_magnitudes, return_index=True, return_counts=True)
+    for start, count in zip(first, counts):
+        ranks[order[start:start + count]] = start + (count + 1) / 2.0
+    w_plus = ranks[d > 0].sum()
+    w_minus = ranks[d < 0].sum()
+    mean = n * (n + 1) / 4.0
+    variance = n * (n + 1) * (2 * n + 1) / 24.0 - (counts ** 3 - counts).sum() / 48.0
+    if variance <= 0:
+        return float(min(w_plus, w_minus)), 1.0
+    z = (w_plus - mean) / math.sqrt(variance)
+    return float(min(w_plus, w_minus)), math.erfc(abs(z) / math.sqrt(2.0))
+
+
+def permutation_test(differences, permutations=100000, seed=0):
+    """
+    Randomised sign-flip test on the mean difference for many run pairs at once.
+    differences is a (topics x pairs) matrix; returns one two-sided p value per pair.
+    """
+    differences = np.atleast_2d(np.asarray(differences, dtype=float).T).T
+    n = differences.shape[0]
+    observed = np.abs(differences.mean(axis=0)) - 1e-12
+    rng = np.random.default_rng(seed)
+    exceed = np.zeros(differences.shape[1])
+    for start in range(0, permutations, BATCH_SIZE):
+        size = min(BATCH_SIZE, permutations - start)
+        signs = rng.integers(0, 2, size=(size, n)) * 2.0 - 1.0
+        exceed += (np.abs(signs @ differences) / n >= observed).sum(axis=0)
+    return (exceed + 1) / (permutations + 1)
+
+
+def bootstrap_test(differences, samples=100000, seed=0):
+    """
+    Paired bootstrap test of a zero mean difference (shift method) for many run pairs at once.
+    differences is a (topics x pairs) matrix; returns one two-sided p value per pair.
+    """
+    differences = np.atleast_2d(np.asarray(differences, dtype=float).T).T
+    n = differences.shape[0]
+    observed = np.abs(differences.mean(axis=0)) - 1e-12
+    shifted = differences - differences.mean(axis=0)
+    rng = np.random.default_rng(seed)
+    exceed = np.zeros(differences.shape[1])
+    for start in range(0, samples, BATCH_SIZE):
+        size = min(BATCH_SIZE, samples - start)
+        # Resampling topics with replacement is a multinomial draw of how often each topic appears
+        counts = rng.multinomial(n, np.full(n, 1.0 / n), size=size)
+        exceed += (np.abs(counts @ shifted) / n >= observed).sum(axis=0)
+    return (exceed + 1) / (samples + 1)
+
+
+def compare_runs(matrix, run_names, permutations=100000, samples=100000, seed=0):
+    """
+    Run every test on every pair of runs in a (topics x runs) metric matrix.
+    Topics missing a value for any run are left out.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    matrix = matrix[~np.isnan(matrix).any(axis=1)]
+    pairs = list(combinations(range(len(run_names)), 2))
+    differences = np.column_stack([matrix[:, i] - matrix[:, j] for i, j in pairs])
+    p_permutation = permutation_test(differences, permutations, seed)
+    p_bootstrap = bootstrap_test(differences, samples, seed)
+    rows = []
+    for column, (i, j) in enumerate(pairs):
+        t, p_t = paired_t_test(matrix[:, i], matrix[:, j])
+        w, p_w = wilcoxon_test(matrix[:, i], matrix[:, j])
+        rows.append({'run_a': run_names[i], 'run_b': run_names[j], 'topics': len(matrix),
+                     'mean_a': matrix[:, i].mean(), 'mean_b': matrix[:, j].mean(),
+                     't': t, 'p_t': p_t, 'w': w, 'p_wilcoxon': p_w,
+                     'p_permutation': p_permutation[column], 'p_bootstrap': p_bootstrap[column]})
+    return rows
+
+
+def print_significance_table(rows, alpha=0.05):
+    print(f"{'Run A':<10} {'Run B':<10} {'Mean A':>8} {'Mean B':>8} {'t':>8} {'p(t)':>8} "
+          f"{'p(wilc)':>8} {'p(perm)':>8} {'p(boot)':>8}")
+    for row in rows:
+        flag = '*' if row['p_t'] < alpha else ''
+        print(f"{row['run_a']:<10} {row['run_b']:<10} {row['mean_a']:>8.4f} {row['mean_b']:>8.4f} {row['t']:>8.3f} "
+              f"{row['p_t']:>8.4f} {row['p_wilcoxon']:>8.4f} {row['p_permutation']:>8.4f} {row['p_bootstrap']:>8.4f} {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Significance tests between ranking runs over the 50 topics.")
+    parser.add_argument('--run', action='append', help="NAME=path prefix, e.g. BM25='RankingOutputs-New-2/BM25_'")
+    parser.add_argument('--metric', choices=METRICS, default='map')
+    parser.add_argument('--benchmark', default=paths.BENCHMARK_DIRECTORY)
+    parser.add_argument('--permutations', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=100000, help="bootstrap samples")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    runs = parse_runs(args.run) if args.run else DEFAULT_RUNS
+    query_ids = [f"R{query_id}" for query_id in range(101, 151)]
+    matrix = metric_matrix(runs, query_ids, args.benchmark, args.metric)
+    start = time.perf_counter()
+    rows = compare_runs(matrix, list(runs), args.permutations, args.samples, args.seed)
+    print_significance_table(rows)
+    print(f"\n{len(rows)} run pairs tested in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+import paths
+from analysis import parse_queries
+from documents import read_collection
+
+_WORD_RE = re.compile(r'[a-z]+')
+_TEXT_RE = re.compile(r'<text>(.*?)</text>', re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+DOCUMENT_TEMPLATE = '''<?xml version="1.0" encoding="iso-8859-1" ?>
+<newsitem itemid="{itemid}" id="root" date="1996-08-28" xml:lang="en">
+<title>{title}</title>
+<headline>{headline}</headline>
+<text>
+{paragraphs}
+</text>
+</newsitem>
+'''
+
+TOPIC_TEMPLATE = '''<Query>
+
+<num> Number: R{number}
+<title> {title}
+
+<desc> Description:
+Documents discussing {title}.
+
+<narr> Narrative:
+Relevant documents mention {title}.
+
+</Query>
+
+
+'''
+
+
+class CorpusModel:
+    """
+    Statistics sampled from the real corpus: the word distribution (Zipfian, as observed), document
+    lengths in words, and the number of documents in each collection.
+    """
+
+    def __init__(self, data_directory, query_file_path):
+        counts = Counter()
+        self.doc_lengths = []
+        self.collection_sizes = {}
+        for query_id in parse_queries(query_file_path):
+            directory = paths.collection_directory(query_id, data_directory)
+            size = 0
+            for _, text in read_collection(directory):
+                body = _TAG_RE.sub(' ', ' '.join(_TEXT_RE.findall(text))).lower()
+                words = _WORD_RE.findall(body)
+                counts.update(words)
+                self.doc_lengths.append(len(words))
+                size += 1
+            self.collection_sizes[int(query_id[1:])] = size
+        ranked = counts.most_common()
+        self.words = np.array([word for word, _ in ranked])
+        frequencies = np.array([count for _, count in ranked], dtype=np.float64)
+        self.cumulative = np.cumsum(frequencies / frequencies.sum())
+        self.doc_lengths = np.array(self.doc_lengths)
+
+    def sample_words(self, rng, size):
+        return self.words[np.minimum(np.searchsorted(self.cumulative, rng.random(size)), len(self.words) - 1)]
+
+    def topic_words(self, rng, count=2):
+        """
+        Distinct mid-frequency words to act as a synthetic topic's title.
+        """
+        band = self.words[min(200, len(self.words) // 10):min(5000, len(self.words))]
+        return list(rng.choice(band, size=count, replace=False))
+
+
+def generate_collection(model, collection, output_directory, scale, seed=0, relevant_fraction=0.2):
+    """
+    Write one Data_C collection of scale times the real collection's size; a fraction of the documents
+    has the topic title mixed in and is judged relevant. Returns (title, relevant item ids, all item ids).
+    """
+    rng = np.random.default_rng([seed, collection])
+    directory = os.path.join(output_directory, f"Data_C{collection}")
+    os.makedirs(directory, exist_ok=True)
+    title = ' '.join(model.topic_words(rng))
+    topic = title.split()
+    size = max(1, int(round(model.collection_sizes.get(collection, 50) * scale)))
+    lengths = np.maximum(rng.choice(model.doc_lengths, size=size), 20)
+    relevant = rng.random(size) < relevant_fraction
+    relevant_ids, item_ids = [], []
+    for i, (length, is_relevant) in enumerate(zip(lengths, relevant)):
+        itemid = collection * 10_000_000 + i
+        words = model.sample_words(rng, length + 20)
+        headline, body = list(words[:8]), list(words[20:])
+        if is_relevant:
+            # Mention the topic in the headline and a few times in the body
+            headline[:len(topic)] = topic
+            for position in rng.integers(0, len(body), size=rng.integers(1, 5)):
+                body[position:position] = topic
+            relevant_ids.append(itemid)
+        paragraphs = '\n'.join(f"<p>{' '.join(body[start:start + 60])}.</p>" for start in range(0, len(body), 60))
+        text = DOCUMENT_TEMPLATE.format(itemid=itemid, title=' '.join(words[8:20]).upper(),
+                                        headline=' '.join(headline).capitalize(), paragraphs=paragraphs)
+        with open(os.path.join(directory, f"{itemid}.xml"), 'w', encoding='iso-8859-1') as file:
+            file.write(text)
+        item_ids.append(itemid)
+    return title, relevant_ids, item_ids
+
+
+def generate_corpus(output_directory, scale, collections=None, seed=0, data_directory=paths.DATA_DIRECTORY,
+                    query_file_path=paths.QUERY_FILE, model=None):
+    """
+    Write a synthetic Data_Collection, the50Queries-style topics and an EvaluationBenchmark for them.
+    The same seed and scale always produce the same files.
+    """
+    model = model or CorpusModel(data_directory, query_file_path)
+    collections = collections or sorted(model.collection_sizes)
+    data_output = os.path.join(output_directory, 'Data_Collection')
+    benchmark_output = os.path.join(output_directory, 'EvaluationBenchmark')
+    os.makedirs(benchmark_output, exist_ok=True)
+    topics = []
+    for collection in collections:
+        title, relevant_ids, item_ids = generate_collection(model, collection, data_output, scale, seed)
+        topics.append(TOPIC_TEMPLATE.format(number=collection, title=title))
+        relevant = set(relevant_ids)
+        with open(os.path.join(benchmark_output, f"Dataset{collection}.txt"), 'w') as file:
+            file.write(''.join(f"R{collection} {itemid} {int(itemid in relevant)}\n" for itemid in item_ids))
+        print(f"Data_C{collection}: {len(item_ids)} documents, topic '{title}'")
+    with open(os.path.join(output_directory, 'the50Queries.txt'), 'w') as file:
+        file.write(''.join(topics))
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a scaled synthetic copy of the Data_Collection.")
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--scale', type=float, default=10, help="documents per collection relative to the real corpus")
+    parser.add_argument('--collections', type=int, nargs='*', default=None, help="e.g. 101 102, defaults to all")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--queries', default=paths.QUERY_FILE)
+    args = parser.parse_args()
+    generate_corpus(args.output, args.scale, args.collections, args.seed, args.data, args.queries)
+
+
+if __name__ == "__main__":
+    main()
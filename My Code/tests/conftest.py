@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+# The modules sit flat in 'My Code' and are run as scripts; put them on the path for the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nltk_resources  # noqa: E402
+import paths  # noqa: E402
+from analysis import load_queries, load_stop_words  # noqa: E402
+from index import build_index  # noqa: E402
+
+# A few small collections keep the corpus tests quick
+SAMPLE_COLLECTIONS = ('Data_C101', 'Data_C102', 'Data_C103')
+
+
+def pytest_addoption(parser):
+    parser.addoption('--tokenizer', choices=('nltk', 'regex'), default='nltk',
+                     help="tokenizer mode the corpus fixtures analyse documents and queries with")
+
+
+@pytest.fixture(scope='session')
+def tokenizer(request):
+    mode = request.config.getoption('--tokenizer')
+    if mode == 'nltk':
+        try:
+            nltk_resources.word_tokenize("probe.")
+        except (ImportError, LookupError):
+            pytest.skip("NLTK or its Punkt model is not installed; build the bundle with "
+                        "`python nltk_resources.py` on a connected host, or run with --tokenizer regex")
+    return mode
+
+
+@pytest.fixture(scope='session')
+def data_directory():
+    if not os.path.isdir(paths.DATA_DIRECTORY):
+        pytest.skip("Data_Collection is not available")
+    return paths.DATA_DIRECTORY
+
+
+@pytest.fixture(scope='session')
+def collection_directories(data_directory):
+    return {collection: os.path.join(data_directory, collection) for collection in SAMPLE_COLLECTIONS}
+
+
+@pytest.fixture(scope='session')
+def stop_words():
+    return load_stop_words(paths.STOP_WORDS_FILE)
+
+
+@pytest.fixture(scope='session')
+def queries(stop_words, tokenizer):
+    """
+    Stemmed full-topic queries of the sample collections, keyed by collection.
+    """
+    topics = load_queries(paths.QUERY_FILE, stop_words, tokenizer)
+    return {collection: topics[f"R{collection[len('Data_C'):]}"] for collection in SAMPLE_COLLECTIONS}
+
+
+@pytest.fixture(scope='session')
+def indexes(collection_directories, stop_words, tokenizer):
+    return {collection: build_index(directory, stop_words, tokenizer=tokenizer)
+            for collection, directory in collection_directories.items()}
@@ -0,0 +1,89 @@
+import codecs
+
+import pytest
+
+import nltk_resources
+from analysis import regex_tokenize, regex_tokenize_bytes, tokenize
+from documents import declared_encoding, read_collection_bytes
+from lexicon import Lexicon
+from verify_tokenizer import unexpected_divergences
+
+SAMPLES = (
+    "u.s. officials said on monday that 3.5 percent of the $1,000 bonds were sold.",
+    "he said: \"we can't, won't and shouldn't\" -- and then left... 'quoted' ``text''",
+    "the e-mail (sent 10:30 a.m.) was n/a; see corp.'s filing [page 2] & co. ltd.",
+    "prices rose 4.2%.the index closed at 1,234.56 points,up from 1,200",
+    "gonna gimme cannot i'm you're they've we'll she'd o'neill's rock'n'roll",
+    "<p>first paragraph.</p><p>second!</p> <headline>a.b.c. news</headline>",
+)
+# Upper-case and non-ASCII letters, no-break and other Unicode spaces, curly quotes and dashes
+NON_ASCII_SAMPLES = (
+    "Ångström and ZÜRICH\u00a0bank. São Paulo — «quoted» ‘single’ “double” café’s",
+    "naïve co\u2013operation\u2003spacing\u2028line Straße ΑΘΗΝΑ. Ünited",
+)
+
+
+@pytest.fixture(scope='module')
+def nltk_tokens():
+    """
+    nltk.word_tokenize followed by the isalnum() filter. Without NLTK and the bundled punkt_tab model
+    the regex tokenizer is unverified, so this fails rather than skips.
+    """
+    try:
+        nltk_resources.require_punkt()
+        nltk_resources.word_tokenize("probe.")
+    except (ImportError, LookupError) as error:
+        pytest.fail(f"cannot check the regex tokenizer against nltk: {error}")
+    return lambda text: [token for token in tokenize(text, 'nltk') if token.isalnum()]
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_regex_tokenizer_matches_nltk(nltk_tokens, text):
+    assert regex_tokenize(text) == nltk_tokens(text)
+
+
+def test_regex_tokenizer_matches_nltk_on_corpus(nltk_tokens, collection_directories):
+    for collection, directory in collection_directories.items():
+        for filename, data, encoding in read_collection_bytes(directory):
+            text = data.decode(encoding).strip().lower()
+            assert not unexpected_divergences(f"{collection}/{filename}", nltk_tokens(text), regex_tokenize(text))
+
+
+def test_unknown_tokenizer_mode():
+    with pytest.raises(ValueError):
+        tokenize("text", 'whitespace')
+
+
+@pytest.mark.parametrize('text', SAMPLES + NON_ASCII_SAMPLES)
+@pytest.mark.parametrize('encoding', ['utf-8', 'iso-8859-1', 'cp1252', 'utf-16'])
+def test_byte_tokenizer_matches_text_tokenizer(text, encoding):
+    try:
+        data = text.encode(encoding)
+    except UnicodeEncodeError:
+        data = text.encode(encoding, 'replace')
+    assert regex_tokenize_bytes(data, encoding) == regex_tokenize(data.decode(encoding).lower())
+
+
+def test_byte_tokenizer_matches_text_tokenizer_on_corpus(collection_directories):
+    for directory in collection_directories.values():
+        for filename, data, encoding in read_collection_bytes(directory):
+            assert regex_tokenize_bytes(data, encoding) == regex_tokenize(data.decode(encoding).lower()), filename
+
+
+def test_lexicon_analyses_bytes_like_text(collection_directories, stop_words):
+    from_bytes, from_text = Lexicon(stop_words, 'regex'), Lexicon(stop_words, 'regex')
+    for filename, data, encoding in read_collection_bytes(collection_directories['Data_C101']):
+        terms = [from_bytes.terms[term_id] for term_id in from_bytes.analyze_document_ids(data, encoding)]
+        assert terms == from_text.analyze(data.decode(encoding)), filename
+
+
+@pytest.mark.parametrize('data, encoding', [
+    (b'<?xml version="1.0" encoding="iso-8859-1" ?><newsitem/>', 'iso8859-1'),
+    (b"<?xml version='1.0' encoding='UTF-8'?>", 'utf-8'),
+    (b'<?xml version="1.0" encoding="x-unknown"?>', 'utf-8'),
+    (codecs.BOM_UTF8 + b'<?xml version="1.0" encoding="iso-8859-1"?>', 'utf-8-sig'),
+    ('<?xml version="1.0" encoding="utf-16"?>'.encode('utf-16'), 'utf-16'),
+    (b'<newsitem>no declaration</newsitem>', 'utf-8'),
+])
+def test_declared_encoding(data, encoding):
+    assert declared_encoding(data) == encoding
@@ -0,0 +1,97 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from artifacts import MISSING, ArtifactStore, Pipeline, artifact_key
+from index import INDEX_VERSION
+from models import CollectionStatistics, get_models, score_models
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / 'store'))
+
+
+def age(store, key, days):
+    past = time.time() - days * 86400
+    os.utime(store.path(key), (past, past))
+
+
+def test_keys_address_stage_and_inputs():
+    assert artifact_key('score', 'index', ['a', 'b']) == artifact_key('score', 'index', ['a', 'b'])
+    assert artifact_key('score', 'index', ['a', 'b']) != artifact_key('score', 'index', ['b', 'a'])
+    assert artifact_key('score', 'index') != artifact_key('evaluate', 'index')
+
+
+def test_store_round_trip_and_missing(store):
+    key = artifact_key('ingest', 'document')
+    assert store.get(key) is MISSING
+    store.put(key, ['econom', 'espionag'])
+    assert store.get(key) == ['econom', 'espionag']
+    assert store.cached('ingest', key, lambda: pytest.fail("recomputed a stored artifact")) == ['econom', 'espionag']
+    assert (store.hits['ingest'], store.misses['ingest']) == (1, 0)
+
+
+def test_artifacts_of_another_index_version_are_missing(store):
+    key = artifact_key('ingest', 'document')
+    os.makedirs(os.path.dirname(store.path(key)))
+    with open(store.path(key), 'wb') as file:
+        pickle.dump((INDEX_VERSION + 1, ['stale']), file)
+    assert store.get(key) is MISSING
+    assert store.cached('ingest', key, lambda: ['fresh']) == ['fresh']
+    assert store.get(key) == ['fresh']
+
+
+def test_gc_keeps_recorded_roots(store):
+    kept, dropped = artifact_key('score', 'kept'), artifact_key('score', 'dropped')
+    store.cached('score', kept, lambda: np.zeros(1000))
+    store.save_roots('run')
+    store.put(dropped, np.zeros(1000))
+    age(store, kept, 10)
+    age(store, dropped, 10)
+    assert store.gc(max_age_days=5)[0] == 1
+    assert store.get(kept) is not MISSING and store.get(dropped) is MISSING
+
+
+def test_gc_removes_least_recently_used_first(store):
+    keys = [artifact_key('score', str(number)) for number in range(3)]
+    for days, key in zip((3, 1, 2), keys):
+        store.put(key, np.zeros(1000))
+        age(store, key, days)
+    size = os.path.getsize(store.path(keys[0]))
+    assert store.gc(max_bytes=2 * size) == (1, size)
+    assert store.get(keys[0]) is MISSING
+    assert store.get(keys[1]) is not MISSING and store.get(keys[2]) is not MISSING
+
+
+def test_roots_of_other_runs_survive(store):
+    first, second = artifact_key('score', 'first'), artifact_key('score', 'second')
+    store.cached('score', first, lambda: 1)
+    store.save_roots('first-run')
+    other = ArtifactStore(store.directory)
+    other.cached('score', second, lambda: 2)
+    other.save_roots('second-run')
+    assert other.load_roots() == {first, second}
+
+
+def test_pipeline_index_matches_direct_build(store, data_directory, indexes, queries, tokenizer):
+    pipeline = Pipeline(store, data_directory, tokenizer=tokenizer)
+    key, index = pipeline.index('Data_C101')
+    expected = indexes['Data_C101']
+    assert index.doc_ids == expected.doc_ids and index.postings == expected.postings
+    # A later run reuses the stored index; one that lost an ingest artifact re-analyses that document
+    assert Pipeline(store, data_directory, tokenizer=tokenizer).index('Data_C101')[0] == key
+    _, ingest_key = pipeline.ingest('Data_C101')[0]
+    os.remove(store.path(ingest_key))
+    os.remove(store.path(key))
+    assert Pipeline(store, data_directory, tokenizer=tokenizer).index('Data_C101')[1].postings == expected.postings
+
+    models = get_models(['bm25', 'jm_lm'])
+    doc_ids, scores = pipeline.score('R101', queries['Data_C101'], models)
+    reference = score_models(CollectionStatistics(expected), queries['Data_C101'], models)
+    assert doc_ids == expected.doc_ids
+    for name, (_, model_scores) in scores.items():
+        np.testing.assert_array_equal(model_scores, reference[name])
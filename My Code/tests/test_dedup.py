@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from dedup import DuplicateMap, LSHIndex, MinHasher, cluster_pairs, estimate_jaccard, shingle_hashes
+from run_writer import RankingWriter
+
+
+def test_minhash_estimates_jaccard_similarity():
+    hasher = MinHasher(num_perm=512)
+    # Shingle hashes are spread over the whole 64-bit range
+    hashes = np.unique(np.random.default_rng(1).integers(0, 1 << 63, size=1300, dtype=np.uint64))
+    first, second = hashes[:1000], hashes[300:]
+    exact = 700 / len(hashes)
+    assert estimate_jaccard(hasher.signature(first), hasher.signature(second)) == pytest.approx(exact, abs=0.07)
+    assert estimate_jaccard(hasher.signature(first), hasher.signature(first[::-1])) == 1.0
+
+
+def test_shingles_of_identical_term_runs_are_equal():
+    ids = [4, 8, 15, 16, 23, 42, 4, 8]
+    assert np.array_equal(shingle_hashes(ids), shingle_hashes(list(ids)))
+    assert len(shingle_hashes(ids[:3])) == 1
+    assert len(shingle_hashes([])) == 0
+
+
+def test_lsh_pairs_near_duplicates_only():
+    hasher = MinHasher()
+    hashes = np.random.default_rng(2).integers(0, 1 << 63, size=2000, dtype=np.uint64)
+    base = hashes[:1000]
+    lsh = LSHIndex()
+    lsh.add('original', hasher.signature(base))
+    lsh.add('copy', hasher.signature(np.concatenate((base[:990], hashes[1990:]))))
+    lsh.add('other', hasher.signature(hashes[1000:]))
+    assert lsh.duplicate_pairs(0.8) == [('original', 'copy')]
+    with pytest.raises(ValueError):
+        lsh.add('short', hasher.signature(base)[:100])
+
+
+def test_duplicate_map_keeps_one_representative_per_collection():
+    pairs = [(('Data_C101', 'b.xml'), ('Data_C101', 'a.xml')), (('Data_C101', 'c.xml'), ('Data_C102', 'c.xml'))]
+    duplicates = DuplicateMap(cluster_pairs(pairs))
+    assert duplicates.duplicates('Data_C101') == {'b.xml': 'a.xml'}
+    assert duplicates.duplicates('Data_C102') == {}
+    assert duplicates.cross_collection_clusters() == [[('Data_C101', 'c.xml'), ('Data_C102', 'c.xml')]]
+    assert duplicates.expand('Data_C101', {'a.xml': 2.0, 'c.xml': 1.0}) == {'a.xml': 2.0, 'b.xml': 2.0, 'c.xml': 1.0}
+
+
+def test_ranking_writer_fills_in_duplicates(tmp_path):
+    duplicates = DuplicateMap([[('Data_C101', 'a.xml'), ('Data_C101', 'b.xml')]])
+    with RankingWriter(str(tmp_path), 'BM25', k=2, duplicates=duplicates) as writer:
+        writer.write('R101', {'a.xml': 2.0, 'c.xml': 1.0})
+    with open(tmp_path / 'BM25_R101Ranking.dat') as file:
+        assert [line.split()[0] for line in file] == ['a.xml', 'b.xml']
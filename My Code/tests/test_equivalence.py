@@ -0,0 +1,36 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from equivalence import count_inversions, kendall_tau
+
+
+def brute_force_tau(x, y):
+    concordance = [np.sign(x[i] - x[j]) * np.sign(y[i] - y[j]) for i, j in combinations(range(len(x)), 2)]
+    untied_x = sum(x[i] != x[j] for i, j in combinations(range(len(x)), 2))
+    untied_y = sum(y[i] != y[j] for i, j in combinations(range(len(y)), 2))
+    return sum(concordance) / np.sqrt(untied_x * untied_y)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_kendall_tau_matches_pair_counting_with_ties(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 40))
+    x = rng.integers(0, 5, n).astype(float)
+    y = x + rng.integers(-2, 3, n)
+    if len(set(x)) > 1 and len(set(y)) > 1:
+        assert kendall_tau(x, y) == pytest.approx(brute_force_tau(x, y))
+
+
+def test_kendall_tau_without_variation():
+    assert kendall_tau([], []) == 1.0
+    assert kendall_tau([1.0, 1.0], [2.0, 2.0]) == 1.0
+    assert kendall_tau([1.0, 1.0], [1.0, 2.0]) == 0.0
+
+
+def test_count_inversions():
+    values = np.random.default_rng(0).integers(0, 10, 200)
+    expected = sum(values[i] > values[j] for i, j in combinations(range(len(values)), 2))
+    assert count_inversions(values) == expected
+    assert count_inversions(np.arange(100)) == 0 and count_inversions(np.arange(100)[::-1]) == 4950
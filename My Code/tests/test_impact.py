@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from impact import build_impact_index, score_at_a_time
+from weighted_query import query_terms
+
+
+def exhaustive_scores(index, query, k2=500):
+    """
+    Every document's quantised score, summing each query term's full impact-ordered postings.
+    """
+    scores = np.zeros(index.N)
+    for term, qf in query_terms(query).items():
+        if term in index.postings:
+            impacts, starts, docs = index.postings[term]
+            for segment, impact in enumerate(impacts):
+                scores[docs[starts[segment]:starts[segment + 1]]] += (k2 + 1) * qf / (k2 + qf) * float(impact)
+    return scores / index.scale
+
+
+@pytest.fixture(scope='module')
+def impact_indexes(indexes):
+    return {collection: build_impact_index(index) for collection, index in indexes.items()}
+
+
+@pytest.mark.parametrize('k', [1, 10, 50])
+def test_full_evaluation_matches_exhaustive_top_k(impact_indexes, queries, k):
+    for collection, index in impact_indexes.items():
+        result = score_at_a_time(index, queries[collection], k)
+        scores = exhaustive_scores(index, queries[collection])
+        assert result['exact'] and result['postings'] == result['total_postings']
+        assert [score for _, score in result['results']] == pytest.approx(sorted(scores, reverse=True)[:k])
+        numbers = {doc_id: doc for doc, doc_id in enumerate(index.doc_ids)}
+        for doc_id, score in result['results']:
+            assert score == pytest.approx(scores[numbers[doc_id]])
+
+
+@pytest.mark.parametrize('budget', [1, 10, 100, 1000])
+def test_budgeted_results_claimed_exact_are_the_true_top_k(impact_indexes, queries, budget):
+    k = 10
+    for collection, index in impact_indexes.items():
+        result = score_at_a_time(index, queries[collection], k, postings_budget=budget)
+        scores = exhaustive_scores(index, queries[collection])
+        assert result['postings'] <= budget
+        numbers = {doc_id: doc for doc, doc_id in enumerate(index.doc_ids)}
+        for doc_id, score in result['results']:
+            # Partial scores never exceed the full score, and never by more than the remaining bound
+            assert score <= scores[numbers[doc_id]] + 1e-9
+            assert scores[numbers[doc_id]] - score <= result['bound'] + 1e-9
+        if result['exact']:
+            top = {index.doc_ids[doc] for doc in np.argsort(-scores, kind='stable')[:k]}
+            assert {doc_id for doc_id, _ in result['results']} == top
+
+
+def test_impacts_are_quantised_to_the_requested_bits(indexes):
+    index = build_impact_index(indexes['Data_C101'], bits=4)
+    impacts = np.concatenate([impacts for impacts, _, _ in index.postings.values()])
+    assert impacts.min() >= 1 and impacts.max() == 15
+    with pytest.raises(ValueError):
+        build_impact_index(indexes['Data_C101'], bits=0)
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from index import INDEX_VERSION, load_index, save_index
+
+CODE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from index import save_index
+
+
+class Probe:
+    def __init__(self, value):
+        self.value = value
+
+
+if __name__ == "__main__":
+    save_index(Probe(42), sys.argv[2])
+'''
+
+
+def test_classes_of_a_script_run_as_main_load_by_module_name(tmp_path, monkeypatch):
+    (tmp_path / 'probe_script.py').write_text(SCRIPT)
+    file_path = str(tmp_path / 'probe.idx')
+    subprocess.run([sys.executable, str(tmp_path / 'probe_script.py'), CODE_DIRECTORY, file_path], check=True)
+    with open(file_path, 'rb') as file:
+        assert b'__main__' not in file.read()
+    monkeypatch.syspath_prepend(str(tmp_path))
+    probe = load_index(file_path)
+    assert type(probe).__module__ == 'probe_script' and probe.value == 42
+
+
+def test_other_index_versions_are_rejected(tmp_path, monkeypatch):
+    file_path = str(tmp_path / 'old.idx')
+    monkeypatch.setattr('index.INDEX_VERSION', INDEX_VERSION - 1)
+    save_index({'term': {0: 1}}, file_path)
+    monkeypatch.undo()
+    with pytest.raises(ValueError):
+        load_index(file_path)
@@ -0,0 +1,112 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from lsi import build_embedding, load_embedding, lsi_rerank, save_embedding
+from models import CollectionStatistics, get_models, score_models
+
+DIMS = 20
+
+
+def dense_tfidf(indexes):
+    """
+    The row-normalised (1 + ln tf) * ln(N / df) document-term matrix, built densely, and its column terms.
+    """
+    N = sum(index.N for index in indexes)
+    df = Counter()
+    for index in indexes:
+        df.update({term: len(postings) for term, postings in index.postings.items()})
+    columns = {term: column for column, term in enumerate(sorted(df))}
+    matrix = np.zeros((N, len(columns)))
+    start = 0
+    for index in indexes:
+        for term, postings in index.postings.items():
+            for doc, tf in postings.items():
+                matrix[start + doc, columns[term]] = (1 + math.log(tf)) * math.log(N / df[term])
+        start += index.N
+    norms = np.linalg.norm(matrix, axis=1)
+    return matrix / np.where(norms > 0, norms, 1.0)[:, None], columns, df, N
+
+
+@pytest.fixture(scope='module')
+def scope(indexes):
+    return [indexes[collection] for collection in sorted(indexes)]
+
+
+@pytest.fixture(scope='module')
+def embedding(scope):
+    embedding, vectors = build_embedding('global', scope, DIMS)
+    embedding.vectors = vectors
+    return embedding
+
+
+@pytest.fixture(scope='module')
+def reference(scope):
+    matrix, columns, df, N = dense_tfidf(scope)
+    u, s, vt = np.linalg.svd(matrix, full_matrices=False)
+    return matrix, columns, df, N, u[:, :DIMS], s[:DIMS], vt[:DIMS]
+
+
+def test_singular_values_match_svd(embedding, reference):
+    *_, s, _ = reference
+    np.testing.assert_allclose(embedding.singular_values, s, rtol=1e-6)
+
+
+def test_document_vectors_span_the_svd_subspace(embedding, reference):
+    # U_k S_k is only defined up to column signs, so compare the Gram matrix U_k S_k^2 U_k^T
+    _, _, _, _, u, s, _ = reference
+    vectors = np.asarray(embedding.vectors, dtype=np.float64)
+    expected = (u * s) @ (u * s).T
+    np.testing.assert_allclose(vectors @ vectors.T, expected, atol=1e-5)
+
+
+def test_randomized_svd_matches_svd(scope, reference, monkeypatch):
+    # Force the subspace iteration used above GRAM_LIMIT documents onto the small sample scope, iterated
+    # long enough to converge on its flat spectrum
+    monkeypatch.setattr('lsi.GRAM_LIMIT', 0)
+    monkeypatch.setattr('lsi.POWER_ITERATIONS', 20)
+    embedding, vectors = build_embedding('global', scope, DIMS)
+    _, _, _, _, u, s, _ = reference
+    np.testing.assert_allclose(embedding.singular_values, s, rtol=1e-5)
+    vectors = np.asarray(vectors, dtype=np.float64)
+    expected = (u * s) @ (u * s).T
+    np.testing.assert_allclose(vectors @ vectors.T, expected, atol=1e-3 * np.abs(expected).max())
+
+
+def test_folded_query_scores_match_rank_k_approximation(embedding, reference, scope, queries):
+    matrix, columns, df, N, u, s, vt = reference
+    for collection, query in queries.items():
+        weights = np.zeros(len(columns))
+        for term, qf in Counter(query).items():
+            if term in columns:
+                weights[columns[term]] = (1 + math.log(qf)) * math.log(N / df[term])
+        folded = embedding.fold_query(scope, query)
+        # Document vectors times the folded query is the rank-k approximation A_k times the query
+        expected = (u * s) @ (vt @ weights)
+        np.testing.assert_allclose(np.asarray(embedding.vectors, dtype=np.float64) @ folded, expected,
+                                   atol=1e-5 * np.abs(expected).max())
+
+
+def test_saved_embedding_is_memory_mapped(embedding, scope, tmp_path):
+    save_embedding(embedding, embedding.vectors, str(tmp_path))
+    loaded = load_embedding(str(tmp_path), 'global')
+    assert isinstance(loaded.vectors, np.memmap)
+    np.testing.assert_array_equal(loaded.vectors, embedding.vectors)
+    np.testing.assert_array_equal(loaded.singular_values, embedding.singular_values)
+    assert loaded.offsets == embedding.offsets and loaded.max_dims == DIMS
+
+
+@pytest.mark.parametrize('model', ['bm25', 'jm_lm'])
+def test_rerank_only_moves_the_top_k(embedding, scope, queries, model):
+    k = 10
+    for index in scope:
+        query = queries[index.name]
+        first_stage = score_models(CollectionStatistics(index), query, get_models([model]))[model]
+        reranked = lsi_rerank(index, embedding, scope, query, k, 1.0, model)
+        candidates = np.lexsort((np.arange(index.N), -first_stage))[:k]
+        outside = np.setdiff1d(np.arange(index.N), candidates)
+        np.testing.assert_array_equal(reranked[outside], first_stage[outside])
+        spread = first_stage[candidates].max() - first_stage[candidates].min()
+        assert np.all(np.abs(reranked[candidates] - first_stage[candidates]) <= spread + 1e-9)
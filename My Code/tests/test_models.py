@@ -0,0 +1,117 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from analysis import process_text
+from documents import read_collection
+from models import MODEL_REGISTRY, CollectionStatistics, ScoringModel, get_models, score_models
+from scaling_benchmark import load_legacy
+
+
+def bm25_parts(tf, dl, avgdl, qf, k1=1.2, k2=500, b=0.75):
+    K = k1 * ((1 - b) + b * dl / avgdl)
+    return ((k1 + 1) * tf) / (K + tf), ((k2 + 1) * qf) / (k2 + qf)
+
+
+def reference_score(name, tokens, query, N, avgdl, df, corpus_frequency, corpus_length):
+    """
+    One document's score, term by term in plain Python, from the formula each model documents.
+    """
+    tf, dl = Counter(tokens), len(tokens)
+    score = 0.0
+    for term, qf in Counter(query).items():
+        n, cf = df.get(term, 0), corpus_frequency.get(term, 0)
+        if name in ('jm_lm_log', 'dirichlet'):
+            if cf:
+                background = cf / corpus_length
+                if name == 'jm_lm_log':
+                    score += qf * math.log(0.6 * tf[term] / dl + 0.4 * background)
+                else:
+                    score += qf * math.log((tf[term] + 2000 * background) / (dl + 2000))
+            continue
+        if not tf[term]:
+            continue
+        tf_weight, qf_weight = bm25_parts(tf[term], dl, avgdl, qf)
+        if name == 'bm25_log10':
+            score += math.log10((N - n + 0.5) / (n + 0.5)) * tf_weight * qf_weight
+        elif name == 'bm25_clipped':
+            score += max(math.log((N - n + 0.5) / (n + 0.5)) * tf_weight * qf_weight, 0.0)
+        elif name == 'bm25_ln':
+            score += qf * math.log((N - n + 0.5) / (n + 0.5)) * tf_weight
+        elif name == 'tfidf':
+            score += qf * (1 + math.log(tf[term])) * math.log(N / n)
+    return score
+
+
+@pytest.fixture(scope='module')
+def legacy():
+    return load_legacy()
+
+
+@pytest.fixture(scope='module')
+def documents(collection_directories, stop_words, tokenizer):
+    """
+    Task4-NEW's token lists of every sample collection.
+    """
+    return {collection: {filename: process_text(text, stop_words, tokenizer)
+                         for filename, text in read_collection(directory)}
+            for collection, directory in collection_directories.items()}
+
+
+@pytest.fixture(scope='module')
+def registry_scores(indexes, queries):
+    models = get_models(MODEL_REGISTRY)
+    return {collection: {name: dict(zip(index.doc_ids, scores.tolist())) for name, scores
+                         in score_models(CollectionStatistics(index), queries[collection], models).items()}
+            for collection, index in indexes.items()}
+
+
+def test_bm25_matches_task4_new(legacy, documents, queries, registry_scores):
+    for collection, docs in documents.items():
+        N = len(docs)
+        avgdl = sum(len(tokens) for tokens in docs.values()) / N
+        df = Counter(word for tokens in docs.values() for word in set(tokens))
+        expected = legacy.calculate_bm25(N, avgdl, docs, {'q': queries[collection]}, df)['q']
+        assert registry_scores[collection]['bm25'] == pytest.approx(expected, rel=1e-9)
+
+
+def test_jm_lm_matches_task4_new(legacy, documents, queries, registry_scores):
+    for collection, docs in documents.items():
+        frequency = legacy.build_corpus_frequency(docs)
+        expected = legacy.calculate_jm_scores({'q': queries[collection]}, docs, frequency,
+                                              sum(frequency.values()))['q']
+        assert registry_scores[collection]['jm_lm'] == pytest.approx(expected, rel=1e-9)
+
+
+@pytest.mark.parametrize('name', ['bm25_log10', 'bm25_clipped', 'bm25_ln', 'jm_lm_log', 'dirichlet', 'tfidf'])
+def test_model_matches_scalar_reference(name, documents, queries, registry_scores):
+    for collection, docs in documents.items():
+        N = len(docs)
+        avgdl = sum(len(tokens) for tokens in docs.values()) / N
+        df = Counter(word for tokens in docs.values() for word in set(tokens))
+        corpus_frequency = Counter(word for tokens in docs.values() for word in tokens)
+        corpus_length = sum(corpus_frequency.values())
+        expected = {filename: reference_score(name, tokens, queries[collection], N, avgdl, df,
+                                              corpus_frequency, corpus_length)
+                    for filename, tokens in docs.items()}
+        assert registry_scores[collection][name] == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+
+def test_one_pass_matches_scoring_each_model_alone(indexes, queries):
+    index = indexes['Data_C101']
+    together = score_models(CollectionStatistics(index), queries['Data_C101'], get_models(MODEL_REGISTRY))
+    for model in get_models(MODEL_REGISTRY):
+        alone = score_models(CollectionStatistics(index), queries['Data_C101'], [model])[model.name]
+        np.testing.assert_array_equal(together[model.name], alone)
+
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(ValueError):
+        get_models(['bm26'])
+
+
+def test_scoring_model_requires_term_scores():
+    with pytest.raises(TypeError):
+        type('Incomplete', (ScoringModel,), {'name': 'incomplete'})()
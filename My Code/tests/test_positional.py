@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from positional import PositionalIndex, decode_positions, encode_positions
+from proximity import phrase_count, proximity_features, window_count
+
+
+@pytest.mark.parametrize('positions', [[], [0], [0, 1, 2], [127, 128, 16511, 16512], [5, 2**21, 2**35 + 7]])
+def test_position_codec_round_trip(positions):
+    assert decode_positions(encode_positions(positions)) == positions
+
+
+def test_position_codec_round_trip_random():
+    rng = random.Random(0)
+    for _ in range(200):
+        positions = sorted(rng.sample(range(100000), rng.randint(1, 50)))
+        assert decode_positions(encode_positions(positions)) == positions
+
+
+def test_small_gaps_take_one_byte():
+    assert len(encode_positions(range(0, 1270, 10))) == 127
+
+
+def test_positional_index_returns_each_terms_positions():
+    tokens = ['econom', 'espionag', 'case', 'econom', 'espionag', 'trial']
+    positional = PositionalIndex()
+    positional.add_document(3, tokens)
+    assert positional.get('econom', 3) == [0, 3]
+    assert positional.get('trial', 3) == [5]
+    assert positional.get('trial', 4) == []
+    assert positional.get('missing', 3) == []
+    assert proximity_features(positional, 3, ['econom', 'espionag'])['phrase'] == 2
+
+
+def test_phrase_and_window_counts():
+    assert phrase_count([[0, 4, 9], [1, 5], [2, 7]]) == 1
+    assert phrase_count([[0], []]) == 0
+    assert window_count([10], [3, 4, 12, 17, 18], window=8) == 4
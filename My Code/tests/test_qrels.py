@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pytest
+
+import paths
+from evaluation import DEFAULT_RUNS, evaluate_run, metric_matrix
+from qrels import benchmark_files, load_qrels
+
+QUERY_IDS = [f"R{query_id}" for query_id in range(101, 151)]
+
+
+def legacy_judgements(benchmark_folder):
+    """
+    {query id: {doc id: relevance}} read line by line, as the Evaluation notebook did.
+    """
+    judgements = {}
+    for path in benchmark_files(benchmark_folder):
+        with open(path) as file:
+            for line in file:
+                fields = line.split()
+                judgements.setdefault(fields[0], {})[fields[1]] = float(fields[2])
+    return judgements
+
+
+def legacy_evaluate(benchmark, ranking_file):
+    """
+    The notebook's per-topic evaluation: (relevant retrieved, recall, mean precision at relevant ranks).
+    """
+    with open(ranking_file) as file:
+        ranked = [line.split()[0].replace('.xml', '') for line in file if line.strip()]
+    R = len([doc_id for doc_id, relevance in benchmark.items() if relevance > 0])
+    if R == 0:
+        return 0, 0, 0
+    ri, precision = 0, 0.0
+    for rank, doc_id in enumerate(ranked, start=1):
+        if benchmark.get(doc_id, 0) > 0:
+            ri += 1
+            precision += ri / rank
+    return ri, ri / R, precision / ri if ri else 0
+
+
+@pytest.fixture(scope='module')
+def benchmark_folder():
+    if not os.path.isdir(paths.BENCHMARK_DIRECTORY):
+        pytest.skip("EvaluationBenchmark is not available")
+    return paths.BENCHMARK_DIRECTORY
+
+
+@pytest.fixture(scope='module')
+def qrels(benchmark_folder):
+    return load_qrels(benchmark_folder, cache_path=None)
+
+
+def test_store_holds_every_judgement(benchmark_folder, qrels):
+    judgements = legacy_judgements(benchmark_folder)
+    assert len(qrels) == sum(len(topic) for topic in judgements.values())
+    for query_id, topic in judgements.items():
+        assert qrels.judgements(query_id) == topic
+        assert qrels.relevant_count(query_id) == sum(1 for relevance in topic.values() if relevance > 0)
+        doc_ids = list(topic) + ['999999999.xml', 'not-a-number']
+        expected = [topic[doc_id] for doc_id in topic] + [0, 0]
+        np.testing.assert_array_equal(qrels.gather(query_id, doc_ids), expected)
+        doc_id = next(iter(topic))
+        assert qrels.get(query_id, f"{doc_id}.xml") == topic[doc_id]
+
+
+def test_binary_cache_round_trip(benchmark_folder, qrels, tmp_path):
+    cache_path = str(tmp_path / 'qrels.npz')
+    load_qrels(benchmark_folder, cache_path)
+    cached = load_qrels(benchmark_folder, cache_path)
+    for field in ('topics', 'docs', 'relevance'):
+        np.testing.assert_array_equal(getattr(cached, field), getattr(qrels, field))
+
+
+@pytest.mark.parametrize('metric, position', [('ri', 0), ('recall', 1), ('map', 2)])
+def test_evaluation_matches_legacy_loops(benchmark_folder, qrels, metric, position):
+    judgements = legacy_judgements(benchmark_folder)
+    for run_prefix in DEFAULT_RUNS.values():
+        if not os.path.exists(f"{run_prefix}R101Ranking.dat"):
+            continue
+        results = evaluate_run(run_prefix, QUERY_IDS, benchmark_folder, metric, qrels)
+        for query_id in QUERY_IDS:
+            expected = legacy_evaluate(judgements[query_id], f"{run_prefix}{query_id}Ranking.dat")[position]
+            assert results[query_id] == pytest.approx(expected, rel=1e-12), (run_prefix, query_id)
+
+
+def test_missing_runs_are_nan(benchmark_folder, qrels, tmp_path):
+    matrix = metric_matrix({'none': str(tmp_path / 'NONE_')}, QUERY_IDS[:3], benchmark_folder, 'map', qrels)
+    assert np.isnan(matrix).all()
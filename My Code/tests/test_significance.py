@@ -0,0 +1,40 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from significance import compare_runs, paired_t_test, permutation_test, wilcoxon_test
+
+
+@pytest.mark.parametrize('a, b', [([0.5, 0.9], [0.2, 0.3]), ([0.1, 0.7], [0.3, 0.2]), ([0.4, 0.2], [0.1, 0.15])])
+def test_t_test_one_degree_of_freedom_is_cauchy(a, b):
+    t, p = paired_t_test(a, b)
+    assert p == pytest.approx(1 - 2 / math.pi * math.atan(abs(t)), rel=1e-9)
+
+
+@pytest.mark.parametrize('a, b', [([0.5, 0.9, 0.4], [0.2, 0.3, 0.35]), ([0.1, 0.7, 0.2], [0.3, 0.2, 0.25])])
+def test_t_test_two_degrees_of_freedom(a, b):
+    t, p = paired_t_test(a, b)
+    assert p == pytest.approx(1 - abs(t) / math.sqrt(2 + t * t), rel=1e-9)
+
+
+def test_identical_runs_are_not_significant():
+    assert paired_t_test([0.3, 0.4], [0.3, 0.4]) == (0.0, 1.0)
+    assert wilcoxon_test([0.3, 0.4], [0.3, 0.4]) == (0.0, 1.0)
+
+
+def test_permutation_test_approaches_exact_sign_flip_p_value():
+    differences = np.array([0.3, -0.1, 0.25, 0.2, -0.05, 0.15])
+    observed = abs(differences.mean())
+    flips = [abs(np.dot(signs, differences)) / len(differences) >= observed - 1e-12
+             for signs in itertools.product((-1, 1), repeat=len(differences))]
+    exact = sum(flips) / len(flips)
+    assert permutation_test(differences, permutations=200000)[0] == pytest.approx(exact, abs=0.005)
+
+
+def test_compare_runs_drops_topics_missing_a_run():
+    matrix = [[0.5, 0.2], [0.9, 0.3], [np.nan, 0.1], [0.4, 0.35]]
+    row, = compare_runs(matrix, ['A', 'B'], permutations=1000, samples=1000)
+    assert row['topics'] == 3
+    assert row['t'] == pytest.approx(paired_t_test([0.5, 0.9, 0.4], [0.2, 0.3, 0.35])[0])
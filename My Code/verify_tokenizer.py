@@ -0,0 +1,103 @@
+import argparse
+import difflib
+import os
+import sys
+import time
+from collections import Counter
+
+import paths
+from analysis import tokenize
+from documents import declared_encoding
+from nltk_resources import require_punkt
+
+# Reviewed divergences, as (collection/file, nltk tokens, regex tokens). In "(current situation.)."
+# Punkt ends the sentence after ")." so word_tokenize leaves the period on "situation." and the
+# isalnum() filter drops the word; the regex mode keeps it.
+KNOWN_DIVERGENCES = frozenset({
+    ('Data_C146/32380.xml', '', 'situation'),
+})
+
+
+def collection_files(data_directory):
+    """
+    Yield the path of every xml document in every Data_C collection.
+    """
+    for collection in sorted(os.listdir(data_directory)):
+        collection_path = os.path.join(data_directory, collection)
+        if os.path.isdir(collection_path):
+            for filename in sorted(os.listdir(collection_path)):
+                yield os.path.join(collection_path, filename)
+
+
+def diff_tokens(reference, candidate):
+    """
+    Return (reference tokens, candidate tokens, context) for every span where the two token lists disagree.
+    """
+    divergences = []
+    matcher = difflib.SequenceMatcher(None, reference, candidate, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op != 'equal':
+            context = ' '.join(reference[max(0, i1 - 3):i2 + 3])
+            divergences.append((' '.join(reference[i1:i2]), ' '.join(candidate[j1:j2]), context))
+    return divergences
+
+
+def unexpected_divergences(relative_path, reference, candidate):
+    """
+    Return the diff_tokens spans of one document that are not in KNOWN_DIVERGENCES.
+    """
+    return [(expected, actual, context) for expected, actual, context in diff_tokens(reference, candidate)
+            if (relative_path, expected, actual) not in KNOWN_DIVERGENCES]
+
+
+def verify(data_directory, show=20):
+    """
+    Compare the nltk and regex tokenizer modes over a whole collection and print every divergence
+    that is not in KNOWN_DIVERGENCES.
+    """
+    require_punkt()
+    files = divergent_files = known = 0
+    nltk_time = regex_time = 0.0
+    patterns = Counter()
+    for file_path in collection_files(data_directory):
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        text = data.decode(declared_encoding(data)).strip().lower()
+        start = time.perf_counter()
+        reference = [token for token in tokenize(text, 'nltk') if token.isalnum()]
+        middle = time.perf_counter()
+        candidate = tokenize(text, 'regex')
+        nltk_time += middle - start
+        regex_time += time.perf_counter() - middle
+        files += 1
+        if reference != candidate:
+            relative_path = os.path.relpath(file_path, data_directory).replace(os.sep, '/')
+            divergences = unexpected_divergences(relative_path, reference, candidate)
+            known += len(diff_tokens(reference, candidate)) - len(divergences)
+            divergent_files += bool(divergences)
+            for expected, actual, context in divergences:
+                patterns[(expected, actual)] += 1
+                if sum(patterns.values()) <= show:
+                    print(f"{file_path}: nltk={expected!r} regex={actual!r} near '{context}'")
+
+    print(f"\nChecked {files} documents: {divergent_files} with divergent tokens, "
+          f"{sum(patterns.values())} divergent spans, {known} known")
+    print(f"nltk: {nltk_time:.2f}s  regex: {regex_time:.2f}s  speedup: {nltk_time / max(regex_time, 1e-9):.1f}x")
+    for (expected, actual), count in patterns.most_common(show):
+        print(f"{count:6d}  nltk={expected!r}  regex={actual!r}")
+    return divergent_files == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the regex tokenizer matches nltk.word_tokenize on the corpus.")
+    parser.add_argument('--data', default=paths.DATA_DIRECTORY)
+    parser.add_argument('--show', type=int, default=20, help="number of divergences to print")
+    args = parser.parse_args()
+    try:
+        sys.exit(0 if verify(args.data, args.show) else 1)
+    except LookupError as error:
+        sys.exit(f"Cannot verify the tokenizer: {error}")
+
+
+if __name__ == "__main__":
+    main()
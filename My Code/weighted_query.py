@@ -0,0 +1,81 @@
+from collections import Counter
+
+from analysis import parse_queries
+
+QUERY_FIELDS = ('title', 'description', 'narrative')
+
+
+class WeightedQuery(dict):
+    """
+    Query as term -> weight, so each distinct term is scored once however often it repeats.
+    The weight takes the place of the query frequency: unit field weights reproduce the token-list scores.
+    """
+
+    @classmethod
+    def from_terms(cls, terms, weight=1):
+        return cls().add(terms, weight)
+
+    def add(self, terms, weight=1):
+        """
+        Add weight times the number of occurrences of every term.
+        """
+        for term, count in Counter(terms).items():
+            self[term] = self.get(term, 0) + weight * count
+        return self
+
+    def map_terms(self, mapping):
+        """
+        Re-key the query through mapping, e.g. stems to a shared index's term ids; unmapped terms are dropped.
+        """
+        query = WeightedQuery()
+        for term, weight in self.items():
+            if term in mapping:
+                query[mapping[term]] = query.get(mapping[term], 0) + weight
+        return query
+
+    def capped(self, df, max_terms):
+        """
+        Keep the max_terms terms with the highest idf in one collection, i.e. the lowest document
+        frequency df(term); terms no document contains are dropped since they add nothing to any score.
+        """
+        present = [(df(term), -weight, position, term) for position, (term, weight) in enumerate(self.items())]
+        kept = sorted(item for item in present if item[0] > 0)[:max_terms]
+        return WeightedQuery((term, self[term]) for *_, term in sorted(kept, key=lambda item: item[2]))
+
+
+def query_terms(query):
+    """
+    Term -> weight view of a query given either as a WeightedQuery or as a token list.
+    """
+    return query if isinstance(query, dict) else Counter(query)
+
+
+def parse_field_weights(spec):
+    """
+    Parse 'title=3,description=1,narrative=0.5' into a {field: float} dictionary.
+    """
+    weights = {}
+    for item in spec.split(','):
+        field, _, value = item.partition('=')
+        if field not in QUERY_FIELDS:
+            raise ValueError(f"Unknown query field '{field}', expected one of {QUERY_FIELDS}")
+        weights[field] = float(value)
+    return weights
+
+
+def weighted_queries(query_file_path, lexicon, field_weights=None):
+    """
+    Analyse every topic into a WeightedQuery. Without field weights the title, description and narrative
+    are analysed together exactly like analyze_queries; otherwise each field's terms get its weight (default 1).
+    """
+    queries = {}
+    for number, topic in parse_queries(query_file_path).items():
+        if field_weights is None:
+            full_query = f"{topic['title']} {topic['description']} {topic['narrative']}"
+            queries[number] = WeightedQuery.from_terms(lexicon.analyze(full_query))
+        else:
+            query = WeightedQuery()
+            for field in QUERY_FIELDS:
+                query.add(lexicon.analyze(topic[field]), field_weights.get(field, 1))
+            queries[number] = query
+    return queries